@@ -0,0 +1,204 @@
+"""
+Offline bulk comparison of a directory tree of workbooks.
+
+Compares every workbook under a directory with ComparisonService on a
+process pool, without going through HTTP. Each finished file is appended to
+results.jsonl as soon as it completes, and summary.csv is rewritten from all
+results at the end. Re-running with the same output directory resumes:
+files whose content hash already has a result are skipped.
+
+Usage:
+    python -m app.cli nightly/
+    python -m app.cli nightly/ --output results/ --workers 8 --full
+    python -m app.cli nightly/ --retry-failed
+"""
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Optional
+
+from app.services.comparison import SUMMARY_TOP_K, ComparisonService
+from app.services.uploads import UPLOAD_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Read with openpyxl, which cannot read legacy .xls (BIFF) workbooks
+WORKBOOK_PATTERNS = ("*.xlsx", "*.xlsm")
+RESULTS_FILE = "results.jsonl"
+SUMMARY_FILE = "summary.csv"
+SUMMARY_COLUMNS = [
+    "path", "sha256", "status", "total_rows", "total_cells", "mismatched_cells",
+    "accuracy", "average_mismatch_confidence", "seconds", "error",
+]
+
+OK = "ok"
+ERROR = "error"
+
+# One service per worker process, created by the pool initializer
+_service: Optional[ComparisonService] = None
+
+
+def file_sha256(path: Path) -> str:
+    """SHA-256 of a file's content, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_workbooks(directory: Path, patterns: tuple = WORKBOOK_PATTERNS) -> list:
+    """Workbooks under directory, recursively, in path order; Excel lock files (~$...) are skipped"""
+    paths = {p for pattern in patterns for p in directory.rglob(pattern) if not p.name.startswith("~$")}
+    return sorted(p for p in paths if p.is_file())
+
+
+def load_results(results_path: Path) -> dict:
+    """Latest result record per content hash from a results file; unreadable lines are ignored"""
+    records = {}
+    if not results_path.exists():
+        return records
+    with open(results_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by an interruption
+                continue
+            if isinstance(record, dict) and "sha256" in record:
+                records[record["sha256"]] = record
+    return records
+
+
+def write_summary(records: list, summary_path: Path) -> None:
+    """Write one CSV row per result record"""
+    with open(summary_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        for record in sorted(records, key=lambda r: r.get("path", "")):
+            writer.writerow({**record, **(record.get("result") or {}), "path": record.get("path")})
+
+
+def _init_worker() -> None:
+    global _service
+    _service = ComparisonService()
+    # Files are already spread across processes
+    _service.shard_workers = 1
+
+
+def _compare_file(path: str, sha256: str, full: bool, top_k: int) -> dict:
+    """Worker: compare one workbook and return its result record"""
+    record = {"path": path, "sha256": sha256}
+    start = time.perf_counter()
+    try:
+        with open(path, "rb") as f:
+            if full:
+                result = _service.compare_files(f)
+            else:
+                result = _service.summarize_files(f, top_k=top_k)
+        record.update(status=OK, result=result.model_dump(mode="json"))
+    except Exception as e:
+        record.update(status=ERROR, error=f"{type(e).__name__}: {e}")
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def run(
+    directory: Path,
+    output: Path,
+    workers: int,
+    full: bool = False,
+    top_k: int = SUMMARY_TOP_K,
+    retry_failed: bool = False,
+) -> dict:
+    """
+    Compare every workbook under directory that has no result in output yet.
+
+    Returns:
+        Counts of compared, skipped and failed files
+    """
+    output.mkdir(parents=True, exist_ok=True)
+    results_path = output / RESULTS_FILE
+    records = load_results(results_path)
+    done = {sha for sha, r in records.items() if r.get("status") == OK or not retry_failed}
+
+    pending = {}
+    skipped = 0
+    for path in find_workbooks(directory):
+        sha256 = file_sha256(path)
+        if sha256 in done or sha256 in pending:
+            skipped += 1
+            continue
+        pending[sha256] = str(path)
+    logger.info(f"{len(pending)} workbooks to compare, {skipped} already done or duplicate")
+
+    failed = 0
+    with open(results_path, "a", encoding="utf-8") as results, ProcessPoolExecutor(
+        max_workers=max(1, workers), initializer=_init_worker
+    ) as pool:
+        futures = {pool.submit(_compare_file, path, sha, full, top_k): (sha, path) for sha, path in pending.items()}
+        try:
+            for completed, future in enumerate(as_completed(futures), 1):
+                try:
+                    record = future.result()
+                except BrokenProcessPool as e:
+                    # A worker died (e.g. killed for memory); every file not finished yet fails with it
+                    sha256, path = futures[future]
+                    record = {"path": path, "sha256": sha256, "status": ERROR, "error": f"{type(e).__name__}: {e}"}
+                # Written and flushed per file so an interrupted run can resume
+                results.write(json.dumps(record, ensure_ascii=False) + "\n")
+                results.flush()
+                records[record["sha256"]] = record
+                if record["status"] == ERROR:
+                    failed += 1
+                    logger.warning(f"[{completed}/{len(futures)}] {record['path']}: {record['error']}")
+                else:
+                    logger.info(
+                        f"[{completed}/{len(futures)}] {record['path']}: "
+                        f"accuracy {record['result']['accuracy']} in {record['seconds']}s"
+                    )
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            write_summary(list(records.values()), output / SUMMARY_FILE)
+
+    return {"compared": len(pending), "skipped": skipped, "failed": failed}
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare every workbook in a directory tree")
+    parser.add_argument("directory", type=Path, help="Directory searched recursively for .xlsx/.xlsm files")
+    parser.add_argument("--output", type=Path, default=Path("comparison-results"),
+                        help=f"Directory for {RESULTS_FILE} and {SUMMARY_FILE} (default: comparison-results)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count)")
+    parser.add_argument("--full", action="store_true", help="Store per-cell results instead of summaries")
+    parser.add_argument("--top-k", type=int, default=SUMMARY_TOP_K, help="Most frequent wrong values kept per column")
+    parser.add_argument("--retry-failed", action="store_true", help="Compare files whose previous attempt failed again")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if not args.directory.is_dir():
+        parser.error(f"{args.directory} is not a directory")
+
+    try:
+        counts = run(args.directory, args.output, args.workers, args.full, args.top_k, args.retry_failed)
+    except KeyboardInterrupt:
+        logger.warning(f"Interrupted; finished results are in {args.output / RESULTS_FILE}, rerun to resume")
+        return 130
+
+    logger.info(
+        f"Compared {counts['compared']}, skipped {counts['skipped']}, failed {counts['failed']}. "
+        f"Results in {args.output}"
+    )
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
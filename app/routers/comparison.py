@@ -1,10 +1,61 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from contextlib import nullcontext
+from typing import List, Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Header, Query
+from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
+from starlette.concurrency import run_in_threadpool
 
-from app.services.comparison import ComparisonService
-from app.schemas.comparison import ComparisonResponse
+from app.services.admission import (
+    BYTES_PER_CELL,
+    AdmissionController,
+    AdmissionRejected,
+    JobCost,
+    estimate_cost,
+)
+from app.services.comparison import (
+    EXTRACTED_SHEET,
+    GROUND_TRUTH_SHEET,
+    SUMMARY_TOP_K,
+    WORST_MISMATCHES_K,
+    ComparisonService,
+)
+from app.services.datasets import DatasetStore
+from app.services.history import HistoryStore
+from app.services.jobs import COMPLETED, FAILED, TERMINAL_STATUSES, JobManager
+from app.services.metrics import metrics, stage_timer, server_timing_header
+from app.services.profiling import PROFILE_FORMATS, SamplingProfiler, find_profile, is_authorized
+from app.services.report import REPORT_MEDIA_TYPE, write_diff_report
+from app.services.sampling import DEFAULT_CONFIDENCE_LEVEL, DEFAULT_MARGIN_OF_ERROR
+from app.services.serialization import (
+    comparison_response,
+    json_response,
+    negotiate_media_type,
+    supported_media_types,
+)
+from app.services.uploads import UploadTooLargeError, save_upload, spool_upload
+from app.schemas.comparison import (
+    AccuracyEstimateResponse,
+    AccuracyTrend,
+    ColumnErrorRate,
+    ComparisonResponse,
+    ComparisonSummaryResponse,
+    DatasetInfo,
+    GateResponse,
+    HistoryEntry,
+    JobStatus,
+    MismatchCell,
+    MultiSheetComparisonResponse,
+    VersionComparisonResponse,
+    WorstMismatchesResponse,
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/comparison", tags=["comparison"])
 
@@ -13,6 +64,23 @@ templates_dir = Path(__file__).parent.parent.parent / "templates"
 templates = Jinja2Templates(directory=str(templates_dir))
 
 comparison_service = ComparisonService()
+admission = AdmissionController()
+job_manager = JobManager(comparison_service, admission=admission)
+dataset_store = DatasetStore()
+history_store = HistoryStore()
+
+# How often the Server-Sent Events stream checks a job for progress
+JOB_EVENTS_INTERVAL_SECONDS = 0.5
+
+
+def _record_history(result, dataset: str, source_sha256: str, timings: dict) -> Optional[str]:
+    """Store a result in the comparison history; a failure is logged and does not fail the request"""
+    try:
+        with stage_timer(timings, "history"):
+            return history_store.record(result, dataset, source_sha256)
+    except Exception as e:
+        logger.warning(f"Could not record comparison for '{dataset}' in history: {e}")
+        return None
 
 
 @router.get("/", response_class=HTMLResponse)
@@ -30,21 +98,788 @@ async def comparison_results(request: Request):
 @router.post("/api/compare", response_class=JSONResponse)
 async def api_compare(
     excel_file: UploadFile = File(..., description="Excel file with 正解データ and Robota結果 tabs"),
+    profile: Optional[str] = Query(None, description="Profile this request: 'speedscope' or 'collapsed' (requires X-Profile-Token)"),
+    x_profile_token: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    accept: Optional[str] = Header(None),
+    record: bool = Query(False, description="Store the result in the comparison history"),
+    dataset: Optional[str] = Query(None, description="History label to record under (required with record=true)"),
 ):
     """
     API endpoint for comparing tabs within an Excel file. Returns JSON response.
+
+    The result is serialized directly to bytes by pydantic and compressed with
+    br or gzip when the client's Accept-Encoding allows it. Programmatic clients
+    can ask for application/x-msgpack or application/vnd.apache.arrow.stream
+    (one record batch of cells) through the Accept header.
+
+    Requests are admitted against global memory and CPU budgets using a cost
+    estimated from the sheet dimensions; smaller jobs are scheduled first and
+    a 429 with Retry-After is returned when the queue is full or the wait is
+    too long.
+
+    With record=true the summary, per-column accuracy and mismatched cells are
+    stored in the comparison history under the dataset label and the
+    X-Comparison-Id header is set. The label is required rather than taken from
+    the file name, which often changes between runs of the same dataset.
+
+    Per-stage durations, including time queued, are reported in the Server-Timing
+    header. When profiling is requested with a valid admin token
+    (COMPARISON_PROFILE_TOKEN), the request runs under a sampling profiler and the
+    stored profile's ID is returned in the X-Profile-Id header.
+    """
+    start = time.perf_counter()
+    timings = {}
+    status_code = 200
+    try:
+        media_type = negotiate_media_type(accept)
+        if media_type is None:
+            raise HTTPException(
+                status_code=406,
+                detail=f"Unsupported Accept header. Available: {', '.join(supported_media_types())}",
+            )
+
+        if profile is not None:
+            if not is_authorized(x_profile_token):
+                raise HTTPException(status_code=403, detail="Profiling is disabled or the profile token is invalid")
+            if profile not in PROFILE_FORMATS:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Unsupported profile format '{profile}'. Use one of: {', '.join(PROFILE_FORMATS)}",
+                )
+
+        if record and not (dataset and dataset.strip()):
+            raise HTTPException(status_code=400, detail="A dataset label is required when record=true")
+
+        # Stream the upload in chunks, enforcing the size limit and hashing it
+        upload = await spool_upload(excel_file)
+        profiler = SamplingProfiler(name=excel_file.filename or "compare") if profile else None
+
+        def compare_and_serialize():
+            # The profiler samples the thread that enters it, so it is entered on the worker thread
+            with profiler or nullcontext():
+                # Perform comparison directly from the spooled file
+                result = comparison_service.compare_files(upload.file, timings=timings)
+                comparison_id = (
+                    _record_history(result, dataset.strip(), upload.sha256, timings)
+                    if record else None
+                )
+
+                with stage_timer(timings, "serialization"):
+                    response = comparison_response(
+                        ComparisonResponse(success=True, result=result), media_type, accept_encoding
+                    )
+                if comparison_id is not None:
+                    response.headers["X-Comparison-Id"] = comparison_id
+                return response
+
+        # Wait for memory and CPU budget (estimated from the sheet dimensions), then run off the event loop
+        async with admission.admit(estimate_cost(upload.file, upload.size)) as queued_seconds:
+            timings["queue"] = queued_seconds
+            response = await run_in_threadpool(compare_and_serialize)
+
+        timings["total"] = time.perf_counter() - start
+        response.headers["Server-Timing"] = server_timing_header(timings)
+        response.headers["X-Upload-SHA256"] = upload.sha256
+        if profiler is not None:
+            response.headers["X-Profile-Id"] = profiler.save(profile)
+        return response
+
+    except HTTPException as e:
+        # Rejected before the comparison (Accept header, profiling, record options)
+        status_code = e.status_code
+        raise
+    except UploadTooLargeError as e:
+        status_code = 413
+        raise HTTPException(status_code=413, detail=str(e))
+    except AdmissionRejected as e:
+        status_code = 429
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ValueError as e:
+        status_code = 400
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        status_code = 500
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    finally:
+        metrics.requests.inc(status=status_code)
+        metrics.request_seconds.observe(time.perf_counter() - start)
+
+
+@router.post("/api/summary", response_class=JSONResponse)
+async def api_summary(
+    excel_file: UploadFile = File(..., description="Excel file with 正解データ and Robota結果 tabs"),
+    top_k: int = Query(SUMMARY_TOP_K, ge=0, le=100, description="Most frequent wrong values reported per column"),
+    accept_encoding: Optional[str] = Header(None),
+):
+    """
+    Compare tabs within an Excel file and return only summary statistics.
+
+    Returns totals, overall and per-column accuracy, per-column average
+    mismatch confidence and the most frequent wrong values per column, without
+    per-cell results. Stage durations are reported in the Server-Timing header.
+    Requests pass through the same admission control as /api/compare.
+    """
+    start = time.perf_counter()
+    timings = {}
+    status_code = 200
+    try:
+        upload = await spool_upload(excel_file)
+
+        def summarize_and_serialize():
+            summary = comparison_service.summarize_files(upload.file, top_k=top_k, timings=timings)
+            with stage_timer(timings, "serialization"):
+                return json_response(ComparisonSummaryResponse(success=True, result=summary), accept_encoding)
+
+        async with admission.admit(estimate_cost(upload.file, upload.size)) as queued_seconds:
+            timings["queue"] = queued_seconds
+            response = await run_in_threadpool(summarize_and_serialize)
+
+        timings["total"] = time.perf_counter() - start
+        response.headers["Server-Timing"] = server_timing_header(timings)
+        response.headers["X-Upload-SHA256"] = upload.sha256
+        return response
+
+    except UploadTooLargeError as e:
+        status_code = 413
+        raise HTTPException(status_code=413, detail=str(e))
+    except AdmissionRejected as e:
+        status_code = 429
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ValueError as e:
+        status_code = 400
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        status_code = 500
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    finally:
+        metrics.requests.inc(status=status_code)
+        metrics.request_seconds.observe(time.perf_counter() - start)
+
+
+@router.post("/api/estimate", response_class=JSONResponse)
+async def api_estimate(
+    excel_file: UploadFile = File(..., description="Excel file with 正解データ and Robota結果 tabs"),
+    sample_size: Optional[int] = Query(None, ge=1, description="Rows to sample (overrides margin_of_error)"),
+    margin_of_error: float = Query(DEFAULT_MARGIN_OF_ERROR, gt=0, lt=1, description="Target interval half-width as a fraction"),
+    confidence_level: float = Query(DEFAULT_CONFIDENCE_LEVEL, gt=0, lt=1),
+    seed: Optional[int] = Query(None, description="Random seed for a reproducible sample"),
+    accept_encoding: Optional[str] = Header(None),
+):
+    """
+    Estimate accuracy from a stratified random sample of rows.
+
+    Returns estimated overall and per-column accuracy with confidence
+    intervals. The sample is sized for the requested margin of error unless
+    sample_size is given; small sheets are compared in full.
+    Requests pass through the same admission control as /api/compare.
+    """
+    start = time.perf_counter()
+    timings = {}
+    status_code = 200
+    try:
+        upload = await spool_upload(excel_file)
+
+        def estimate_and_serialize():
+            estimate = comparison_service.estimate_accuracy(
+                upload.file,
+                sample_size=sample_size,
+                margin_of_error=margin_of_error,
+                confidence_level=confidence_level,
+                seed=seed,
+                timings=timings,
+            )
+            return json_response(AccuracyEstimateResponse(success=True, result=estimate), accept_encoding)
+
+        async with admission.admit(estimate_cost(upload.file, upload.size)) as queued_seconds:
+            timings["queue"] = queued_seconds
+            response = await run_in_threadpool(estimate_and_serialize)
+
+        timings["total"] = time.perf_counter() - start
+        response.headers["Server-Timing"] = server_timing_header(timings)
+        response.headers["X-Upload-SHA256"] = upload.sha256
+        return response
+
+    except UploadTooLargeError as e:
+        status_code = 413
+        raise HTTPException(status_code=413, detail=str(e))
+    except AdmissionRejected as e:
+        status_code = 429
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ValueError as e:
+        status_code = 400
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        status_code = 500
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    finally:
+        metrics.requests.inc(status=status_code)
+        metrics.request_seconds.observe(time.perf_counter() - start)
+
+
+@router.post("/api/gate", response_class=JSONResponse)
+async def api_gate(
+    excel_file: UploadFile = File(..., description="Excel file with 正解データ and Robota結果 tabs"),
+    min_accuracy: Optional[float] = Query(None, ge=0, le=100, description="Minimum cell accuracy in percent"),
+    max_mismatches: Optional[int] = Query(None, ge=0, description="Maximum number of mismatched cells"),
+    accept_encoding: Optional[str] = Header(None),
+):
+    """
+    Check extraction accuracy against a threshold for CI quality gates.
+
+    Rows are compared in chunks and the check stops as soon as the outcome
+    can no longer change. Returns pass/fail with the rows examined and the
+    mismatches found so far; the X-Gate-Result header is "pass" or "fail".
+    Requests pass through the same admission control as /api/compare.
+    """
+    start = time.perf_counter()
+    timings = {}
+    status_code = 200
+    try:
+        upload = await spool_upload(excel_file)
+
+        def check_and_serialize():
+            gate = comparison_service.check_gate(
+                upload.file, min_accuracy=min_accuracy, max_mismatches=max_mismatches, timings=timings
+            )
+            return gate, json_response(GateResponse(success=True, result=gate), accept_encoding)
+
+        async with admission.admit(estimate_cost(upload.file, upload.size)) as queued_seconds:
+            timings["queue"] = queued_seconds
+            gate, response = await run_in_threadpool(check_and_serialize)
+
+        timings["total"] = time.perf_counter() - start
+        response.headers["Server-Timing"] = server_timing_header(timings)
+        response.headers["X-Gate-Result"] = "pass" if gate.passed else "fail"
+        return response
+
+    except UploadTooLargeError as e:
+        status_code = 413
+        raise HTTPException(status_code=413, detail=str(e))
+    except AdmissionRejected as e:
+        status_code = 429
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ValueError as e:
+        status_code = 400
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        status_code = 500
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    finally:
+        metrics.requests.inc(status=status_code)
+        metrics.request_seconds.observe(time.perf_counter() - start)
+
+
+@router.post("/api/worst-mismatches", response_class=JSONResponse)
+async def api_worst_mismatches(
+    excel_file: UploadFile = File(..., description="Excel file with 正解データ and Robota結果 tabs"),
+    k: int = Query(WORST_MISMATCHES_K, ge=1, le=1000, description="Mismatches to return (per column with per_column)"),
+    per_column: bool = Query(False, description="Return the k worst mismatches of every column"),
+    accept_encoding: Optional[str] = Header(None),
+):
+    """
+    Return the lowest-confidence mismatches with aggregate statistics.
+
+    Only k mismatches (per column with per_column) are kept while comparing,
+    so the response size does not grow with the sheet.
+    Requests pass through the same admission control as /api/compare.
+    """
+    start = time.perf_counter()
+    timings = {}
+    status_code = 200
+    try:
+        upload = await spool_upload(excel_file)
+
+        def compare_and_serialize():
+            worst = comparison_service.worst_mismatches(upload.file, k=k, per_column=per_column, timings=timings)
+            return json_response(WorstMismatchesResponse(success=True, result=worst), accept_encoding)
+
+        async with admission.admit(estimate_cost(upload.file, upload.size)) as queued_seconds:
+            timings["queue"] = queued_seconds
+            response = await run_in_threadpool(compare_and_serialize)
+
+        timings["total"] = time.perf_counter() - start
+        response.headers["Server-Timing"] = server_timing_header(timings)
+        response.headers["X-Upload-SHA256"] = upload.sha256
+        return response
+
+    except UploadTooLargeError as e:
+        status_code = 413
+        raise HTTPException(status_code=413, detail=str(e))
+    except AdmissionRejected as e:
+        status_code = 429
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ValueError as e:
+        status_code = 400
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        status_code = 500
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    finally:
+        metrics.requests.inc(status=status_code)
+        metrics.request_seconds.observe(time.perf_counter() - start)
+
+
+# Chunk size used when streaming generated reports back to the client
+REPORT_CHUNK_SIZE = 1024 * 1024
+
+
+def _iter_file(file, chunk_size: int = REPORT_CHUNK_SIZE):
+    """Yield a file's content in chunks and close it afterwards"""
+    try:
+        file.seek(0)
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        file.close()
+
+
+@router.post("/api/export")
+async def api_export(
+    excel_file: UploadFile = File(..., description="Excel file with 正解データ and Robota結果 tabs"),
+):
+    """
+    Compare tabs within an Excel file and download the result as an xlsx report.
+
+    Mismatched cells are highlighted and ground truth / extracted values are
+    written side by side. Report rows are written straight from the aligned
+    comparison arrays (no per-cell result objects) in write-only mode into a
+    temporary file, which is streamed back in chunks. Requests pass through
+    the same admission control as /api/compare.
+    """
+    try:
+        upload = await spool_upload(excel_file)
+
+        def compare_and_write():
+            result = comparison_service.compare_files_matrix(upload.file)
+            report_file = tempfile.TemporaryFile()
+            try:
+                write_diff_report(result, report_file)
+            except Exception:
+                report_file.close()
+                raise
+            return report_file
+
+        # The comparison and the workbook build run off the event loop
+        async with admission.admit(estimate_cost(upload.file, upload.size)):
+            report_file = await run_in_threadpool(compare_and_write)
+
+        return StreamingResponse(
+            _iter_file(report_file),
+            media_type=REPORT_MEDIA_TYPE,
+            headers={"Content-Disposition": 'attachment; filename="comparison_report.xlsx"'},
+        )
+
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.post("/api/compare-sheets", response_class=JSONResponse)
+async def api_compare_sheets(
+    excel_file: UploadFile = File(..., description="Excel file with one or more 正解データ_<name> / Robota結果_<name> tab pairs"),
+    ground_truth_prefix: str = Query(GROUND_TRUTH_SHEET, description="Name prefix of ground truth sheets"),
+    extracted_prefix: str = Query(EXTRACTED_SHEET, description="Name prefix of extracted sheets"),
+    accept_encoding: Optional[str] = Header(None),
+):
+    """
+    Compare every sheet pair in an Excel file.
+
+    Sheets are paired by the suffix after their prefix (正解データ_請求書 with
+    Robota結果_請求書). Returns one result per pair plus the combined accuracy;
+    prefixed sheets without a counterpart are listed in unmatched_sheets.
+    Requests pass through the same admission control as /api/compare.
+    """
+    try:
+        upload = await spool_upload(excel_file)
+
+        def compare_and_serialize():
+            result = comparison_service.compare_sheet_pairs(
+                upload.file, ground_truth_prefix=ground_truth_prefix, extracted_prefix=extracted_prefix
+            )
+            return json_response(MultiSheetComparisonResponse(success=True, result=result), accept_encoding)
+
+        # Parsing and waiting on the worker processes happen off the event loop
+        async with admission.admit(estimate_cost(upload.file, upload.size)):
+            response = await run_in_threadpool(compare_and_serialize)
+        response.headers["X-Upload-SHA256"] = upload.sha256
+        return response
+
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.post("/api/compare-versions", response_class=JSONResponse)
+async def api_compare_versions(
+    excel_file: UploadFile = File(..., description="Excel file with the 正解データ tab and optionally Robota結果<name> tabs"),
+    extracted_files: List[UploadFile] = File([], description="More extracted versions, one file each"),
+    extracted_prefix: str = Query(EXTRACTED_SHEET, description="Name prefix of extracted sheets"),
+    accept_encoding: Optional[str] = Header(None),
+):
+    """
+    Compare several extracted versions against one ground truth.
+
+    Versions are the extracted tabs of excel_file and any extracted_files. The
+    ground truth is parsed and normalized once and the versions are compared in
+    parallel. Returns an accuracy matrix: overall and per-column accuracy for
+    each version, without the individual cells. The request is admitted under
+    the summed estimated cost of all uploaded files.
     """
     try:
-        # Read file content
-        file_content = await excel_file.read()
+        upload = await spool_upload(excel_file)
+        extra_uploads = [(f.filename or f"file{i + 1}", await spool_upload(f)) for i, f in enumerate(extracted_files)]
+
+        costs = [estimate_cost(spooled.file, spooled.size) for spooled in [upload] + [u for _, u in extra_uploads]]
+        cost = JobCost(sum(c.cells for c in costs), sum(c.memory_bytes for c in costs))
 
-        # Perform comparison
-        result = comparison_service.compare_files(file_content)
+        def compare_and_serialize():
+            result = comparison_service.compare_versions(
+                upload.file,
+                extracted_files=[(name, spooled.file) for name, spooled in extra_uploads],
+                extracted_prefix=extracted_prefix,
+            )
+            return json_response(VersionComparisonResponse(success=True, result=result), accept_encoding)
 
-        return ComparisonResponse(success=True, result=result).model_dump()
+        # Parsing every workbook and waiting on the worker processes happen off the event loop
+        async with admission.admit(cost):
+            return await run_in_threadpool(compare_and_serialize)
 
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+
+@router.get("/api/profiles/{profile_id}")
+async def api_get_profile(profile_id: str, x_profile_token: Optional[str] = Header(None)):
+    """Download a stored request profile (requires X-Profile-Token)"""
+    if not is_authorized(x_profile_token):
+        raise HTTPException(status_code=403, detail="Profiling is disabled or the profile token is invalid")
+
+    path = find_profile(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' not found")
+
+    media_type = "application/json" if path.suffix == ".json" else "text/plain"
+    return FileResponse(path, media_type=media_type, filename=path.name)
+
+
+@router.post("/api/jobs", response_model=JobStatus, status_code=202)
+async def api_submit_job(
+    excel_file: UploadFile = File(..., description="Excel file with 正解データ and Robota結果 tabs"),
+):
+    """
+    Submit a comparison to run in the background. Returns the job ID and status.
+
+    Poll GET /api/jobs/{job_id} or subscribe to GET /api/jobs/{job_id}/events for
+    progress, then fetch GET /api/jobs/{job_id}/result once it has completed.
+    Jobs wait in the same admission queue as /api/compare before they run.
+    """
+    try:
+        path, spooled = await save_upload(excel_file)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    try:
+        cost = estimate_cost(spooled.file, spooled.size)
+    except ValueError as e:
+        os.remove(path)
+        raise HTTPException(status_code=400, detail=str(e))
+    return job_manager.submit(path, cost)
+
+
+def _get_job_status(job_id: str) -> JobStatus:
+    job_status = job_manager.status(job_id)
+    if job_status is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found or expired")
+    return job_status
+
+
+@router.get("/api/jobs/{job_id}", response_model=JobStatus)
+async def api_job_status(job_id: str):
+    """Current status and progress of a comparison job"""
+    return _get_job_status(job_id)
+
+
+@router.get("/api/jobs/{job_id}/events")
+async def api_job_events(job_id: str):
+    """Server-Sent Events stream of job status updates, ending when the job finishes"""
+    _get_job_status(job_id)
+
+    async def events():
+        last = None
+        while True:
+            job_status = job_manager.status(job_id)
+            if job_status is None:
+                yield 'event: error\ndata: {"detail": "Job not found or expired"}\n\n'
+                return
+            data = job_status.model_dump_json()
+            if data != last:
+                last = data
+                yield f"event: progress\ndata: {data}\n\n"
+            if job_status.status in TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(JOB_EVENTS_INTERVAL_SECONDS)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/api/jobs/{job_id}/result")
+async def api_job_result(
+    job_id: str,
+    accept_encoding: Optional[str] = Header(None),
+    accept: Optional[str] = Header(None),
+):
+    """
+    Result of a finished job, in the same formats as /api/compare.
+
+    A failed job answers with the status its error would have had on
+    /api/compare (400 for unreadable workbooks, 429 when it was not admitted,
+    500 otherwise) and the error as detail.
+    """
+    job_status = _get_job_status(job_id)
+    if job_status.status == FAILED:
+        job = job_manager.get(job_id)
+        error_status = job.error_status if job is not None and job.error_status else 500
+        headers = {"Retry-After": str(job.retry_after)} if job is not None and job.retry_after else None
+        raise HTTPException(status_code=error_status, detail=job_status.error, headers=headers)
+    if job_status.status != COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Job is {job_status.status}")
+
+    media_type = negotiate_media_type(accept)
+    if media_type is None:
+        raise HTTPException(
+            status_code=406,
+            detail=f"Unsupported Accept header. Available: {', '.join(supported_media_types())}",
+        )
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found or expired")
+    return comparison_response(ComparisonResponse(success=True, result=job.result), media_type, accept_encoding)
+
+
+@router.delete("/api/jobs/{job_id}", response_model=JobStatus)
+async def api_cancel_job(job_id: str):
+    """Cancel a queued or running job"""
+    job_status = job_manager.cancel(job_id)
+    if job_status is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found or expired")
+    return job_status
+
+
+@router.post("/api/datasets", response_model=DatasetInfo, status_code=201)
+async def api_register_dataset(
+    excel_file: UploadFile = File(..., description="Excel file with the 正解データ tab"),
+    name: Optional[str] = Query(None, description="Display name (defaults to the file name)"),
+    sheet: str = Query(GROUND_TRUTH_SHEET, description="Ground truth sheet to register"),
+    key_column: Optional[str] = Query(None, description="Column used to align extracted rows by key"),
+):
+    """
+    Register a ground truth dataset for reuse across comparisons.
+
+    The sheet is parsed, normalized and hashed once and stored in preprocessed
+    form. Compare against it with POST /api/datasets/{dataset_id}/compare,
+    uploading only the Robota results.
+    """
+    try:
+        upload = await spool_upload(excel_file)
+
+        def prepare_and_register():
+            ground_truth = comparison_service.prepare_ground_truth(upload.file, sheet, key_column)
+            return dataset_store.register(ground_truth, name or excel_file.filename or "dataset", upload.sha256)
+
+        # Parsing, normalizing and writing the dataset files happen off the event loop
+        return await run_in_threadpool(prepare_and_register)
+
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/api/datasets", response_model=List[DatasetInfo])
+async def api_list_datasets():
+    """All registered ground truth datasets, newest first"""
+    return dataset_store.list_all()
+
+
+def _get_dataset_info(dataset_id: str) -> DatasetInfo:
+    info = dataset_store.info(dataset_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_id}' not found")
+    return info
+
+
+@router.get("/api/datasets/{dataset_id}", response_model=DatasetInfo)
+async def api_get_dataset(dataset_id: str):
+    """Metadata of a registered dataset"""
+    return _get_dataset_info(dataset_id)
+
+
+@router.delete("/api/datasets/{dataset_id}", response_model=DatasetInfo)
+async def api_delete_dataset(dataset_id: str):
+    """Delete a registered dataset"""
+    info = _get_dataset_info(dataset_id)
+    dataset_store.delete(dataset_id)
+    return info
+
+
+@router.post("/api/datasets/{dataset_id}/compare", response_class=JSONResponse)
+async def api_compare_dataset(
+    dataset_id: str,
+    excel_file: UploadFile = File(..., description="Excel file with the Robota結果 tab (or a single sheet)"),
+    accept_encoding: Optional[str] = Header(None),
+    accept: Optional[str] = Header(None),
+    record: bool = Query(False, description="Store the result in the comparison history"),
+):
+    """
+    Compare uploaded Robota results against a registered ground truth dataset.
+
+    Returns the same response as POST /api/compare, in the media type negotiated
+    from the Accept header. With record=true the result is stored in the
+    comparison history under the dataset ID. Requests pass through the same
+    admission control as /api/compare, counting the dataset's cells as well.
+    """
+    media_type = negotiate_media_type(accept)
+    if media_type is None:
+        raise HTTPException(
+            status_code=406,
+            detail=f"Unsupported Accept header. Available: {', '.join(supported_media_types())}",
+        )
+
+    ground_truth = await run_in_threadpool(dataset_store.load, dataset_id)
+    if ground_truth is None:
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_id}' not found")
+
+    start = time.perf_counter()
+    timings = {}
+    status_code = 200
+    try:
+        upload = await spool_upload(excel_file)
+        extracted = estimate_cost(upload.file, upload.size)
+        gt_cells = ground_truth.rows * len(ground_truth.headers)
+        cost = JobCost(extracted.cells + gt_cells, extracted.memory_bytes + gt_cells * BYTES_PER_CELL)
+
+        def compare_and_serialize():
+            result = comparison_service.compare_with_ground_truth(ground_truth, upload.file, timings=timings)
+            comparison_id = _record_history(result, dataset_id, upload.sha256, timings) if record else None
+
+            with stage_timer(timings, "serialization"):
+                response = comparison_response(
+                    ComparisonResponse(success=True, result=result), media_type, accept_encoding
+                )
+            if comparison_id is not None:
+                response.headers["X-Comparison-Id"] = comparison_id
+            return response
+
+        # The comparison, history write and serialization run off the event loop
+        async with admission.admit(cost) as queued_seconds:
+            timings["queue"] = queued_seconds
+            response = await run_in_threadpool(compare_and_serialize)
+
+        timings["total"] = time.perf_counter() - start
+        response.headers["Server-Timing"] = server_timing_header(timings)
+        response.headers["X-Upload-SHA256"] = upload.sha256
+        return response
+
+    except UploadTooLargeError as e:
+        status_code = 413
+        raise HTTPException(status_code=413, detail=str(e))
+    except AdmissionRejected as e:
+        status_code = 429
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ValueError as e:
+        status_code = 400
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        status_code = 500
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    finally:
+        metrics.requests.inc(status=status_code)
+        metrics.request_seconds.observe(time.perf_counter() - start)
+
+
+@router.get("/api/history", response_model=List[HistoryEntry])
+async def api_list_history(
+    dataset: Optional[str] = Query(None, description="Only comparisons recorded under this label"),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """Stored comparisons with their summary statistics, newest first"""
+    return await run_in_threadpool(history_store.list_entries, dataset, limit)
+
+
+@router.get("/api/history/trend", response_model=AccuracyTrend)
+async def api_history_trend(
+    dataset: str = Query(..., description="Label the comparisons were recorded under"),
+    column: Optional[str] = Query(None, description="Ground truth column (overall accuracy when omitted)"),
+    since: Optional[float] = Query(None, description="Unix timestamp of the earliest comparison"),
+    until: Optional[float] = Query(None, description="Unix timestamp of the latest comparison"),
+    limit: int = Query(100, ge=1, le=10000, description="Most recent comparisons to include"),
+):
+    """Overall or per-column accuracy of a dataset's stored comparisons over time"""
+    return await run_in_threadpool(history_store.accuracy_trend, dataset, column, since, until, limit)
+
+
+@router.get("/api/history/columns", response_model=List[ColumnErrorRate])
+async def api_history_columns(
+    dataset: Optional[str] = Query(None, description="Only comparisons recorded under this label"),
+    since: Optional[float] = Query(None, description="Unix timestamp of the earliest comparison"),
+    limit: int = Query(10, ge=1, le=1000),
+):
+    """Columns with the highest mismatch rate across stored comparisons"""
+    return await run_in_threadpool(history_store.worst_columns, dataset, since, limit)
+
+
+async def _get_history_entry(comparison_id: str) -> HistoryEntry:
+    entry = await run_in_threadpool(history_store.get, comparison_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Comparison '{comparison_id}' not found in history")
+    return entry
+
+
+@router.get("/api/history/{comparison_id}", response_model=HistoryEntry)
+async def api_get_history_entry(comparison_id: str):
+    """A stored comparison with its per-column statistics"""
+    return await _get_history_entry(comparison_id)
+
+
+@router.get("/api/history/{comparison_id}/mismatches", response_model=List[MismatchCell])
+async def api_history_mismatches(
+    comparison_id: str,
+    column: Optional[str] = Query(None, description="Only mismatches in this ground truth column"),
+    limit: int = Query(1000, ge=1, le=100000),
+):
+    """Stored mismatched cells of a comparison, in row order"""
+    await _get_history_entry(comparison_id)
+    return await run_in_threadpool(history_store.mismatches, comparison_id, column, limit)
+
+
+@router.delete("/api/history/{comparison_id}", response_model=HistoryEntry)
+async def api_delete_history_entry(comparison_id: str):
+    """Delete a stored comparison"""
+    entry = await _get_history_entry(comparison_id)
+    await run_in_threadpool(history_store.delete, comparison_id)
+    return entry
@@ -38,4 +38,243 @@ class ComparisonResponse(BaseModel):
     error: Optional[str] = None
 
 
+class WrongValueCount(BaseModel):
+    """A ground truth / extracted value pair that did not match, with its frequency"""
+    ground_truth: str  # Normalized values
+    extracted: str
+    count: int
 
+
+class ColumnSummary(BaseModel):
+    """Aggregate comparison statistics for one ground truth column"""
+    header: str
+    extracted_header: Optional[str] = None  # Matched extracted column, None if unmatched
+    total_cells: int
+    matched_cells: int
+    mismatched_cells: int
+    accuracy: Optional[float] = None  # Percentage (0-100)
+    average_mismatch_confidence: Optional[float] = None
+    top_wrong_values: List[WrongValueCount] = []  # Most frequent mismatches first
+
+
+class ComparisonSummary(BaseModel):
+    """Comparison totals and per-column breakdown without per-cell results"""
+    headers: List[str]
+    total_rows: int
+    matched_rows: int
+    mismatched_rows: int
+    total_cells: int
+    matched_cells: int
+    mismatched_cells: int
+    accuracy: Optional[float] = None  # Percentage of cells that matched (0-100)
+    average_mismatch_confidence: Optional[float] = None
+    columns: List[ColumnSummary]
+
+
+class ComparisonSummaryResponse(BaseModel):
+    """API response for a summary-only comparison"""
+    success: bool
+    result: Optional[ComparisonSummary] = None
+    error: Optional[str] = None
+
+
+class ColumnEstimate(BaseModel):
+    """Estimated accuracy of one column with its confidence interval (percentages)"""
+    header: str
+    extracted_header: Optional[str] = None
+    accuracy: float
+    accuracy_low: float
+    accuracy_high: float
+
+
+class AccuracyEstimate(BaseModel):
+    """Accuracy estimated from a stratified sample of rows"""
+    headers: List[str]
+    total_rows: int
+    sampled_rows: int
+    exact: bool  # True when every row was compared
+    confidence_level: float
+    accuracy: float  # Estimated percentage of matching cells (0-100)
+    accuracy_low: float  # Confidence interval bounds
+    accuracy_high: float
+    margin_of_error: float  # Half-width of the interval in percentage points
+    columns: List[ColumnEstimate]
+
+
+class AccuracyEstimateResponse(BaseModel):
+    """API response for an accuracy estimate"""
+    success: bool
+    result: Optional[AccuracyEstimate] = None
+    error: Optional[str] = None
+
+
+class GateResult(BaseModel):
+    """Outcome of an accuracy threshold check"""
+    passed: bool
+    decided_early: bool  # True when the outcome was decided before the last row
+    total_rows: int
+    rows_examined: int
+    cells_examined: int
+    mismatched_cells: int  # Mismatches found in the examined rows
+    accuracy_so_far: Optional[float] = None  # Percentage over the examined cells
+    min_accuracy: Optional[float] = None
+    max_mismatches: Optional[int] = None
+
+
+class GateResponse(BaseModel):
+    """API response for an accuracy threshold check"""
+    success: bool
+    result: Optional[GateResult] = None
+    error: Optional[str] = None
+
+
+class MismatchCell(BaseModel):
+    """A single mismatched cell"""
+    row_index: int
+    column: str  # Ground truth header
+    ground_truth: Any
+    extracted: Any
+    confidence: float  # Similarity percentage (0-100)
+
+
+class WorstMismatches(BaseModel):
+    """The lowest-confidence mismatches with aggregate statistics"""
+    headers: List[str]
+    k: int
+    per_column: bool  # True when k mismatches were kept per column
+    total_rows: int
+    total_cells: int
+    matched_cells: int
+    mismatched_cells: int
+    accuracy: Optional[float] = None  # Percentage (0-100)
+    average_mismatch_confidence: Optional[float] = None
+    mismatches: List[MismatchCell]  # Lowest confidence first (grouped by column when per_column)
+
+
+class WorstMismatchesResponse(BaseModel):
+    """API response for a worst-mismatch query"""
+    success: bool
+    result: Optional[WorstMismatches] = None
+    error: Optional[str] = None
+
+
+class SheetComparison(BaseModel):
+    """Comparison result for one ground truth / extracted sheet pair"""
+    name: str  # Suffix shared by both sheet names ("" for the unsuffixed tabs)
+    ground_truth_sheet: str
+    extracted_sheet: str
+    result: ComparisonResult
+
+
+class MultiSheetComparisonResult(BaseModel):
+    """Results for every sheet pair in a workbook with combined totals"""
+    sheets: List[SheetComparison]
+    unmatched_sheets: List[str] = []  # Prefixed sheets without a counterpart
+    total_cells: int
+    matched_cells: int
+    mismatched_cells: int
+    accuracy: Optional[float] = None  # Percentage of cells that matched across all sheets (0-100)
+
+
+class MultiSheetComparisonResponse(BaseModel):
+    """API response for a multi-sheet comparison"""
+    success: bool
+    result: Optional[MultiSheetComparisonResult] = None
+    error: Optional[str] = None
+
+
+class VersionComparison(BaseModel):
+    """Aggregate comparison of one extracted version against the ground truth"""
+    name: str  # Sheet name, file name, or "file:sheet"
+    total_rows: int
+    matched_rows: int
+    total_cells: int
+    matched_cells: int
+    mismatched_cells: int
+    accuracy: Optional[float] = None  # Percentage (0-100)
+    average_mismatch_confidence: Optional[float] = None
+    column_accuracy: List[Optional[float]]  # Percentage per ground truth column, in header order
+
+
+class VersionComparisonResult(BaseModel):
+    """Accuracy matrix of several extracted versions against one ground truth"""
+    headers: List[str]
+    versions: List[VersionComparison]
+
+
+class VersionComparisonResponse(BaseModel):
+    """API response for a multi-version comparison"""
+    success: bool
+    result: Optional[VersionComparisonResult] = None
+    error: Optional[str] = None
+
+
+class DatasetInfo(BaseModel):
+    """A registered ground truth dataset"""
+    dataset_id: str
+    name: str
+    headers: List[str]
+    rows: int
+    key_column: Optional[str] = None  # Column used to align extracted rows by key
+    created_at: float  # Unix timestamp
+    source_sha256: Optional[str] = None  # Hash of the uploaded ground truth file
+    size_bytes: int = 0  # Size of the preprocessed data on disk
+
+
+class JobStatus(BaseModel):
+    """Status and progress of an asynchronous comparison job"""
+    job_id: str
+    status: str  # queued, running, completed, failed, cancelled
+    stage: Optional[str] = None  # Current comparison stage (parse, column_matching, ...)
+    rows_processed: int = 0
+    total_rows: int = 0
+    progress: float = 0.0  # Percentage (0-100)
+    created_at: float  # Unix timestamps
+    updated_at: float
+    finished_at: Optional[float] = None
+    expires_at: Optional[float] = None
+    error: Optional[str] = None
+
+
+class HistoryEntry(BaseModel):
+    """A stored comparison with its summary statistics"""
+    comparison_id: str
+    dataset: str  # Label the comparison was recorded under
+    created_at: float  # Unix timestamp
+    source_sha256: Optional[str] = None
+    headers: List[str]
+    total_rows: int
+    matched_rows: int
+    total_cells: int
+    matched_cells: int
+    mismatched_cells: int
+    accuracy: Optional[float] = None  # Percentage (0-100)
+    average_mismatch_confidence: Optional[float] = None
+    stored_mismatches: int = 0  # Mismatch rows kept (capped by COMPARISON_HISTORY_MAX_MISMATCHES)
+    columns: List[ColumnSummary] = []  # Only when a single comparison is requested
+
+
+class TrendPoint(BaseModel):
+    """Accuracy of one stored comparison, overall or for one column"""
+    comparison_id: str
+    created_at: float
+    total_cells: int
+    mismatched_cells: int
+    accuracy: Optional[float] = None  # Percentage (0-100)
+
+
+class AccuracyTrend(BaseModel):
+    """Accuracy of a dataset's stored comparisons over time"""
+    dataset: str
+    column: Optional[str] = None  # None for overall accuracy
+    points: List[TrendPoint]  # Oldest first
+
+
+class ColumnErrorRate(BaseModel):
+    """Mismatches of one column aggregated over stored comparisons"""
+    column: str
+    comparisons: int
+    total_cells: int
+    mismatched_cells: int
+    accuracy: Optional[float] = None  # Percentage over all stored cells (0-100)
+    average_mismatch_confidence: Optional[float] = None
@@ -0,0 +1,316 @@
+import asyncio
+import logging
+import math
+import os
+import posixpath
+import re
+import time
+import zipfile
+import zlib
+from contextlib import asynccontextmanager
+from typing import BinaryIO, List, Optional
+from xml.etree import ElementTree
+
+from app.services.comparison import EXTRACTED_SHEET, GROUND_TRUTH_SHEET
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Peak memory of a comparison per worksheet cell (parsed frames, aligned and
+# normalized arrays, result models and the serialized body), measured on
+# string-heavy workbooks
+BYTES_PER_CELL = 800
+
+# Initial comparison throughput estimate; refined from finished jobs
+SECONDS_PER_CELL = 20e-6
+
+# Bytes read from the start of each worksheet XML to find its <dimension>
+DIMENSION_SCAN_BYTES = 4096
+
+# Fallbacks when there is no usable dimension: uncompressed worksheet XML
+# per cell, and upload bytes per cell for non-xlsx files
+XML_BYTES_PER_CELL = 64
+FILE_BYTES_PER_CELL = 8
+
+# A queued job's priority is log2 of its size in cells minus one per this many
+# seconds waited, so waiting this long counts like halving the job's size and
+# large jobs move ahead of newer small ones
+AGING_SECONDS = 1.0
+
+# Share of queue_timeout after which a waiting job is served ahead of every
+# newer one, whatever its size, so it is admitted before it times out
+STARVATION_SHARE = 0.5
+
+MAX_RETRY_AFTER_SECONDS = 120
+
+_DIMENSION_RE = re.compile(rb'<(?:\w+:)?dimension\s+ref="([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?"')
+_WORKSHEET_RE = re.compile(r"^xl/worksheets/[^/]+\.xml$")
+
+_SPREADSHEET_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_RELATIONSHIP_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+_PACKAGE_RELS_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+def memory_budget_bytes() -> int:
+    """Memory budget for running comparisons (COMPARISON_MEMORY_BUDGET_MB, default 2048 MB)"""
+    return int(float(os.getenv("COMPARISON_MEMORY_BUDGET_MB", "2048")) * 1024 * 1024)
+
+
+def max_running_jobs() -> int:
+    """Comparisons running at once (COMPARISON_MAX_RUNNING, default: CPU count)"""
+    return int(os.getenv("COMPARISON_MAX_RUNNING", str(os.cpu_count() or 1)))
+
+
+def max_queued_jobs() -> int:
+    """Comparisons waiting for admission before new ones are rejected (COMPARISON_MAX_QUEUED, default 32)"""
+    return int(os.getenv("COMPARISON_MAX_QUEUED", "32"))
+
+
+def queue_timeout_seconds() -> float:
+    """Longest wait for admission before a 429 (COMPARISON_QUEUE_TIMEOUT_SECONDS, default 30)"""
+    return float(os.getenv("COMPARISON_QUEUE_TIMEOUT_SECONDS", "30"))
+
+
+class JobCost:
+    """Estimated size of a comparison: worksheet cells and peak memory"""
+
+    def __init__(self, cells: int, memory_bytes: int):
+        self.cells = cells
+        self.memory_bytes = memory_bytes
+
+
+class AdmissionRejected(Exception):
+    """Raised when a job cannot be admitted; retry_after is a suggested wait in seconds"""
+
+    def __init__(self, reason: str, retry_after: int):
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"Server is busy ({reason.replace('_', ' ')}). Retry in {retry_after} seconds.")
+
+
+def _column_number(letters: bytes) -> int:
+    number = 0
+    for letter in letters:
+        number = number * 26 + letter - ord("A") + 1
+    return number
+
+
+def estimate_cells(
+    file: BinaryIO, size: int, sheets: Optional[tuple] = (GROUND_TRUTH_SHEET, EXTRACTED_SHEET)
+) -> int:
+    """
+    Estimate the cells in a workbook without parsing it.
+
+    Only the worksheets named in sheets are counted, found through
+    xl/workbook.xml and its relationships; all worksheets are counted when
+    sheets is None or none of them is present. For xlsx files each counted
+    worksheet's <dimension ref="A1:J2001"/> element is read from the first
+    bytes of its XML, which writers put before the sheet data. Sheets without
+    a usable dimension are estimated from their uncompressed XML size, and
+    other formats from the upload size. The file position is restored.
+
+    Raises:
+        ValueError: if the file is a zip archive whose contents cannot be read
+    """
+    position = file.tell()
+    try:
+        file.seek(0)
+        try:
+            workbook = zipfile.ZipFile(file)
+        except zipfile.BadZipFile:
+            return size // FILE_BYTES_PER_CELL
+        with workbook:
+            paths = _worksheet_paths(workbook, sheets) if sheets else []
+            if not paths:
+                paths = [info.filename for info in workbook.infolist() if _WORKSHEET_RE.match(info.filename)]
+            return sum(_worksheet_cells(workbook, workbook.getinfo(path)) for path in paths)
+    except (zipfile.BadZipFile, zlib.error, EOFError, ElementTree.ParseError) as e:
+        raise ValueError(f"Unable to read Excel file. Error: {e}")
+    finally:
+        file.seek(position)
+
+
+def _worksheet_paths(workbook: zipfile.ZipFile, sheets: tuple) -> list:
+    """Archive paths of the named worksheets that exist, via xl/workbook.xml and its rels"""
+    names = set(workbook.namelist())
+    if "xl/workbook.xml" not in names or "xl/_rels/workbook.xml.rels" not in names:
+        return []
+    relationships = {
+        rel.get("Id"): rel.get("Target", "")
+        for rel in ElementTree.fromstring(workbook.read("xl/_rels/workbook.xml.rels"))
+        if rel.tag == f"{_PACKAGE_RELS_NS}Relationship"
+    }
+    paths = []
+    for sheet in ElementTree.fromstring(workbook.read("xl/workbook.xml")).iter(f"{_SPREADSHEET_NS}sheet"):
+        target = relationships.get(sheet.get(_RELATIONSHIP_ID))
+        if sheet.get("name") not in sheets or not target:
+            continue
+        # Targets are relative to xl/ unless absolute within the package
+        path = target.lstrip("/") if target.startswith("/") else posixpath.normpath(f"xl/{target}")
+        if path in names:
+            paths.append(path)
+    return paths
+
+
+def _worksheet_cells(workbook: zipfile.ZipFile, info: zipfile.ZipInfo) -> int:
+    """Cells of one worksheet from its dimension, or estimated from its XML size"""
+    with workbook.open(info) as sheet:
+        match = _DIMENSION_RE.search(sheet.read(DIMENSION_SCAN_BYTES))
+    cells = 0
+    if match:
+        first_col, first_row, last_col, last_row = match.groups()
+        rows = int(last_row or first_row) - int(first_row) + 1
+        columns = _column_number(last_col or first_col) - _column_number(first_col) + 1
+        cells = rows * columns
+    if cells <= 1:
+        # Writers that do not track the used range leave the dimension out or at "A1"
+        cells = info.file_size // XML_BYTES_PER_CELL
+    return cells
+
+
+def estimate_cost(file: BinaryIO, size: int) -> JobCost:
+    """Estimated cost of comparing an uploaded workbook"""
+    cells = estimate_cells(file, size)
+    return JobCost(cells, cells * BYTES_PER_CELL)
+
+
+class _Waiter:
+    def __init__(self, cost: JobCost, future: asyncio.Future):
+        self.cost = cost
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+    def priority(self, now: float, starving_after: float) -> tuple:
+        waited = now - self.enqueued_at
+        if waited >= starving_after:
+            # Oldest first, ahead of every job that has not waited as long
+            return (0, self.enqueued_at)
+        return (1, math.log2(max(self.cost.cells, 1)) - waited / AGING_SECONDS)
+
+
+class AdmissionController:
+    """
+    Admit comparisons against global memory and concurrency budgets.
+
+    A job runs when fewer than max_running jobs are running and its estimated
+    memory fits in what the running jobs leave of the budget; a job larger
+    than the whole budget runs only on its own. Other jobs wait in a queue
+    ordered by size, smallest first, with waiting time aging each job's
+    priority (log2 of its cells, minus one per AGING_SECONDS waited). Jobs
+    that have waited STARVATION_SHARE of queue_timeout go first, oldest
+    first, so a stream of small jobs cannot hold a large one back until it
+    times out. The queue is served in that order without overtaking, and
+    jobs are rejected with a suggested retry delay when it is full or their
+    wait exceeds queue_timeout.
+
+    Must be used from a single event loop.
+    """
+
+    def __init__(
+        self,
+        memory_budget: Optional[int] = None,
+        max_running: Optional[int] = None,
+        max_queued: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+    ):
+        self.memory_budget = memory_budget_bytes() if memory_budget is None else memory_budget
+        self.max_running = max_running_jobs() if max_running is None else max_running
+        self.max_queued = max_queued_jobs() if max_queued is None else max_queued
+        self.queue_timeout = queue_timeout_seconds() if queue_timeout is None else queue_timeout
+        self.running = 0
+        self.memory_in_use = 0
+        self.cells_in_use = 0
+        self._waiting: List[_Waiter] = []
+        self._seconds_per_cell = SECONDS_PER_CELL
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiting)
+
+    @asynccontextmanager
+    async def admit(self, cost: JobCost):
+        """Wait for admission, run the block, then release; yields the seconds spent queued"""
+        waited = await self.acquire(cost)
+        start = time.perf_counter()
+        try:
+            yield waited
+        finally:
+            self.release(cost, time.perf_counter() - start)
+
+    async def acquire(self, cost: JobCost) -> float:
+        """
+        Wait until the job is admitted and return the seconds spent queued.
+
+        Raises:
+            AdmissionRejected: if the queue is full or the wait times out
+        """
+        if not self._waiting and self._fits(cost):
+            self._start(cost)
+            metrics.queue_seconds.observe(0.0)
+            return 0.0
+        if len(self._waiting) >= self.max_queued:
+            self._reject("queue_full")
+
+        waiter = _Waiter(cost, asyncio.get_running_loop().create_future())
+        self._waiting.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done():
+                # Admitted just as the wait ended
+                if isinstance(e, asyncio.CancelledError):
+                    self.release(cost)
+                    raise
+            else:
+                self._waiting.remove(waiter)
+                self._dispatch()
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                self._reject("queue_timeout")
+        waited = time.monotonic() - waiter.enqueued_at
+        metrics.queue_seconds.observe(waited)
+        return waited
+
+    def release(self, cost: JobCost, elapsed: Optional[float] = None) -> None:
+        """Return a finished job's budget and admit waiting jobs that now fit"""
+        self.running -= 1
+        self.memory_in_use -= cost.memory_bytes
+        self.cells_in_use -= cost.cells
+        if elapsed is not None and cost.cells:
+            self._seconds_per_cell = 0.8 * self._seconds_per_cell + 0.2 * elapsed / cost.cells
+        self._dispatch()
+
+    def retry_after(self) -> int:
+        """Seconds until the running and queued work is expected to drain"""
+        backlog = self.cells_in_use + sum(w.cost.cells for w in self._waiting)
+        seconds = backlog * self._seconds_per_cell / max(self.max_running, 1)
+        return max(1, min(MAX_RETRY_AFTER_SECONDS, math.ceil(seconds)))
+
+    def _fits(self, cost: JobCost) -> bool:
+        if self.running >= self.max_running:
+            return False
+        return self.running == 0 or self.memory_in_use + cost.memory_bytes <= self.memory_budget
+
+    def _start(self, cost: JobCost) -> None:
+        self.running += 1
+        self.memory_in_use += cost.memory_bytes
+        self.cells_in_use += cost.cells
+
+    def _dispatch(self) -> None:
+        now = time.monotonic()
+        starving_after = self.queue_timeout * STARVATION_SHARE
+        for waiter in sorted(self._waiting, key=lambda w: w.priority(now, starving_after)):
+            if not self._fits(waiter.cost):
+                break
+            self._waiting.remove(waiter)
+            self._start(waiter.cost)
+            waiter.future.set_result(None)
+
+    def _reject(self, reason: str) -> None:
+        retry_after = self.retry_after()
+        metrics.admission_rejections.inc(reason=reason)
+        logger.warning(
+            f"Rejected comparison ({reason}): {self.running} running, {len(self._waiting)} queued, "
+            f"retry after {retry_after}s"
+        )
+        raise AdmissionRejected(reason, retry_after)
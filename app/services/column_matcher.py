@@ -0,0 +1,215 @@
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Optional scipy import
+try:
+    from scipy import sparse
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+    sparse = None
+
+logger = logging.getLogger(__name__)
+
+NGRAM_RANGE = (2, 3)
+
+# Weights of the feature blocks in a column vector
+HEADER_WEIGHT = 1.0
+SYNONYM_WEIGHT = 1.5
+VALUE_WEIGHT = 0.8
+
+# Pairs scoring below this cosine similarity are left unmatched
+MIN_SCORE = 0.35
+
+# Non-empty sampled values per column used as value features
+SAMPLE_VALUES = 20
+
+_SEPARATORS_RE = re.compile(r"[\s_\-・/]+")
+
+
+def synonyms_path() -> Optional[Path]:
+    """JSON file with synonym groups (COMPARISON_COLUMN_SYNONYMS), or None"""
+    path = os.getenv("COMPARISON_COLUMN_SYNONYMS")
+    return Path(path) if path else None
+
+
+def normalize_header(header) -> str:
+    """Lowercase a header and drop whitespace and separators"""
+    return _SEPARATORS_RE.sub("", str(header).strip().lower())
+
+
+def char_ngrams(text: str, ngram_range: tuple = NGRAM_RANGE) -> Counter:
+    """Counts of character n-grams of text padded with boundary markers"""
+    padded = f" {text} "
+    counts = Counter()
+    for n in range(ngram_range[0], ngram_range[1] + 1):
+        for i in range(len(padded) - n + 1):
+            counts[padded[i:i + n]] += 1
+    return counts
+
+
+class NgramColumnMatcher:
+    """
+    Local column matcher using character n-gram TF-IDF vectors.
+
+    Each column is embedded as the TF-IDF weighted character n-grams of its
+    header, plus one feature per synonym group the header belongs to and,
+    when sample values are given, the n-grams of those values. All pairs are
+    scored at once with a (sparse when scipy is installed) matrix product of
+    the L2-normalized vectors, and assigned greedily from the best score down.
+
+    Synonym groups bridge headers that share no characters, such as Amount
+    and 金額. They are loaded from a JSON list of lists (COMPARISON_COLUMN_SYNONYMS),
+    which is maintained by hand.
+    """
+
+    def __init__(self, synonyms: Optional[Iterable[Iterable[str]]] = None, min_score: float = MIN_SCORE):
+        self.min_score = min_score
+        self._groups: Dict[str, int] = {}  # normalized term -> group id
+        self._next_group = 0
+        for group in synonyms or []:
+            self.add_synonyms(group)
+
+    @classmethod
+    def from_file(cls, path: Optional[Path] = None) -> "NgramColumnMatcher":
+        """Load synonym groups from a JSON file; a missing file gives an empty dictionary"""
+        path = path or synonyms_path()
+        if path is None or not Path(path).is_file():
+            return cls()
+        try:
+            groups = json.loads(Path(path).read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load column synonyms from {path}: {e}")
+            return cls()
+        logger.info(f"Loaded {len(groups)} column synonym groups from {path}")
+        return cls(groups)
+
+    def add_synonyms(self, terms: Iterable[str]) -> None:
+        """Declare terms as names of the same column, merging any groups they already belong to"""
+        normalized = {normalize_header(term) for term in terms} - {""}
+        if not normalized:
+            return
+        existing = {self._groups[term] for term in normalized if term in self._groups}
+        group = min(existing) if existing else self._next_group
+        if not existing:
+            self._next_group += 1
+        for term, term_group in list(self._groups.items()):
+            if term_group in existing:
+                self._groups[term] = group
+        for term in normalized:
+            self._groups[term] = group
+
+    def score(
+        self,
+        gt_headers: list,
+        robota_headers: list,
+        gt_samples: Optional[list] = None,
+        robota_samples: Optional[list] = None,
+    ) -> np.ndarray:
+        """Cosine similarity of every (ground truth, extracted) column pair"""
+        documents = [self._features(h) for h in gt_headers] + [self._features(h) for h in robota_headers]
+        use_values = gt_samples is not None and robota_samples is not None
+        if use_values:
+            value_documents = [self._value_features(v) for v in list(gt_samples) + list(robota_samples)]
+
+        vocabulary = {}
+        blocks = [self._tfidf(documents, vocabulary, HEADER_WEIGHT, prefix="h:")]
+        if use_values:
+            blocks.append(self._tfidf(value_documents, vocabulary, VALUE_WEIGHT, prefix="v:"))
+        groups = [self._groups.get(normalize_header(h)) for h in list(gt_headers) + list(robota_headers)]
+        blocks.append([
+            {vocabulary.setdefault(f"s:{group}", len(vocabulary)): SYNONYM_WEIGHT} if group is not None else {}
+            for group in groups
+        ])
+
+        rows = []
+        for features in zip(*blocks):
+            row = {}
+            for block in features:
+                row.update(block)
+            norm = math.sqrt(sum(w * w for w in row.values())) or 1.0
+            rows.append({index: w / norm for index, w in row.items()})
+
+        matrix = self._matrix(rows, len(vocabulary))
+        gt_matrix = matrix[: len(gt_headers)]
+        robota_matrix = matrix[len(gt_headers):]
+        scores = gt_matrix @ robota_matrix.T
+        return scores.toarray() if SCIPY_AVAILABLE else np.asarray(scores)
+
+    def match(
+        self,
+        gt_headers: list,
+        robota_headers: list,
+        gt_samples: Optional[list] = None,
+        robota_samples: Optional[list] = None,
+    ) -> dict:
+        """Map ground truth headers to extracted headers, best scoring pairs first"""
+        if not gt_headers or not robota_headers:
+            return {}
+
+        scores = self.score(gt_headers, robota_headers, gt_samples, robota_samples)
+        mapping = {}
+        used_robota = set()
+        for flat in np.argsort(-scores, axis=None, kind="stable"):
+            i, j = divmod(int(flat), len(robota_headers))
+            if scores[i, j] < self.min_score:
+                break
+            if gt_headers[i] in mapping or j in used_robota:
+                continue
+            mapping[gt_headers[i]] = robota_headers[j]
+            used_robota.add(j)
+        return mapping
+
+    @staticmethod
+    def _features(header) -> Counter:
+        return char_ngrams(normalize_header(header))
+
+    @staticmethod
+    def _value_features(values) -> Counter:
+        counts = Counter()
+        for value in [v for v in values if v][:SAMPLE_VALUES]:
+            counts.update(char_ngrams(str(value).strip().lower()))
+        return counts
+
+    @staticmethod
+    def _tfidf(documents: list, vocabulary: dict, weight: float, prefix: str = "") -> list:
+        """TF-IDF weights of each document, L2-normalized and scaled by weight"""
+        document_frequency = Counter()
+        for document in documents:
+            document_frequency.update(document.keys())
+        n_documents = len(documents)
+
+        vectors = []
+        for document in documents:
+            vector = {
+                term: count * (math.log((1 + n_documents) / (1 + document_frequency[term])) + 1)
+                for term, count in document.items()
+            }
+            norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+            vectors.append({
+                vocabulary.setdefault(prefix + term, len(vocabulary)): weight * w / norm
+                for term, w in vector.items()
+            })
+        return vectors
+
+    @staticmethod
+    def _matrix(rows: list, n_features: int):
+        """Rows of {feature index: weight} as a CSR matrix (or a dense array without scipy)"""
+        if SCIPY_AVAILABLE:
+            indptr = np.cumsum([0] + [len(row) for row in rows])
+            indices = np.fromiter((i for row in rows for i in row), dtype=np.int64, count=indptr[-1])
+            data = np.fromiter((w for row in rows for w in row.values()), dtype=np.float64, count=indptr[-1])
+            return sparse.csr_matrix((data, indices, indptr), shape=(len(rows), n_features))
+        dense = np.zeros((len(rows), n_features))
+        for r, row in enumerate(rows):
+            for index, w in row.items():
+                dense[r, index] = w
+        return dense
@@ -0,0 +1,141 @@
+import re
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Rows sampled per column for value features and profiles
+PROFILE_SAMPLE_ROWS = 200
+
+# Number of hash functions in a MinHash signature
+MINHASH_PERMUTATIONS = 64
+
+# Share of the value-set Jaccard estimate in the profile similarity
+MINHASH_WEIGHT = 0.4
+
+# Pairs scoring below this profile similarity are left unmatched
+MIN_PROFILE_SCORE = 0.5
+
+# Headers generated for columns without one: pandas' 'Unnamed: N', spreadsheet
+# defaults such as '列N' / 'Column N', and empty headers. Bare numbers are
+# real headers (years, codes) and are matched by name.
+_PLACEHOLDER_HEADER_RE = re.compile(
+    r"^(unnamed:\s*\d+(\.\d+)?|列\s*\d+|column\s*\d+)?$",
+    re.IGNORECASE,
+)
+
+_DATE_RE = r"^\d{2,4}[-/.年]\d{1,2}[-/.月]\d{1,2}"
+
+# Lengths are log-scaled against this so that features stay in [0, 1]
+_MAX_LENGTH = 256
+
+_rng = np.random.default_rng(0x5EED)
+# Odd multipliers and offsets of the multiply-add hash family used for MinHash
+_MINHASH_A = (_rng.integers(1, 2**63, MINHASH_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1))[:, None]
+_MINHASH_B = _rng.integers(0, 2**63, MINHASH_PERMUTATIONS, dtype=np.uint64)[:, None]
+
+
+def is_placeholder_header(header) -> bool:
+    """True for generated or meaningless headers such as 'Unnamed: 3' or '列1'"""
+    return bool(_PLACEHOLDER_HEADER_RE.match(str(header).strip()))
+
+
+class ColumnProfile:
+    """
+    Cheap summary of a column's sampled values.
+
+    features is a fixed-length vector in [0, 1]: null rate, value type shares
+    (integer, decimal, date, text), length quantiles and character class shares
+    (digit, latin, kana, kanji, space, other). signature is a MinHash of the
+    distinct values, used to estimate how much two columns' values overlap.
+    """
+
+    def __init__(self, features: np.ndarray, signature: Optional[np.ndarray]):
+        self.features = features
+        self.signature = signature
+
+
+def profile_column(values: list) -> ColumnProfile:
+    """Profile a column from its sampled normalized (string) values; "" marks a null"""
+    series = pd.Series(values, dtype=object).astype(str)
+    total = len(series)
+    present = series[series != ""]
+    null_rate = 1 - len(present) / total if total else 1.0
+
+    if len(present) == 0:
+        return ColumnProfile(np.concatenate([[null_rate], np.zeros(13)]), None)
+
+    numeric = pd.to_numeric(present, errors="coerce")
+    is_numeric = numeric.notna().to_numpy()
+    is_integer = is_numeric & present.str.fullmatch(r"-?\d+").to_numpy()
+    is_date = ~is_numeric & present.str.match(_DATE_RE).to_numpy()
+    type_shares = [
+        is_integer.mean(),
+        (is_numeric & ~is_integer).mean(),
+        is_date.mean(),
+        (~is_numeric & ~is_date).mean(),
+    ]
+
+    lengths = present.str.len().to_numpy()
+    length_quantiles = np.log1p(np.quantile(lengths, [0.1, 0.5, 0.9])) / np.log1p(_MAX_LENGTH)
+
+    # Classify every character of the sample at once by code point
+    codes = np.frombuffer("".join(present).encode("utf-32-le"), dtype=np.uint32)
+    digit = (codes >= 0x30) & (codes <= 0x39)
+    latin = ((codes >= 0x41) & (codes <= 0x5A)) | ((codes >= 0x61) & (codes <= 0x7A))
+    kana = (codes >= 0x3040) & (codes <= 0x30FF)
+    kanji = (codes >= 0x4E00) & (codes <= 0x9FFF)
+    space = (codes == 0x20) | (codes == 0x3000)
+    other = ~(digit | latin | kana | kanji | space)
+    char_shares = [m.mean() if len(codes) else 0.0 for m in (digit, latin, kana, kanji, space, other)]
+
+    features = np.clip(
+        np.concatenate([[null_rate], type_shares, length_quantiles, char_shares]), 0.0, 1.0
+    )
+
+    hashes = pd.util.hash_array(pd.unique(present.to_numpy()))
+    signature = (_MINHASH_A * hashes[None, :] + _MINHASH_B).min(axis=1)
+    return ColumnProfile(features, signature)
+
+
+def profile_similarity(a: ColumnProfile, b: ColumnProfile) -> float:
+    """Similarity in [0, 1] from feature distance and estimated value overlap"""
+    feature_similarity = 1.0 - float(np.abs(a.features - b.features).mean())
+    if a.signature is None or b.signature is None:
+        overlap = 1.0 if a.signature is None and b.signature is None else 0.0
+    else:
+        overlap = float((a.signature == b.signature).mean())
+    return (1 - MINHASH_WEIGHT) * feature_similarity + MINHASH_WEIGHT * overlap
+
+
+def match_by_profile(
+    gt_headers: list,
+    robota_headers: list,
+    gt_samples: list,
+    robota_samples: list,
+    min_score: float = MIN_PROFILE_SCORE,
+) -> dict:
+    """
+    Pair columns by the similarity of their value profiles, best pairs first.
+
+    Each column is profiled once (linear in the sampled rows); the pairwise
+    scoring only touches the small per-column feature vectors and signatures.
+    """
+    if not gt_headers or not robota_headers:
+        return {}
+
+    gt_profiles = [profile_column(values) for values in gt_samples]
+    robota_profiles = [profile_column(values) for values in robota_samples]
+    scores = np.array([[profile_similarity(g, r) for r in robota_profiles] for g in gt_profiles])
+
+    mapping = {}
+    used_robota = set()
+    for flat in np.argsort(-scores, axis=None, kind="stable"):
+        i, j = divmod(int(flat), len(robota_headers))
+        if scores[i, j] < min_score:
+            break
+        if gt_headers[i] in mapping or j in used_robota:
+            continue
+        mapping[gt_headers[i]] = robota_headers[j]
+        used_robota.add(j)
+    return mapping
@@ -0,0 +1,170 @@
+import logging
+import os
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Callable, List, Optional
+
+import numpy as np
+
+# Optional pyarrow import
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+    pa = None
+
+from app.services.process_pool import discard_pool, get_pool, worker_service
+
+logger = logging.getLogger(__name__)
+
+# Sheets narrower than this are compared in-process; process start-up and
+# Arrow conversion only pay off when there are many columns to spread
+SHARD_MIN_COLUMNS = 64
+
+# Column confidences callback: (gt_values, ext_values) -> confidences, NaN where matched
+ColumnConfidences = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+# Called with (columns_done, total_columns) as shards complete
+ShardProgress = Callable[[int, int], None]
+
+
+def shard_workers() -> int:
+    """Worker processes for column sharding (COMPARISON_SHARD_WORKERS, default: CPU count)"""
+    return int(os.getenv("COMPARISON_SHARD_WORKERS", str(os.cpu_count() or 1)))
+
+
+def shard_min_columns() -> int:
+    """Minimum mapped columns before a sheet is sharded (COMPARISON_SHARD_MIN_COLUMNS)"""
+    return int(os.getenv("COMPARISON_SHARD_MIN_COLUMNS", str(SHARD_MIN_COLUMNS)))
+
+
+def compare_column_shards(
+    gt_values: np.ndarray,
+    ext_values: np.ndarray,
+    workers: int,
+    column_confidences: ColumnConfidences,
+    progress: Optional[ShardProgress] = None,
+) -> np.ndarray:
+    """
+    Compare aligned columns on a process pool, one contiguous shard of columns per worker.
+
+    Columns that Arrow can represent are written once as an Arrow IPC stream
+    into shared memory; each worker maps it, rebuilds only its own columns and
+    writes their confidences into a shared (rows, columns) float64 matrix.
+    Columns Arrow cannot represent (mixed value types) are compared here with
+    column_confidences while the workers run. progress is called as each
+    shard completes; if it raises, shards not yet started are cancelled.
+
+    A pool broken by a crashed worker is discarded (without touching other
+    requests' work) before BrokenProcessPool is raised.
+
+    Returns:
+        Confidence of every cell, NaN where the cell matched
+    """
+    n_rows, n_cols = gt_values.shape
+    arrays = {}
+    local_columns = []
+    for j in range(n_cols):
+        try:
+            arrays[f"g{j}"] = pa.array(gt_values[:, j], from_pandas=True)
+            arrays[f"e{j}"] = pa.array(ext_values[:, j], from_pandas=True)
+        except (pa.ArrowException, TypeError, ValueError, OverflowError):
+            arrays.pop(f"g{j}", None)
+            local_columns.append(j)
+    local = set(local_columns)
+    shared_columns = [j for j in range(n_cols) if j not in local]
+
+    input_shm = output_shm = None
+    pool = None
+    futures = []
+    try:
+        if arrays:
+            input_shm = _share_table(pa.table(arrays))
+            del arrays
+        output_shm = shared_memory.SharedMemory(create=True, size=max(n_rows * n_cols * 8, 1))
+
+        shards = [[int(j) for j in shard] for shard in np.array_split(shared_columns, workers) if len(shard)]
+        pool = get_pool(workers)
+        futures = {
+            pool.submit(_compare_shard, input_shm.name, output_shm.name, shard, n_rows, n_cols): len(shard)
+            for shard in shards
+        }
+        local_confidences = None
+        if local_columns:
+            local_confidences = column_confidences(
+                gt_values[:, local_columns], ext_values[:, local_columns]
+            )
+        done = len(local_columns)
+        for future in as_completed(futures):
+            future.result()
+            done += futures[future]
+            if progress:
+                progress(done, n_cols)
+
+        confidences = np.ndarray((n_rows, n_cols), dtype=np.float64, buffer=output_shm.buf).copy()
+        if local_columns:
+            confidences[:, local_columns] = local_confidences
+        return confidences
+    except BrokenProcessPool:
+        if pool is not None:
+            discard_pool(pool)
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+        for shm in (input_shm, output_shm):
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+
+
+def _share_table(table) -> shared_memory.SharedMemory:
+    """Write a table as an Arrow IPC stream into a new shared memory block"""
+    sink = pa.MockOutputStream()
+    _write_stream(table, sink)
+    shm = shared_memory.SharedMemory(create=True, size=max(sink.size(), 1))
+    try:
+        _write_stream(table, pa.FixedSizeBufferWriter(pa.py_buffer(shm.buf)))
+    except BaseException:
+        shm.unlink()
+        raise
+    return shm
+
+
+def _write_stream(table, sink) -> None:
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _compare_shard(input_name: str, output_name: str, columns: List[int], n_rows: int, n_cols: int) -> None:
+    """Worker: compare the given columns from the shared Arrow stream into the shared output"""
+    input_shm = shared_memory.SharedMemory(name=input_name)
+    try:
+        gt_values, ext_values = _read_columns(input_shm, columns, n_rows)
+    finally:
+        input_shm.close()
+
+    confidences = worker_service()._column_confidences(gt_values, ext_values)
+    output_shm = shared_memory.SharedMemory(name=output_name)
+    try:
+        np.ndarray((n_rows, n_cols), dtype=np.float64, buffer=output_shm.buf)[:, columns] = confidences
+    finally:
+        output_shm.close()
+
+
+def _read_columns(shm: shared_memory.SharedMemory, columns: List[int], n_rows: int) -> tuple:
+    """
+    Rebuild the given columns of both sheets from the shared Arrow stream.
+
+    Returns (rows, len(columns)) object arrays holding the same Python values
+    the Arrow columns were built from; nothing references the shared buffer afterwards.
+    """
+    table = pa.ipc.open_stream(pa.py_buffer(shm.buf)).read_all()
+    gt_values = np.empty((n_rows, len(columns)), dtype=object)
+    ext_values = np.empty((n_rows, len(columns)), dtype=object)
+    for k, j in enumerate(columns):
+        gt_values[:, k] = table.column(f"g{j}").to_pandas(integer_object_nulls=True).to_numpy(dtype=object)
+        ext_values[:, k] = table.column(f"e{j}").to_pandas(integer_object_nulls=True).to_numpy(dtype=object)
+    return gt_values, ext_values
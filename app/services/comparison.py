@@ -1,14 +1,51 @@
+import heapq
 import io
 import logging
+import math
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
 import pandas as pd
-from typing import Any, Optional
+from typing import Any, BinaryIO, Callable, Optional, Union
 from difflib import SequenceMatcher
 
 from app.schemas.comparison import (
     CellComparison,
     RowComparison,
     ComparisonResult,
+    SheetComparison,
+    MultiSheetComparisonResult,
+    VersionComparison,
+    VersionComparisonResult,
+    ColumnSummary,
+    ComparisonSummary,
+    WrongValueCount,
+    AccuracyEstimate,
+    ColumnEstimate,
+    GateResult,
+    MismatchCell,
+    WorstMismatches,
+)
+from app.services.column_matcher import NgramColumnMatcher
+from app.services.column_profiles import PROFILE_SAMPLE_ROWS, is_placeholder_header, match_by_profile
+from app.services.column_shards import (
+    ARROW_AVAILABLE,
+    compare_column_shards,
+    shard_min_columns,
+    shard_workers,
+)
+from app.services.metrics import metrics, stage_timer
+from app.services.process_pool import map_service_calls, sheet_workers
+from app.services.sampling import (
+    DEFAULT_CONFIDENCE_LEVEL,
+    DEFAULT_MARGIN_OF_ERROR,
+    sample_size_for_margin,
+    stratified_mean,
+    stratified_sample,
+    z_score,
 )
 
 # Optional OpenAI import
@@ -21,13 +58,154 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Number of resolved column mappings kept per service instance
+COLUMN_MAPPING_CACHE_SIZE = 256
+
+# Progress callbacks receive (stage, rows_processed, total_rows) every this many rows
+PROGRESS_INTERVAL_ROWS = 1000
+
+ProgressCallback = Callable[[str, int, int], None]
+
+# Most frequent wrong value pairs reported per column in summary mode
+SUMMARY_TOP_K = 5
+
+# Rows compared per chunk in gate mode before checking whether the outcome is decided
+GATE_CHUNK_ROWS = 1000
+
+# Lowest-confidence mismatches kept by default in worst-mismatch mode
+WORST_MISMATCHES_K = 20
+
+# Inferred column kinds whose raw values are factorized before normalization;
+# within one of these kinds, values that hash alike also normalize alike
+DICTIONARY_DTYPES = frozenset({
+    "empty", "string", "integer", "floating", "mixed-integer-float", "boolean", "datetime", "date",
+})
+
+# Default tab names; workbooks with several tables add a suffix to both,
+# e.g. 正解データ_請求書 / Robota結果_請求書
+GROUND_TRUTH_SHEET = "正解データ"
+EXTRACTED_SHEET = "Robota結果"
+
+# Characters allowed between a sheet prefix and its suffix
+SHEET_SUFFIX_SEPARATORS = "_- "
+
+
+class PreparedGroundTruth:
+    """
+    A ground truth sheet normalized and row-hashed once, for comparing against
+    many extracted versions or storing as a registered dataset.
+
+    normalized is either a 2-D object array or, for a stored dataset, an
+    object with the same length and a take(rows) method that decodes only the
+    requested rows. When a key column is set, key_hashes holds the sorted
+    hashes of its normalized values and key_rows the ground truth row of each
+    hash, so extracted rows can be aligned by key with a binary search.
+    """
+
+    def __init__(
+        self,
+        headers: list,
+        normalized: np.ndarray,
+        row_hashes: np.ndarray,
+        key_column: Optional[int] = None,
+        key_hashes: Optional[np.ndarray] = None,
+        key_rows: Optional[np.ndarray] = None,
+    ):
+        self.headers = headers
+        self.normalized = normalized
+        self.row_hashes = row_hashes
+        self.key_column = key_column
+        self.key_hashes = key_hashes
+        self.key_rows = key_rows
+
+    @property
+    def rows(self) -> int:
+        return len(self.normalized)
+
+    def take(self, rows: np.ndarray) -> np.ndarray:
+        """Normalized values of the given rows as a 2-D object array"""
+        if isinstance(self.normalized, np.ndarray):
+            return self.normalized[rows]
+        return self.normalized.take(rows)
+
+
+class CellMatrix:
+    """
+    Aligned values of a comparison with per-cell match flags and confidences.
+
+    Holds the object arrays the comparison already built (one reference per
+    cell) instead of a CellComparison per cell, for consumers such as the xlsx
+    report that write cells out one row at a time.
+    """
+
+    def __init__(
+        self,
+        headers: list,
+        gt_values: np.ndarray,
+        ext_values: np.ndarray,
+        cell_matches: np.ndarray,
+        confidences: np.ndarray,
+        convert: Callable[[Any], Any],
+    ):
+        self.headers = [str(h) for h in headers]
+        self.gt_values = gt_values
+        self.ext_values = ext_values
+        self.cell_matches = cell_matches
+        self.confidences = confidences
+        self._convert = convert
+
+        self.total_rows = len(cell_matches)
+        self.matched_rows = int(cell_matches.all(axis=1).sum())
+        self.mismatched_rows = self.total_rows - self.matched_rows
+        self.total_cells = int(cell_matches.size)
+        self.matched_cells = int(cell_matches.sum())
+        self.mismatched_cells = self.total_cells - self.matched_cells
+        self.accuracy = (
+            round(self.matched_cells / self.total_cells * 100, 2) if self.total_cells else 100.0
+        )
+        self.average_mismatch_confidence = (
+            round(float(np.nanmean(confidences)), 2) if self.mismatched_cells else None
+        )
+
+    def iter_rows(self):
+        """Yield (row_index, [(ground_truth, extracted, match, confidence), ...]) with native values"""
+        for i in range(self.total_rows):
+            yield i, [
+                (
+                    self._convert(self.gt_values[i, j]),
+                    self._convert(self.ext_values[i, j]),
+                    bool(self.cell_matches[i, j]),
+                    None if self.cell_matches[i, j] else float(self.confidences[i, j]),
+                )
+                for j in range(len(self.headers))
+            ]
+
 
 class ComparisonService:
     """Service for comparing ground truth data with extracted results"""
 
-    def __init__(self):
-        """Initialize the comparison service with optional LLM client"""
+    def __init__(self, match_columns: bool = True):
+        """
+        Initialize the comparison service with optional LLM client.
+
+        Worker processes that only compare already aligned values pass
+        match_columns=False to skip loading the n-gram model and LLM client.
+        """
         self.llm_client = None
+        # (name-based pairs, full mapping or None if values decided it) keyed by
+        # (gt_headers, robota_headers, use_llm)
+        self._column_mapping_cache = OrderedDict()
+        self._column_mapping_lock = threading.Lock()
+        # Local n-gram matcher; COMPARISON_COLUMN_MATCHER=local uses it instead of the LLM
+        self.column_matcher = NgramColumnMatcher.from_file() if match_columns else None
+        self.use_llm_matching = os.getenv("COMPARISON_COLUMN_MATCHER", "auto").lower() != "local"
+        # Wide sheets are compared in column shards on this many processes
+        self.shard_workers = shard_workers()
+        self.shard_min_columns = shard_min_columns()
+        # Sheet pairs and versions are compared on this many processes
+        self.sheet_workers = sheet_workers()
+        if not match_columns:
+            return
         # Try to initialize OpenAI client if API key is available
         if not OPENAI_AVAILABLE:
             logger.info("OpenAI package not installed. Will use rule-based column matching.")
@@ -55,36 +233,985 @@ class ComparisonService:
             logger.info("No OpenAI API key found. Will use rule-based column matching.")
 
     def compare_files(
-        self, excel_file: bytes
+        self,
+        excel_file: Union[bytes, BinaryIO],
+        timings: Optional[dict] = None,
+        progress: Optional[ProgressCallback] = None,
     ) -> ComparisonResult:
         """
         Compare two tabs within a single Excel file and generate comparison results with confidence levels.
 
         Args:
-            excel_file: Bytes content of the Excel file containing both tabs
+            excel_file: Excel file containing both tabs, as bytes or a seekable binary file
+            timings: Optional dict that receives the duration of each stage in seconds
+            progress: Optional callback called with (stage, rows_processed, total_rows);
+                exceptions it raises abort the comparison (used for cancellation)
 
         Returns:
             ComparisonResult with detailed comparison data
         """
+        ground_truth_df, extracted_df = self._read_sheets(excel_file, timings, progress)
+        return self._compare_parsed(ground_truth_df, extracted_df, timings, progress)
+
+    def compare_files_matrix(
+        self,
+        excel_file: Union[bytes, BinaryIO],
+        timings: Optional[dict] = None,
+    ) -> CellMatrix:
+        """
+        Compare the two tabs of an Excel file like compare_files, without building per-cell results.
+
+        Returns:
+            CellMatrix with the aligned values, match flags, confidences and totals
+        """
+        ground_truth_df, extracted_df = self._read_sheets(excel_file, timings)
+        headers, column_mapping = self._match_sheet_columns(ground_truth_df, extracted_df, timings)
+        matrix = self._compare_matrix(ground_truth_df, extracted_df, headers, column_mapping, timings)
+
+        metrics.cells.inc(matrix.total_cells)
+        metrics.mismatched_cells.inc(matrix.mismatched_cells)
+        return matrix
+
+    def summarize_files(
+        self,
+        excel_file: Union[bytes, BinaryIO],
+        top_k: int = SUMMARY_TOP_K,
+        timings: Optional[dict] = None,
+        progress: Optional[ProgressCallback] = None,
+    ) -> ComparisonSummary:
+        """
+        Compare the two tabs of an Excel file and return only aggregate statistics.
+
+        Skips building a CellComparison per cell. Mismatches are counted per
+        distinct (ground truth, extracted) value pair, so confidences are
+        calculated once per pair and the most frequent wrong values per column
+        come from the same counts. The output size depends only on the number
+        of columns and top_k.
+
+        Args:
+            excel_file: Excel file containing both tabs, as bytes or a seekable binary file
+            top_k: Number of most frequent wrong value pairs reported per column
+            timings: Optional dict that receives the duration of each stage in seconds
+            progress: Optional callback called with (stage, rows_processed, total_rows)
+
+        Returns:
+            ComparisonSummary with overall and per-column statistics
+        """
+        ground_truth_df, extracted_df = self._read_sheets(excel_file, timings, progress)
+        headers, column_mapping = self._match_sheet_columns(ground_truth_df, extracted_df, timings, progress)
+
+        total_rows = max(len(ground_truth_df), len(extracted_df))
+        if progress:
+            progress("cell_comparison", 0, total_rows)
+
+        with stage_timer(timings, "cell_comparison"):
+            gt_values, ext_values = self._align_values(
+                ground_truth_df, extracted_df, headers, column_mapping
+            )
+            gt_normalized, ext_normalized, cell_matches = self._encode_values(gt_values, ext_values)
+
+        if progress:
+            progress("confidence", 0, total_rows)
+
+        with stage_timer(timings, "confidence"):
+            summaries = [
+                self._summarize_column(
+                    header,
+                    column_mapping.get(header),
+                    gt_normalized[:, j],
+                    ext_normalized[:, j],
+                    cell_matches[:, j],
+                    top_k,
+                )
+                for j, header in enumerate(headers)
+            ]
+        columns = [column for column, _ in summaries]
+        # Per-column averages are rounded, so the overall one comes from the raw sums
+        confidence_sum = sum(column_sum for _, column_sum in summaries)
+
+        total_cells = int(cell_matches.size)
+        matched_cells = int(cell_matches.sum())
+        mismatched_cells = total_cells - matched_cells
+        matched_rows = int(cell_matches.all(axis=1).sum())
+
+        metrics.cells.inc(total_cells)
+        metrics.mismatched_cells.inc(mismatched_cells)
+        return ComparisonSummary(
+            headers=headers,
+            total_rows=total_rows,
+            matched_rows=matched_rows,
+            mismatched_rows=total_rows - matched_rows,
+            total_cells=total_cells,
+            matched_cells=matched_cells,
+            mismatched_cells=mismatched_cells,
+            accuracy=round(matched_cells / total_cells * 100, 2) if total_cells else 100.0,
+            average_mismatch_confidence=(
+                round(confidence_sum / mismatched_cells, 2) if mismatched_cells else None
+            ),
+            columns=columns,
+        )
+
+    def estimate_accuracy(
+        self,
+        excel_file: Union[bytes, BinaryIO],
+        sample_size: Optional[int] = None,
+        margin_of_error: Optional[float] = DEFAULT_MARGIN_OF_ERROR,
+        confidence_level: float = DEFAULT_CONFIDENCE_LEVEL,
+        seed: Optional[int] = None,
+        timings: Optional[dict] = None,
+    ) -> AccuracyEstimate:
+        """
+        Estimate cell accuracy from a stratified random sample of rows.
+
+        Rows are sampled proportionally from equal blocks of the sheet, so every
+        part of the sheet is represented. Columns are matched and values
+        normalized exactly as in compare_files; only the sampled rows are
+        compared. Confidence intervals use the stratified variance with the
+        finite population correction (normal approximation).
+
+        Args:
+            excel_file: Excel file containing both tabs, as bytes or a seekable binary file
+            sample_size: Number of rows to sample; overrides margin_of_error
+            margin_of_error: Target half-width of the interval as a fraction (0.01 = ±1 point)
+            confidence_level: Confidence level of the intervals
+            seed: Random seed for a reproducible sample
+            timings: Optional dict that receives the duration of each stage in seconds
+
+        Returns:
+            AccuracyEstimate with overall and per-column intervals (percentages)
+        """
+        z = z_score(confidence_level)
+        ground_truth_df, extracted_df = self._read_sheets(excel_file, timings)
+        headers, column_mapping = self._match_sheet_columns(ground_truth_df, extracted_df, timings)
+
+        population = max(len(ground_truth_df), len(extracted_df))
+        if population == 0:
+            # Nothing to sample: an exact estimate of empty sheets, like compare_files
+            return AccuracyEstimate(
+                headers=headers,
+                total_rows=0,
+                sampled_rows=0,
+                exact=True,
+                confidence_level=confidence_level,
+                accuracy=100.0,
+                accuracy_low=100.0,
+                accuracy_high=100.0,
+                margin_of_error=0.0,
+                columns=[
+                    ColumnEstimate(
+                        header=header,
+                        extracted_header=column_mapping.get(header),
+                        accuracy=100.0,
+                        accuracy_low=100.0,
+                        accuracy_high=100.0,
+                    )
+                    for header in headers
+                ],
+            )
+        if sample_size is None:
+            if margin_of_error is None:
+                raise ValueError("Either sample_size or margin_of_error is required")
+            sample_size = sample_size_for_margin(margin_of_error, confidence_level, population)
+        if sample_size < 1:
+            raise ValueError("Sample size must be at least 1")
+
+        with stage_timer(timings, "cell_comparison"):
+            rows, labels, stratum_sizes = stratified_sample(
+                population, sample_size, rng=np.random.default_rng(seed)
+            )
+            gt_values, ext_values = self._align_values(
+                self._take_rows(ground_truth_df, rows),
+                self._take_rows(extracted_df, rows),
+                headers,
+                column_mapping,
+            )
+            _, _, cell_matches = self._encode_values(gt_values, ext_values)
+
+        row_accuracy = cell_matches.mean(axis=1) if headers else np.ones(len(rows))
+        (accuracy,), (overall_error,) = stratified_mean(row_accuracy, labels, stratum_sizes)
+        column_accuracy, column_errors = stratified_mean(cell_matches, labels, stratum_sizes)
+
+        def interval(mean: float, error: float) -> tuple:
+            return (
+                round(mean * 100, 2),
+                round(max(0.0, mean - z * error) * 100, 2),
+                round(min(1.0, mean + z * error) * 100, 2),
+            )
+
+        overall = interval(accuracy, overall_error)
+        return AccuracyEstimate(
+            headers=headers,
+            total_rows=population,
+            sampled_rows=len(rows),
+            exact=len(rows) == population,
+            confidence_level=confidence_level,
+            accuracy=overall[0],
+            accuracy_low=overall[1],
+            accuracy_high=overall[2],
+            margin_of_error=round(z * overall_error * 100, 2),
+            columns=[
+                ColumnEstimate(
+                    header=header,
+                    extracted_header=column_mapping.get(header),
+                    **dict(zip(("accuracy", "accuracy_low", "accuracy_high"), interval(mean, error))),
+                )
+                for header, mean, error in zip(headers, column_accuracy, column_errors)
+            ],
+        )
+
+    def check_gate(
+        self,
+        excel_file: Union[bytes, BinaryIO],
+        min_accuracy: Optional[float] = None,
+        max_mismatches: Optional[int] = None,
+        chunk_rows: int = GATE_CHUNK_ROWS,
+        timings: Optional[dict] = None,
+    ) -> GateResult:
+        """
+        Check whether extraction accuracy passes a threshold, stopping early once decided.
+
+        Rows are compared in chunks. After each chunk the outcome is decided if
+        it can no longer change: failed when the mismatches so far already break
+        a threshold even if every remaining cell matched, passed when the
+        thresholds hold even if every remaining cell mismatched.
+
+        Args:
+            excel_file: Excel file containing both tabs, as bytes or a seekable binary file
+            min_accuracy: Minimum cell accuracy in percent (0-100)
+            max_mismatches: Maximum number of mismatched cells
+            chunk_rows: Rows compared between checks
+            timings: Optional dict that receives the duration of each stage in seconds
+
+        Returns:
+            GateResult with the outcome, rows examined and mismatches found so far
+        """
+        if min_accuracy is None and max_mismatches is None:
+            raise ValueError("Either min_accuracy or max_mismatches is required")
+        if min_accuracy is not None and not 0 <= min_accuracy <= 100:
+            raise ValueError("min_accuracy must be between 0 and 100")
+        if max_mismatches is not None and max_mismatches < 0:
+            raise ValueError("max_mismatches must not be negative")
+
+        ground_truth_df, extracted_df = self._read_sheets(excel_file, timings)
+        headers, column_mapping = self._match_sheet_columns(ground_truth_df, extracted_df, timings)
+
+        total_rows = max(len(ground_truth_df), len(extracted_df))
+        total_cells = total_rows * len(headers)
+        # Mismatches allowed by min_accuracy: accuracy >= min_accuracy <=> mismatches <= allowed
+        allowed = [max_mismatches] if max_mismatches is not None else []
+        if min_accuracy is not None:
+            allowed.append(math.floor(total_cells * (100 - min_accuracy) / 100 + 1e-9))
+        allowed_mismatches = min(allowed)
+
+        rows_examined = 0
+        mismatched_cells = 0
+        passed = None
+        with stage_timer(timings, "cell_comparison"):
+            while passed is None:
+                remaining_cells = (total_rows - rows_examined) * len(headers)
+                if mismatched_cells > allowed_mismatches:
+                    passed = False
+                elif mismatched_cells + remaining_cells <= allowed_mismatches:
+                    passed = True
+                else:
+                    rows = range(rows_examined, min(rows_examined + chunk_rows, total_rows))
+                    gt_values, ext_values = self._align_values(
+                        self._take_rows(ground_truth_df, rows),
+                        self._take_rows(extracted_df, rows),
+                        headers,
+                        column_mapping,
+                    )
+                    _, _, cell_matches = self._encode_values(gt_values, ext_values)
+                    mismatched_cells += int(cell_matches.size - cell_matches.sum())
+                    rows_examined = rows.stop
+
+        cells_examined = rows_examined * len(headers)
+        metrics.cells.inc(cells_examined)
+        metrics.mismatched_cells.inc(mismatched_cells)
+        return GateResult(
+            passed=passed,
+            decided_early=rows_examined < total_rows,
+            total_rows=total_rows,
+            rows_examined=rows_examined,
+            cells_examined=cells_examined,
+            mismatched_cells=mismatched_cells,
+            accuracy_so_far=(
+                round((cells_examined - mismatched_cells) / cells_examined * 100, 2) if cells_examined else None
+            ),
+            min_accuracy=min_accuracy,
+            max_mismatches=max_mismatches,
+        )
+
+    def worst_mismatches(
+        self,
+        excel_file: Union[bytes, BinaryIO],
+        k: int = WORST_MISMATCHES_K,
+        per_column: bool = False,
+        chunk_rows: int = GATE_CHUNK_ROWS,
+        timings: Optional[dict] = None,
+    ) -> WorstMismatches:
+        """
+        Find the k lowest-confidence mismatches, overall or per column.
+
+        Rows are compared in chunks and each mismatch is offered to a bounded
+        heap (one per column with per_column), so only k candidates per heap
+        are kept alongside running totals. Ties keep the earliest rows.
+
+        Args:
+            excel_file: Excel file containing both tabs, as bytes or a seekable binary file
+            k: Number of mismatches to keep (per column with per_column)
+            per_column: Keep the k worst mismatches of every column instead of overall
+            chunk_rows: Rows compared per chunk
+            timings: Optional dict that receives the duration of each stage in seconds
+
+        Returns:
+            WorstMismatches with aggregate statistics and the kept mismatches,
+            lowest confidence first (grouped by column with per_column)
+        """
+        if k < 1:
+            raise ValueError("k must be at least 1")
+
+        ground_truth_df, extracted_df = self._read_sheets(excel_file, timings)
+        headers, column_mapping = self._match_sheet_columns(ground_truth_df, extracted_df, timings)
+        total_rows = max(len(ground_truth_df), len(extracted_df))
+
+        # Heap entries are (-confidence, -row, -column, gt value, extracted value): the root
+        # is the kept mismatch with the highest confidence (latest row on ties), evicted first
+        heaps = {}
+        mismatched_cells = 0
+        confidence_sum = 0.0
+        with stage_timer(timings, "cell_comparison"):
+            for start in range(0, total_rows, chunk_rows):
+                rows = range(start, min(start + chunk_rows, total_rows))
+                gt_values, ext_values = self._align_values(
+                    self._take_rows(ground_truth_df, rows),
+                    self._take_rows(extracted_df, rows),
+                    headers,
+                    column_mapping,
+                )
+                gt_normalized, ext_normalized, cell_matches = self._encode_values(gt_values, ext_values)
+                confidences = self._mismatch_confidences(gt_normalized, ext_normalized, cell_matches)
+
+                for i, j in zip(*np.nonzero(~cell_matches)):
+                    confidence = float(confidences[i, j])
+                    mismatched_cells += 1
+                    confidence_sum += confidence
+                    entry = (-confidence, -(start + int(i)), -int(j), gt_values[i, j], ext_values[i, j])
+                    heap = heaps.setdefault(int(j) if per_column else None, [])
+                    if len(heap) < k:
+                        heapq.heappush(heap, entry)
+                    else:
+                        heapq.heappushpop(heap, entry)
+
+        entries = []
+        for column in sorted(heaps, key=lambda c: -1 if c is None else c):
+            entries.extend(sorted(heaps[column], reverse=True))
+
+        total_cells = total_rows * len(headers)
+        metrics.cells.inc(total_cells)
+        metrics.mismatched_cells.inc(mismatched_cells)
+        return WorstMismatches(
+            headers=headers,
+            k=k,
+            per_column=per_column,
+            total_rows=total_rows,
+            total_cells=total_cells,
+            matched_cells=total_cells - mismatched_cells,
+            mismatched_cells=mismatched_cells,
+            accuracy=round((total_cells - mismatched_cells) / total_cells * 100, 2) if total_cells else 100.0,
+            average_mismatch_confidence=(
+                round(confidence_sum / mismatched_cells, 2) if mismatched_cells else None
+            ),
+            mismatches=[
+                MismatchCell(
+                    row_index=-row,
+                    column=headers[-column],
+                    ground_truth=self._convert_to_native(gt_value),
+                    extracted=self._convert_to_native(ext_value),
+                    confidence=-negative_confidence,
+                )
+                for negative_confidence, row, column, gt_value, ext_value in entries
+            ],
+        )
+
+    def _summarize_column(
+        self,
+        header: str,
+        extracted_header: Optional[str],
+        gt_normalized: np.ndarray,
+        ext_normalized: np.ndarray,
+        matches: np.ndarray,
+        top_k: int,
+    ) -> tuple:
+        """
+        Accuracy, mismatch confidence and most frequent wrong values of one column.
+
+        Returns:
+            (ColumnSummary, sum of the confidences of the column's mismatched cells)
+        """
+        total = len(matches)
+        mismatched = int(total - matches.sum())
+
+        average_confidence = None
+        confidence_sum = 0.0
+        top_wrong_values = []
+        if mismatched:
+            pair_counts = pd.DataFrame(
+                {"ground_truth": gt_normalized[~matches], "extracted": ext_normalized[~matches]}
+            ).value_counts(sort=True)
+            confidences = np.array([
+                self._calculate_confidence(gt_value, ext_value) for gt_value, ext_value in pair_counts.index
+            ])
+            counts = pair_counts.to_numpy()
+            confidence_sum = float((confidences * counts).sum())
+            average_confidence = round(confidence_sum / counts.sum(), 2)
+            top_wrong_values = [
+                WrongValueCount(ground_truth=gt_value, extracted=ext_value, count=int(count))
+                for (gt_value, ext_value), count in pair_counts.head(top_k).items()
+            ]
+
+        summary = ColumnSummary(
+            header=str(header),
+            extracted_header=None if extracted_header is None else str(extracted_header),
+            total_cells=total,
+            matched_cells=total - mismatched,
+            mismatched_cells=mismatched,
+            accuracy=round((total - mismatched) / total * 100, 2) if total else None,
+            average_mismatch_confidence=average_confidence,
+            top_wrong_values=top_wrong_values,
+        )
+        return summary, confidence_sum
+
+    def _read_sheets(
+        self,
+        excel_file: Union[bytes, BinaryIO],
+        timings: Optional[dict] = None,
+        progress: Optional[ProgressCallback] = None,
+    ) -> tuple:
+        """Parse the ground truth and extracted tabs of an Excel file"""
+        if progress:
+            progress("parse", 0, 0)
+
         # Parse Excel file and read specific tabs
-        ground_truth_df = self._parse_excel_sheet(excel_file, "正解データ")
-        extracted_df = self._parse_excel_sheet(excel_file, "Robota結果")
+        with stage_timer(timings, "parse"):
+            workbook = self._open_workbook(excel_file)
+            ground_truth_df = self._parse_excel_sheet(workbook, GROUND_TRUTH_SHEET)
+            extracted_df = self._parse_excel_sheet(workbook, EXTRACTED_SHEET)
+        return ground_truth_df, extracted_df
 
+    def _match_sheet_columns(
+        self,
+        ground_truth_df: pd.DataFrame,
+        extracted_df: pd.DataFrame,
+        timings: Optional[dict] = None,
+        progress: Optional[ProgressCallback] = None,
+    ) -> tuple:
+        """
+        Resolve the column mapping between two parsed sheets.
+
+        Returns:
+            (ground truth headers in reference order, column mapping)
+        """
         # Get headers from both tabs
         gt_headers = [str(h).strip() for h in ground_truth_df.columns]
         robota_headers = [str(h).strip() for h in extracted_df.columns]
 
+        if progress:
+            progress("column_matching", 0, max(len(ground_truth_df), len(extracted_df)))
+
+        with stage_timer(timings, "column_matching"):
+            column_mapping = self._resolve_column_mapping(
+                gt_headers,
+                robota_headers,
+                self._column_samples(ground_truth_df),
+                self._column_samples(extracted_df),
+            )
+        return gt_headers, column_mapping
+
+    def prepare_ground_truth(
+        self,
+        excel_file: Union[bytes, BinaryIO],
+        sheet_name: str = GROUND_TRUTH_SHEET,
+        key_column: Optional[str] = None,
+    ) -> PreparedGroundTruth:
+        """Parse and preprocess a ground truth sheet for registration as a dataset"""
+        workbook = self._open_workbook(excel_file)
+        return self._prepare_ground_truth(self._parse_excel_sheet(workbook, sheet_name), key_column)
+
+    def compare_with_ground_truth(
+        self,
+        ground_truth: PreparedGroundTruth,
+        excel_file: Union[bytes, BinaryIO],
+        extracted_sheet: str = EXTRACTED_SHEET,
+        timings: Optional[dict] = None,
+        progress: Optional[ProgressCallback] = None,
+    ) -> ComparisonResult:
+        """
+        Compare an uploaded extracted sheet against a preprocessed ground truth.
+
+        The extracted_sheet tab is used if the workbook has one, otherwise its
+        first sheet. When the ground truth has a key column, extracted rows are
+        aligned by key instead of by position.
+
+        Ground truth values are reported in their normalized (string) form,
+        since registered datasets keep only normalized values.
+        """
+        if progress:
+            progress("parse", 0, 0)
+
+        with stage_timer(timings, "parse"):
+            workbook = self._open_workbook(excel_file)
+            sheet = extracted_sheet if extracted_sheet in workbook.sheet_names else workbook.sheet_names[0]
+            extracted_df = self._parse_excel_sheet(workbook, sheet)
+
+        headers = ground_truth.headers
+        if progress:
+            progress("column_matching", 0, max(ground_truth.rows, len(extracted_df)))
+
+        with stage_timer(timings, "column_matching"):
+            column_mapping = self._resolve_column_mapping(
+                headers,
+                [str(h).strip() for h in extracted_df.columns],
+                self._prepared_samples(ground_truth),
+                self._column_samples(extracted_df),
+            )
+
+        with stage_timer(timings, "cell_comparison"):
+            ext_values = self._align_extracted(extracted_df, headers, column_mapping, len(extracted_df))
+            key_mapped = ground_truth.key_column is not None and column_mapping.get(headers[ground_truth.key_column])
+            if key_mapped:
+                ext_keys = self._normalize_array(ext_values[:, ground_truth.key_column])
+                order = self._key_order(ground_truth, ext_keys)
+                aligned = np.full((len(order), len(headers)), None, dtype=object)
+                aligned[order >= 0] = ext_values[order[order >= 0]]
+                ext_values = aligned
+            elif ground_truth.key_column is not None:
+                logger.warning("Key column is not matched in the extracted sheet; aligning rows by position")
+
+            max_rows = max(ground_truth.rows, len(ext_values))
+            if len(ext_values) < max_rows:
+                padding = np.full((max_rows - len(ext_values), len(headers)), None, dtype=object)
+                ext_values = np.concatenate([ext_values, padding])
+
+            ext_normalized = self._normalize_array(ext_values)
+            gt_normalized, cell_matches = self._compare_prepared(ground_truth, ext_normalized)
+
+        with stage_timer(timings, "confidence"):
+            confidences = self._mismatch_confidences(
+                gt_normalized, ext_normalized, cell_matches, progress
+            )
+
+        with stage_timer(timings, "result_build"):
+            gt_values = np.where(gt_normalized == "", None, gt_normalized)
+            result = self._build_result(
+                headers, gt_values, ext_values, cell_matches, confidences, progress
+            )
+
+        metrics.cells.inc(result.total_cells)
+        metrics.mismatched_cells.inc(result.mismatched_cells)
+        return result
+
+    def compare_sheet_pairs(
+        self,
+        excel_file: Union[bytes, BinaryIO],
+        ground_truth_prefix: str = GROUND_TRUTH_SHEET,
+        extracted_prefix: str = EXTRACTED_SHEET,
+        max_workers: Optional[int] = None,
+    ) -> MultiSheetComparisonResult:
+        """
+        Compare every ground truth / extracted sheet pair in a workbook.
+
+        Sheets are paired by the suffix after their prefix, so 正解データ_請求書 is
+        compared with Robota結果_請求書 and the unsuffixed tabs with each other.
+        The workbook is opened once and its sheets parsed one after another
+        (openpyxl readers are not thread-safe), and each pair's columns are
+        matched and aligned here, where the LLM client and mapping cache live.
+        The aligned pairs are then encoded and their confidences calculated
+        concurrently on worker processes; the results are built here from the
+        returned confidences.
+
+        Args:
+            excel_file: Excel file as bytes or a seekable binary file
+            ground_truth_prefix: Name prefix of ground truth sheets
+            extracted_prefix: Name prefix of extracted sheets
+            max_workers: Worker processes (COMPARISON_SHEET_WORKERS, default: up to 4, one per CPU)
+
+        Returns:
+            MultiSheetComparisonResult with one result per pair and combined totals
+        """
+        workbook = self._open_workbook(excel_file)
+        pairs, unmatched = self._discover_sheet_pairs(
+            workbook.sheet_names, ground_truth_prefix, extracted_prefix
+        )
+        if not pairs:
+            raise ValueError(
+                f"No sheet pairs found. Name sheets '{ground_truth_prefix}<suffix>' and "
+                f"'{extracted_prefix}<suffix>' with the same suffix."
+            )
+
+        aligned = []
+        for _, gt_sheet, ext_sheet in pairs:
+            ground_truth_df = self._parse_excel_sheet(workbook, gt_sheet)
+            extracted_df = self._parse_excel_sheet(workbook, ext_sheet)
+            headers, column_mapping = self._match_sheet_columns(ground_truth_df, extracted_df)
+            aligned.append((headers, *self._align_values(ground_truth_df, extracted_df, headers, column_mapping)))
+
+        # Only the aligned values go to the workers and only confidences come back
+        confidences = self._map_parallel(
+            "_aligned_confidences", [(gt_values, ext_values) for _, gt_values, ext_values in aligned], max_workers
+        )
+
+        sheets = []
+        for (name, gt_sheet, ext_sheet), (headers, gt_values, ext_values), sheet_confidences in zip(
+            pairs, aligned, confidences
+        ):
+            result = self._build_result(
+                headers, gt_values, ext_values, np.isnan(sheet_confidences), sheet_confidences
+            )
+            metrics.cells.inc(result.total_cells)
+            metrics.mismatched_cells.inc(result.mismatched_cells)
+            sheets.append(SheetComparison(
+                name=name, ground_truth_sheet=gt_sheet, extracted_sheet=ext_sheet, result=result
+            ))
+
+        total_cells = sum(sheet.result.total_cells for sheet in sheets)
+        matched_cells = sum(sheet.result.matched_cells for sheet in sheets)
+        return MultiSheetComparisonResult(
+            sheets=sheets,
+            unmatched_sheets=unmatched,
+            total_cells=total_cells,
+            matched_cells=matched_cells,
+            mismatched_cells=total_cells - matched_cells,
+            accuracy=round(matched_cells / total_cells * 100, 2) if total_cells else None,
+        )
+
+    def compare_versions(
+        self,
+        excel_file: Union[bytes, BinaryIO],
+        extracted_files: Optional[list] = None,
+        ground_truth_sheet: str = GROUND_TRUTH_SHEET,
+        extracted_prefix: str = EXTRACTED_SHEET,
+        max_workers: Optional[int] = None,
+    ) -> VersionComparisonResult:
+        """
+        Compare one ground truth against several extracted versions.
+
+        Versions are the sheets of excel_file whose names start with
+        extracted_prefix, followed by the extracted_files. Each extra file
+        contributes its extracted_prefix sheets, or its first sheet if it has
+        none. The ground truth is parsed, normalized and row-hashed once and
+        each version's columns are matched against it here; the versions are
+        then compared concurrently on worker processes, in one batch per
+        worker so the prepared ground truth is pickled once per worker.
+
+        Args:
+            excel_file: Excel file with the ground truth sheet and optionally extracted tabs
+            extracted_files: Optional list of (name, bytes or binary file) with more versions
+            ground_truth_sheet: Name of the ground truth sheet
+            extracted_prefix: Name prefix of extracted sheets
+            max_workers: Worker processes (COMPARISON_SHEET_WORKERS, default: up to 4, one per CPU)
+
+        Returns:
+            VersionComparisonResult with overall and per-column accuracy for each version
+        """
+        workbook = self._open_workbook(excel_file)
+        ground_truth = self._prepare_ground_truth(self._parse_excel_sheet(workbook, ground_truth_sheet))
+
+        # Tabs of the uploaded workbook share one reader, so they are parsed up front
+        versions = [
+            (sheet, self._parse_excel_sheet(workbook, sheet))
+            for sheet in workbook.sheet_names
+            if sheet != ground_truth_sheet and sheet.startswith(extracted_prefix)
+        ]
+        for name, file_content in extracted_files or []:
+            extra = self._open_workbook(file_content)
+            sheets = [sheet for sheet in extra.sheet_names if sheet.startswith(extracted_prefix)]
+            sheets = sheets or extra.sheet_names[:1]
+            for sheet in sheets:
+                label = name if len(sheets) == 1 else f"{name}:{sheet}"
+                versions.append((label, self._parse_excel_sheet(extra, sheet)))
+
+        if not versions:
+            raise ValueError(
+                f"No extracted versions found. Add '{extracted_prefix}<name>' tabs or upload extracted files."
+            )
+
+        # Columns are matched here, where the LLM client and mapping cache live
+        gt_samples = self._prepared_samples(ground_truth)
+        versions = [
+            (
+                name,
+                extracted_df,
+                self._resolve_column_mapping(
+                    ground_truth.headers,
+                    [str(h).strip() for h in extracted_df.columns],
+                    gt_samples,
+                    self._column_samples(extracted_df),
+                ),
+            )
+            for name, extracted_df in versions
+        ]
+
+        # One contiguous batch per worker, so the ground truth is sent to each worker once
+        workers = max(1, min(max_workers or self.sheet_workers, len(versions)))
+        batch_size = math.ceil(len(versions) / workers)
+        batches = [
+            (ground_truth, versions[start:start + batch_size])
+            for start in range(0, len(versions), batch_size)
+        ]
+        results = [
+            version
+            for batch in self._map_parallel("_compare_version_batch", batches, workers)
+            for version in batch
+        ]
+        for version in results:
+            metrics.cells.inc(version.total_cells)
+            metrics.mismatched_cells.inc(version.mismatched_cells)
+        return VersionComparisonResult(headers=ground_truth.headers, versions=results)
+
+    def _compare_version_batch(self, ground_truth: PreparedGroundTruth, versions: list) -> list:
+        """Compare (name, extracted_df, column_mapping) versions against one prepared ground truth"""
+        return [
+            self._compare_version(name, ground_truth, extracted_df, column_mapping)
+            for name, extracted_df, column_mapping in versions
+        ]
+
+    def _compare_version(
+        self, name: str, ground_truth: PreparedGroundTruth, extracted_df: pd.DataFrame, column_mapping: dict
+    ) -> VersionComparison:
+        """Compare one extracted sheet against a prepared ground truth, keeping only aggregates"""
+        headers = ground_truth.headers
+        max_rows = max(ground_truth.rows, len(extracted_df))
+        ext_normalized = self._normalize_array(
+            self._align_extracted(extracted_df, headers, column_mapping, max_rows)
+        )
+        gt_normalized, cell_matches = self._compare_prepared(ground_truth, ext_normalized)
+        confidences = self._mismatch_confidences(gt_normalized, ext_normalized, cell_matches)
+
+        total_cells = int(cell_matches.size)
+        matched_cells = int(cell_matches.sum())
+        mismatched_cells = total_cells - matched_cells
+        column_accuracy = [
+            round(float(column.mean()) * 100, 2) if max_rows else None
+            for column in cell_matches.T
+        ]
+
+        return VersionComparison(
+            name=name,
+            total_rows=max_rows,
+            matched_rows=int(cell_matches.all(axis=1).sum()),
+            total_cells=total_cells,
+            matched_cells=matched_cells,
+            mismatched_cells=mismatched_cells,
+            accuracy=round(matched_cells / total_cells * 100, 2) if total_cells else 100.0,
+            average_mismatch_confidence=(
+                round(float(np.nanmean(confidences)), 2) if mismatched_cells else None
+            ),
+            column_accuracy=column_accuracy,
+        )
+
+    def _map_parallel(self, method: str, calls: list, max_workers: Optional[int] = None) -> list:
+        """
+        Call a comparison method once per argument tuple, keeping order.
+
+        With more than one worker (max_workers or COMPARISON_SHEET_WORKERS) and
+        more than one call, the calls run on the shared worker process pool, so
+        the method must only compare values it is given. Falls back to calling
+        it in-process when worker processes are unavailable.
+        """
+        workers = max(1, min(max_workers or self.sheet_workers, len(calls)))
+        if workers > 1:
+            try:
+                return map_service_calls(method, calls, workers)
+            except (OSError, BrokenProcessPool) as e:
+                logger.warning(f"Worker processes failed, comparing in-process: {e}")
+        return [getattr(self, method)(*args) for args in calls]
+
+    def _discover_sheet_pairs(
+        self, sheet_names: list, ground_truth_prefix: str, extracted_prefix: str
+    ) -> tuple:
+        """
+        Pair ground truth and extracted sheets by the suffix after their prefix.
+
+        Returns:
+            (list of (suffix, ground truth sheet, extracted sheet) in workbook
+            order, list of sheets with a prefix but no counterpart)
+        """
+        ground_truth = {}
+        extracted = {}
+        # Check the longer prefix first in case one prefix starts with the other
+        prefixes = sorted(
+            [(ground_truth_prefix, ground_truth), (extracted_prefix, extracted)],
+            key=lambda item: len(item[0]),
+            reverse=True,
+        )
+        for sheet in sheet_names:
+            for prefix, sheets in prefixes:
+                if sheet.startswith(prefix):
+                    sheets.setdefault(sheet[len(prefix):].strip(SHEET_SUFFIX_SEPARATORS), sheet)
+                    break
+
+        pairs = [(suffix, sheet, extracted[suffix]) for suffix, sheet in ground_truth.items() if suffix in extracted]
+        paired = {sheet for _, gt_sheet, ext_sheet in pairs for sheet in (gt_sheet, ext_sheet)}
+        unmatched = [
+            sheet for sheet in sheet_names
+            if sheet not in paired and (sheet.startswith(ground_truth_prefix) or sheet.startswith(extracted_prefix))
+        ]
+        return pairs, unmatched
+
+    def _compare_parsed(
+        self,
+        ground_truth_df: pd.DataFrame,
+        extracted_df: pd.DataFrame,
+        timings: Optional[dict] = None,
+        progress: Optional[ProgressCallback] = None,
+    ) -> ComparisonResult:
+        """Match columns and compare two parsed sheets"""
+        # Use ground truth headers as the reference order
+        headers, column_mapping = self._match_sheet_columns(ground_truth_df, extracted_df, timings, progress)
+
+        result = self._compare_dataframes(
+            ground_truth_df, extracted_df, headers, column_mapping, timings, progress
+        )
+
+        metrics.cells.inc(result.total_cells)
+        metrics.mismatched_cells.inc(result.mismatched_cells)
+        return result
+
+    def _resolve_column_mapping(
+        self,
+        gt_headers: list,
+        robota_headers: list,
+        gt_samples: Optional[list] = None,
+        robota_samples: Optional[list] = None,
+    ) -> dict:
+        """
+        Map ground truth columns to extracted columns.
+
+        Uses the LLM when available, then rule-based matching, the local n-gram
+        matcher (with sampled column values when given), a positional fallback
+        when column counts agree and a final lenient fuzzy pass. Columns that
+        remain unmatched are compared against None. Resolved mappings are
+        cached by header lists, so repeated uploads of the same layout skip
+        matching (and the LLM call) entirely. When sampled values decided a
+        pair (headerless or placeholder columns), only the name-based pairs are
+        cached and the value-based stages run again for every upload.
+        """
+        use_llm = self.llm_client is not None and self.use_llm_matching
+        cache_key = (tuple(gt_headers), tuple(robota_headers), use_llm)
+        with self._column_mapping_lock:
+            cached = self._column_mapping_cache.get(cache_key)
+            if cached is not None:
+                self._column_mapping_cache.move_to_end(cache_key)
+        if cached is not None:
+            metrics.cache_hits.inc()
+            name_mapping, column_mapping = cached
+            if column_mapping is not None:
+                return dict(column_mapping)
+            return self._complete_column_mapping(
+                gt_headers, robota_headers, name_mapping, gt_samples, robota_samples
+            )[0]
+
+        name_mapping = self._match_columns_by_name(gt_headers, robota_headers)
+        column_mapping, decided_by_values = self._complete_column_mapping(
+            gt_headers, robota_headers, name_mapping, gt_samples, robota_samples
+        )
+
+        with self._column_mapping_lock:
+            self._column_mapping_cache[cache_key] = (
+                dict(name_mapping), None if decided_by_values else dict(column_mapping)
+            )
+            while len(self._column_mapping_cache) > COLUMN_MAPPING_CACHE_SIZE:
+                self._column_mapping_cache.popitem(last=False)
+        return column_mapping
+
+    def _match_all_columns(
+        self,
+        gt_headers: list,
+        robota_headers: list,
+        gt_samples: Optional[list] = None,
+        robota_samples: Optional[list] = None,
+    ) -> dict:
+        """Run every column matching strategy in turn (see _resolve_column_mapping)"""
+        name_mapping = self._match_columns_by_name(gt_headers, robota_headers)
+        return self._complete_column_mapping(
+            gt_headers, robota_headers, name_mapping, gt_samples, robota_samples
+        )[0]
+
+    def _match_columns_by_name(self, gt_headers: list, robota_headers: list) -> dict:
+        """Match columns by header name with the LLM or rules, leaving placeholder headers unmatched"""
         # Match columns by name (order-independent, with LLM or fuzzy matching)
-        if self.llm_client:
+        if self.llm_client and self.use_llm_matching:
+            metrics.llm_calls.inc()
+            start = time.perf_counter()
             try:
                 column_mapping = self._match_columns_with_llm(gt_headers, robota_headers)
                 logger.info(f"LLM matched {len(column_mapping)} columns")
             except Exception as e:
+                metrics.llm_failures.inc()
                 logger.warning(f"LLM column matching failed: {e}. Falling back to rule-based matching.")
                 column_mapping = self._match_columns(gt_headers, robota_headers)
+            finally:
+                metrics.llm_seconds.observe(time.perf_counter() - start)
         else:
             column_mapping = self._match_columns(gt_headers, robota_headers)
-        
+
+        # Placeholder headers ('Unnamed: 3', '列1') say nothing about the column,
+        # so pairs by such names are left to the value profile matcher
+        return {
+            gt_col: robota_col for gt_col, robota_col in column_mapping.items()
+            if not (is_placeholder_header(gt_col) or is_placeholder_header(robota_col))
+        }
+
+    def _complete_column_mapping(
+        self,
+        gt_headers: list,
+        robota_headers: list,
+        name_mapping: dict,
+        gt_samples: Optional[list] = None,
+        robota_samples: Optional[list] = None,
+    ) -> tuple:
+        """
+        Match the columns name matching left over (see _resolve_column_mapping).
+
+        Returns:
+            (column mapping, whether sampled values decided any pair)
+        """
+        column_mapping = dict(name_mapping)
+        has_samples = gt_samples is not None and robota_samples is not None
+        value_pairs = 0
+
+        # Match remaining columns with the local n-gram matcher (synonyms, sampled values)
+        gt_index, robota_index = self._unmatched_indices(gt_headers, robota_headers, column_mapping)
+        gt_index = [i for i in gt_index if not is_placeholder_header(gt_headers[i])]
+        robota_index = [j for j in robota_index if not is_placeholder_header(robota_headers[j])]
+        if gt_index and robota_index:
+            local_mapping = self.column_matcher.match(
+                [gt_headers[i] for i in gt_index],
+                [robota_headers[j] for j in robota_index],
+                [gt_samples[i] for i in gt_index] if gt_samples is not None else None,
+                [robota_samples[j] for j in robota_index] if robota_samples is not None else None,
+            )
+            if local_mapping:
+                logger.info(f"Local matcher matched {len(local_mapping)} columns: {local_mapping}")
+                if gt_samples is not None or robota_samples is not None:
+                    value_pairs += len(local_mapping)
+            column_mapping.update(local_mapping)
+
+        # Pair what is left (headerless or mislabeled columns) by value profiles
+        gt_index, robota_index = self._unmatched_indices(gt_headers, robota_headers, column_mapping)
+        if gt_index and robota_index and has_samples:
+            profile_mapping = match_by_profile(
+                [gt_headers[i] for i in gt_index],
+                [robota_headers[j] for j in robota_index],
+                [gt_samples[i] for i in gt_index],
+                [robota_samples[j] for j in robota_index],
+            )
+            if profile_mapping:
+                logger.info(f"Profile matcher matched {len(profile_mapping)} columns: {profile_mapping}")
+                value_pairs += len(profile_mapping)
+            column_mapping.update(profile_mapping)
+
         # Validate that we can match all columns
         unmatched_gt = [col for col in gt_headers if col not in column_mapping]
         if unmatched_gt:
@@ -143,113 +1270,448 @@ class ComparisonService:
                 
                 # For unmatched columns, we'll compare against None/empty values
                 # This allows the comparison to proceed rather than failing
-        
-        # Use ground truth headers as the reference order
-        headers = gt_headers
 
-        # Compare row by row
-        rows = []
-        matched_row_count = 0
-        mismatched_row_count = 0
-        matched_cell_count = 0
-        mismatched_cell_count = 0
-        total_confidence = 0.0
-        confidence_count = 0
+        return column_mapping, value_pairs > 0
 
-        max_rows = max(len(ground_truth_df), len(extracted_df))
+    def _unmatched_indices(self, gt_headers: list, robota_headers: list, column_mapping: dict) -> tuple:
+        """Positions of ground truth and extracted columns not yet in the mapping"""
+        used_robota = set(column_mapping.values())
+        return (
+            [i for i, col in enumerate(gt_headers) if col not in column_mapping],
+            [j for j, col in enumerate(robota_headers) if col not in used_robota],
+        )
 
-        for i in range(max_rows):
-            row_cells = []
-            row_matches = True
-
-            for col in headers:
-                # Get ground truth value
-                gt_value = (
-                    ground_truth_df.iloc[i][col]
-                    if i < len(ground_truth_df)
-                    else None
+    def _sample_rows(self, total_rows: int, size: int = PROFILE_SAMPLE_ROWS) -> np.ndarray:
+        """Indices of up to size rows spread evenly over the sheet"""
+        return np.unique(np.linspace(0, total_rows - 1, min(total_rows, size)).astype(np.int64))
+
+    def _column_samples(self, df: pd.DataFrame, size: int = PROFILE_SAMPLE_ROWS) -> list:
+        """Normalized values of sampled rows for each column ("" for empty cells)"""
+        sample = df.iloc[self._sample_rows(len(df), size)]
+        return [
+            [self._normalize_value(v) for v in sample.iloc[:, j].tolist()]
+            for j in range(sample.shape[1])
+        ]
+
+    def _prepared_samples(self, ground_truth: PreparedGroundTruth, size: int = PROFILE_SAMPLE_ROWS) -> list:
+        """Normalized values of sampled rows for each prepared ground truth column"""
+        sample = ground_truth.take(self._sample_rows(ground_truth.rows, size))
+        return [sample[:, j].tolist() for j in range(len(ground_truth.headers))]
+
+    def _compare_dataframes(
+        self,
+        ground_truth_df: pd.DataFrame,
+        extracted_df: pd.DataFrame,
+        headers: list,
+        column_mapping: dict,
+        timings: Optional[dict] = None,
+        progress: Optional[ProgressCallback] = None,
+    ) -> ComparisonResult:
+        """
+        Compare two parsed sheets cell by cell using the resolved column mapping.
+
+        Each column is dictionary-encoded across both sheets, so values are
+        normalized once per distinct value and cells are compared as integer
+        codes. Confidences are only calculated for mismatched cells, once per
+        distinct mismatched pair. Wide sheets are split into column shards
+        compared on worker processes, in which case encoding and confidences
+        both run in the workers and are timed as the confidence stage.
+        """
+        matrix = self._compare_matrix(ground_truth_df, extracted_df, headers, column_mapping, timings, progress)
+
+        with stage_timer(timings, "result_build"):
+            return self._build_result(
+                headers, matrix.gt_values, matrix.ext_values, matrix.cell_matches, matrix.confidences, progress
+            )
+
+    def _compare_matrix(
+        self,
+        ground_truth_df: pd.DataFrame,
+        extracted_df: pd.DataFrame,
+        headers: list,
+        column_mapping: dict,
+        timings: Optional[dict] = None,
+        progress: Optional[ProgressCallback] = None,
+    ) -> CellMatrix:
+        """Align, encode and compare two parsed sheets and calculate mismatch confidences"""
+        total_rows = max(len(ground_truth_df), len(extracted_df))
+        if progress:
+            progress("cell_comparison", 0, total_rows)
+
+        with stage_timer(timings, "cell_comparison"):
+            # Align both sheets to the ground truth column order
+            gt_values, ext_values = self._align_values(
+                ground_truth_df, extracted_df, headers, column_mapping
+            )
+
+        confidences = None
+        if self._shard_count(gt_values.shape[1]) > 1:
+            with stage_timer(timings, "confidence"):
+                confidences = self._sharded_confidences(gt_values, ext_values, progress)
+                if confidences is not None:
+                    cell_matches = np.isnan(confidences)
+
+        if confidences is None:
+            with stage_timer(timings, "cell_comparison"):
+                gt_normalized, ext_normalized, cell_matches = self._encode_values(
+                    gt_values, ext_values, progress
+                )
+            with stage_timer(timings, "confidence"):
+                confidences = self._mismatch_confidences(
+                    gt_normalized, ext_normalized, cell_matches, progress
                 )
-                # Get extracted value using column mapping
-                mapped_col = column_mapping.get(col)
-                if mapped_col and mapped_col in extracted_df.columns:
-                    ext_value = (
-                        extracted_df.iloc[i][mapped_col] if i < len(extracted_df) else None
-                    )
-                else:
-                    # Column not matched - compare against None/empty
-                    ext_value = None
-                    if col not in column_mapping:
-                        logger.debug(f"Column '{col}' not matched, comparing against None")
 
-                # Normalize values for comparison
-                gt_normalized = self._normalize_value(gt_value)
-                ext_normalized = self._normalize_value(ext_value)
+        return CellMatrix(headers, gt_values, ext_values, cell_matches, confidences, self._convert_to_native)
 
-                # Check if values match
-                matches = gt_normalized == ext_normalized
+    def _shard_count(self, n_cols: int) -> int:
+        """
+        Worker processes a sheet with n_cols mapped columns is sharded over.
 
-                # Count cell matches/mismatches
-                if matches:
-                    matched_cell_count += 1
-                else:
-                    mismatched_cell_count += 1
-                    row_matches = False
-
-                # Calculate confidence if mismatch
-                confidence = None
-                if not matches:
-                    confidence = self._calculate_confidence(
-                        gt_normalized, ext_normalized
-                    )
-                    total_confidence += confidence
-                    confidence_count += 1
+        1 (compare in-process) when Arrow is not installed, the sheet has fewer
+        than shard_min_columns columns or fewer than two workers are configured.
+        """
+        workers = min(self.shard_workers, n_cols)
+        if not ARROW_AVAILABLE or workers < 2 or n_cols < self.shard_min_columns:
+            return 1
+        return workers
+
+    def _sharded_confidences(
+        self,
+        gt_values: np.ndarray,
+        ext_values: np.ndarray,
+        progress: Optional[ProgressCallback] = None,
+    ) -> Optional[np.ndarray]:
+        """
+        Cell confidences computed by column shards on worker processes.
+
+        Returns None, for an in-process comparison, when shared memory is
+        unavailable on this host or a worker process crashed.
+        """
+        n_rows, n_cols = gt_values.shape
+        shard_progress = None
+        if progress:
+            def shard_progress(columns_done: int, total_columns: int) -> None:
+                progress("confidence", n_rows * columns_done // total_columns, n_rows)
+        try:
+            return compare_column_shards(
+                gt_values, ext_values, self._shard_count(n_cols), self._column_confidences, shard_progress
+            )
+        except (OSError, BrokenProcessPool) as e:
+            logger.warning(f"Column sharding failed, comparing in-process: {e}")
+            return None
+
+    def _aligned_confidences(self, gt_values: np.ndarray, ext_values: np.ndarray) -> np.ndarray:
+        """Confidence of every cell of aligned raw values, in column shards for wide sheets"""
+        confidences = None
+        if self._shard_count(gt_values.shape[1]) > 1:
+            confidences = self._sharded_confidences(gt_values, ext_values)
+        if confidences is None:
+            confidences = self._column_confidences(gt_values, ext_values)
+        return confidences
+
+    def _column_confidences(self, gt_values: np.ndarray, ext_values: np.ndarray) -> np.ndarray:
+        """Confidence of every cell of aligned raw values, NaN where the cell matched"""
+        gt_normalized, ext_normalized, cell_matches = self._encode_values(gt_values, ext_values)
+        return self._mismatch_confidences(gt_normalized, ext_normalized, cell_matches)
+
+    def _mismatch_confidences(
+        self,
+        gt_normalized: np.ndarray,
+        ext_normalized: np.ndarray,
+        cell_matches: np.ndarray,
+        progress: Optional[ProgressCallback] = None,
+    ) -> np.ndarray:
+        """
+        Confidence of every mismatched cell, NaN where the cell matched.
+
+        The same misread value tends to repeat down a column, so each column's
+        mismatched (ground truth, extracted) pairs are encoded and the
+        confidence is calculated once per distinct pair.
+        """
+        total_rows, n_cols = cell_matches.shape
+        confidences = np.full(cell_matches.shape, np.nan)
+        for j in range(n_cols):
+            rows = np.flatnonzero(~cell_matches[:, j])
+            if len(rows):
+                gt_codes, gt_dictionary = pd.factorize(gt_normalized[rows, j])
+                ext_codes, ext_dictionary = pd.factorize(ext_normalized[rows, j])
+                n_ext = len(ext_dictionary)
+                pair_codes, inverse = np.unique(
+                    gt_codes.astype(np.int64) * n_ext + ext_codes, return_inverse=True
+                )
+                pair_confidences = np.array([
+                    self._calculate_confidence(gt_dictionary[code // n_ext], ext_dictionary[code % n_ext])
+                    for code in pair_codes
+                ])
+                confidences[rows, j] = pair_confidences[inverse]
+            if progress:
+                progress("confidence", total_rows * (j + 1) // n_cols, total_rows)
+        return confidences
+
+    def _build_result(
+        self,
+        headers: list,
+        gt_values: np.ndarray,
+        ext_values: np.ndarray,
+        cell_matches: np.ndarray,
+        confidences: np.ndarray,
+        progress: Optional[ProgressCallback] = None,
+    ) -> ComparisonResult:
+        """Assemble the ComparisonResult from the per-cell match and confidence matrices"""
+        max_rows = len(cell_matches)
+
+        rows = []
+        for i in range(max_rows):
+            if progress and i % PROGRESS_INTERVAL_ROWS == 0:
+                progress("result_build", i, max_rows)
+
+            row_cells = []
+            for j in range(len(headers)):
+                matches = bool(cell_matches[i, j])
 
                 # Convert numpy types to native Python types for JSON serialization
-                gt_value_clean = self._convert_to_native(gt_value)
-                ext_value_clean = self._convert_to_native(ext_value)
-                
+                gt_value_clean = self._convert_to_native(gt_values[i, j])
+                ext_value_clean = self._convert_to_native(ext_values[i, j])
+
                 cell_comparison = CellComparison(
                     value=gt_value_clean,
                     ground_truth=gt_value_clean,
                     extracted=ext_value_clean,
                     match=matches,
-                    confidence=confidence,
+                    confidence=None if matches else float(confidences[i, j]),
                 )
                 row_cells.append(cell_comparison)
 
-            if row_matches:
-                matched_row_count += 1
-            else:
-                mismatched_row_count += 1
-
             rows.append(RowComparison(row_index=i, cells=row_cells))
 
-        # Calculate total cells
-        total_cells = matched_cell_count + mismatched_cell_count
-
-        # Calculate accuracy: percentage of cells that matched
-        accuracy = (
-            (matched_cell_count / total_cells * 100) if total_cells > 0 else 100.0
-        )
-
-        # Calculate average confidence of mismatched cells (for reference)
-        average_mismatch_confidence = (
-            (total_confidence / confidence_count) if confidence_count > 0 else None
-        )
+        if progress:
+            progress("result_build", max_rows, max_rows)
 
+        totals = CellMatrix(headers, gt_values, ext_values, cell_matches, confidences, self._convert_to_native)
         return ComparisonResult(
-            headers=[str(h) for h in headers],  # Ensure headers are strings
+            headers=totals.headers,
             rows=rows,
-            total_rows=int(max_rows),
-            matched_rows=int(matched_row_count),
-            mismatched_rows=int(mismatched_row_count),
-            total_cells=int(total_cells),
-            matched_cells=int(matched_cell_count),
-            mismatched_cells=int(mismatched_cell_count),
-            accuracy=round(accuracy, 2),
-            average_mismatch_confidence=round(average_mismatch_confidence, 2) if average_mismatch_confidence is not None else None,
+            total_rows=totals.total_rows,
+            matched_rows=totals.matched_rows,
+            mismatched_rows=totals.mismatched_rows,
+            total_cells=totals.total_cells,
+            matched_cells=totals.matched_cells,
+            mismatched_cells=totals.mismatched_cells,
+            accuracy=totals.accuracy,
+            average_mismatch_confidence=totals.average_mismatch_confidence,
         )
 
+    def _align_values(
+        self,
+        ground_truth_df: pd.DataFrame,
+        extracted_df: pd.DataFrame,
+        headers: list,
+        column_mapping: dict,
+    ) -> tuple:
+        """
+        Build object arrays of shape (max_rows, len(headers)) for both sheets.
+
+        Columns follow the ground truth order. Extracted columns come from the
+        column mapping; unmatched columns and rows beyond the end of a sheet
+        are filled with None.
+        """
+        max_rows = max(len(ground_truth_df), len(extracted_df))
+        gt_values = np.full((max_rows, len(headers)), None, dtype=object)
+
+        for j in range(len(headers)):
+            gt_values[: len(ground_truth_df), j] = ground_truth_df.iloc[:, j].to_numpy(dtype=object)
+
+        ext_values = self._align_extracted(extracted_df, headers, column_mapping, max_rows)
+        return gt_values, ext_values
+
+    def _take_rows(self, df: pd.DataFrame, rows) -> pd.DataFrame:
+        """
+        Rows of df at the given ascending positions, leaving out those past its end.
+
+        _align_values pads the missing tail with None. Unlike reindex, which
+        fills missing rows with NaN and so upcasts integer columns to float,
+        the values keep their types and compare and report as in compare_files.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        return df.iloc[rows[rows < len(df)]]
+
+    def _align_extracted(
+        self, extracted_df: pd.DataFrame, headers: list, column_mapping: dict, max_rows: int
+    ) -> np.ndarray:
+        """Object array of extracted values in ground truth column order, padded with None to max_rows"""
+        ext_values = np.full((max_rows, len(headers)), None, dtype=object)
+
+        for j, col in enumerate(headers):
+            mapped_col = column_mapping.get(col)
+            if mapped_col and mapped_col in extracted_df.columns:
+                ext_values[: len(extracted_df), j] = extracted_df[mapped_col].to_numpy(dtype=object)
+            elif col not in column_mapping:
+                # Column not matched - compare against None/empty
+                logger.debug(f"Column '{col}' not matched, comparing against None")
+
+        return ext_values
+
+    def _prepare_ground_truth(
+        self, ground_truth_df: pd.DataFrame, key_column: Optional[str] = None
+    ) -> PreparedGroundTruth:
+        """Canonicalize headers, normalize values and hash rows (and keys) of a ground truth sheet"""
+        headers = [str(h).strip() for h in ground_truth_df.columns]
+        values = np.full((len(ground_truth_df), len(headers)), None, dtype=object)
+        for j in range(len(headers)):
+            values[:, j] = ground_truth_df.iloc[:, j].to_numpy(dtype=object)
+        normalized = self._normalize_array(values)
+        prepared = PreparedGroundTruth(headers, normalized, self._row_hashes(normalized))
+
+        if key_column is not None:
+            key_column = str(key_column).strip()
+            if key_column not in headers:
+                raise ValueError(f"Key column '{key_column}' not found. Available columns: {', '.join(headers)}")
+            prepared.key_column = headers.index(key_column)
+            keys = normalized[:, prepared.key_column]
+            # Only one ground truth row could ever be matched per key value
+            duplicates = pd.unique(keys[pd.Series(keys).duplicated().to_numpy()])
+            if len(duplicates):
+                examples = ", ".join(repr(key) for key in duplicates[:5])
+                raise ValueError(
+                    f"Key column '{key_column}' has {len(duplicates)} duplicate values, e.g. {examples}"
+                )
+            key_hashes = self._key_hashes(keys)
+            order = np.argsort(key_hashes, kind="stable")
+            prepared.key_hashes = key_hashes[order]
+            prepared.key_rows = order.astype(np.int64)
+        return prepared
+
+    def _key_hashes(self, keys: np.ndarray) -> np.ndarray:
+        """64-bit hashes of normalized key values"""
+        return pd.util.hash_array(np.asarray(keys, dtype=object))
+
+    def _key_order(self, ground_truth: PreparedGroundTruth, ext_keys: np.ndarray) -> np.ndarray:
+        """
+        Extracted row for each output row when aligning by the ground truth key column.
+
+        The first len(ground_truth) entries follow the ground truth rows (-1 where
+        no extracted row has that key). Extracted rows with unknown or duplicate
+        keys are appended after them.
+        """
+        hashes = self._key_hashes(ext_keys)
+        positions = np.searchsorted(ground_truth.key_hashes, hashes)
+        positions = np.minimum(positions, max(len(ground_truth.key_hashes) - 1, 0))
+        found = np.zeros(len(hashes), dtype=bool)
+        if len(ground_truth.key_hashes):
+            found = ground_truth.key_hashes[positions] == hashes
+
+        order = np.full(ground_truth.rows, -1, dtype=np.int64)
+        ext_rows = np.flatnonzero(found)
+        gt_rows = ground_truth.key_rows[positions[ext_rows]]
+        # Keep the first extracted row per ground truth row; the rest are extras
+        gt_rows, first = np.unique(gt_rows, return_index=True)
+        order[gt_rows] = ext_rows[first]
+
+        placed = np.zeros(len(hashes), dtype=bool)
+        placed[ext_rows[first]] = True
+        return np.concatenate([order, np.flatnonzero(~placed)])
+
+    def _compare_prepared(self, ground_truth: PreparedGroundTruth, ext_normalized: np.ndarray) -> tuple:
+        """
+        Ground truth values and cell matches for normalized extracted values of at least ground_truth.rows rows.
+
+        Rows whose hash equals the stored ground truth row hash hold the same
+        values as the extracted row, so only the differing rows are read from
+        the ground truth (for a stored dataset, decoded from disk). Rows past
+        the end of the ground truth compare against empty strings.
+        """
+        gt_rows = ground_truth.rows
+        identical = np.zeros(len(ext_normalized), dtype=bool)
+        identical[:gt_rows] = ground_truth.row_hashes == self._row_hashes(ext_normalized[:gt_rows])
+        differing = np.flatnonzero(~identical)
+
+        gt_normalized = ext_normalized.copy()
+        stored = differing[differing < gt_rows]
+        if len(stored):
+            gt_normalized[stored] = ground_truth.take(stored)
+        gt_normalized[gt_rows:] = ""
+
+        cell_matches = np.ones(ext_normalized.shape, dtype=bool)
+        if len(differing):
+            cell_matches[differing] = gt_normalized[differing] == ext_normalized[differing]
+        return gt_normalized, cell_matches
+
+    def _normalize_array(self, values: np.ndarray) -> np.ndarray:
+        """Apply _normalize_value to every element of a 1-D or 2-D object array, once per distinct value"""
+        if values.size == 0:
+            return values.astype(object)
+        if values.ndim == 1:
+            codes, dictionary = self._encode_column(values)
+            return dictionary[codes]
+        normalized = np.empty(values.shape, dtype=object)
+        for j in range(values.shape[1]):
+            codes, dictionary = self._encode_column(values[:, j])
+            normalized[:, j] = dictionary[codes]
+        return normalized
+
+    def _encode_values(
+        self,
+        gt_values: np.ndarray,
+        ext_values: np.ndarray,
+        progress: Optional[ProgressCallback] = None,
+    ) -> tuple:
+        """
+        Normalize and compare two aligned value arrays through per-column dictionaries.
+
+        Both sheets' values of a column share one dictionary of distinct
+        normalized strings, so cell equality is a comparison of integer codes
+        and the normalized arrays only reference the dictionary entries.
+        Progress is reported after every column, so a cancelling callback
+        stops the stage between columns.
+
+        Returns:
+            (gt_normalized, ext_normalized, cell_matches)
+        """
+        n_rows, n_cols = gt_values.shape
+        gt_normalized = np.empty(gt_values.shape, dtype=object)
+        ext_normalized = np.empty(ext_values.shape, dtype=object)
+        cell_matches = np.ones(gt_values.shape, dtype=bool)
+
+        for j in range(n_cols):
+            codes, dictionary = self._encode_column(np.concatenate([gt_values[:, j], ext_values[:, j]]))
+            gt_codes, ext_codes = codes[:n_rows], codes[n_rows:]
+            cell_matches[:, j] = gt_codes == ext_codes
+            gt_normalized[:, j] = dictionary[gt_codes]
+            ext_normalized[:, j] = dictionary[ext_codes]
+            if progress:
+                progress("cell_comparison", n_rows * (j + 1) // n_cols, n_rows)
+        return gt_normalized, ext_normalized, cell_matches
+
+    def _encode_column(self, values: np.ndarray) -> tuple:
+        """
+        Dictionary-encode a 1-D object array by normalized value.
+
+        Returns (codes, dictionary) with dictionary[codes] equal to the
+        normalized values. Columns of a single kind (strings, numbers,
+        booleans, dates) are factorized first so only their distinct values
+        are normalized; mixed columns are normalized element by element, since
+        1, 1.0 and True hash alike but do not all normalize alike.
+        """
+        if pd.api.types.infer_dtype(values, skipna=True) in DICTIONARY_DTYPES:
+            raw_codes, uniques = pd.factorize(values)
+            # Nulls get code -1, which picks the trailing "" entry
+            normalized = np.append(np.frompyfunc(self._normalize_value, 1, 1)(uniques), "").astype(object)
+            unique_codes, dictionary = pd.factorize(normalized)
+            return unique_codes[raw_codes], np.asarray(dictionary, dtype=object)
+
+        normalized = np.frompyfunc(self._normalize_value, 1, 1)(values).astype(object)
+        codes, dictionary = pd.factorize(normalized)
+        return codes, np.asarray(dictionary, dtype=object)
+
+    def _row_hashes(self, normalized: np.ndarray) -> np.ndarray:
+        """Vectorized 64-bit hash of each row of normalized values"""
+        if normalized.shape[1] == 0:
+            # Rows without columns are trivially identical
+            return np.zeros(normalized.shape[0], dtype=np.uint64)
+        return pd.util.hash_pandas_object(
+            pd.DataFrame(normalized), index=False
+        ).to_numpy()
+
     def _parse_file(self, file_content: bytes) -> pd.DataFrame:
         """Parse Excel or CSV file from bytes"""
         file_obj = io.BytesIO(file_content)
@@ -281,13 +1743,37 @@ class ComparisonService:
         # If all attempts failed, raise an error
         raise ValueError("Unable to parse file. Supported formats: Excel (.xlsx, .xls) and CSV. Please ensure the file is a valid Excel or CSV file.")
 
-    def _parse_excel_sheet(self, file_content: bytes, sheet_name: str) -> pd.DataFrame:
-        """Parse a specific sheet from an Excel file"""
-        file_obj = io.BytesIO(file_content)
-        
+    def _open_workbook(self, file_content: Union[bytes, BinaryIO]) -> pd.ExcelFile:
+        """
+        Open an Excel workbook once so several sheets can be parsed from it.
+
+        Accepts bytes or a seekable binary file object (such as a spooled upload),
+        which is read in place rather than copied into memory.
+        """
+        if isinstance(file_content, (bytes, bytearray)):
+            file_obj = io.BytesIO(file_content)
+        else:
+            file_obj = file_content
+            file_obj.seek(0)
+
+        try:
+            return pd.ExcelFile(file_obj, engine="openpyxl")
+        except Exception as e:
+            raise ValueError(f"Unable to read Excel file. Error: {str(e)}")
+
+    def _parse_excel_sheet(
+        self, file_content: Union[bytes, BinaryIO, pd.ExcelFile], sheet_name: str
+    ) -> pd.DataFrame:
+        """Parse a specific sheet from an Excel file (bytes, file object or open workbook)"""
+        workbook = (
+            file_content
+            if isinstance(file_content, pd.ExcelFile)
+            else self._open_workbook(file_content)
+        )
+
         try:
             # Read specific sheet from Excel file
-            df = pd.read_excel(file_obj, sheet_name=sheet_name, engine="openpyxl")
+            df = workbook.parse(sheet_name=sheet_name)
             return df
         except ValueError as e:
             # Sheet not found
@@ -484,8 +1970,6 @@ Now provide the mapping for the columns above:"""
 
     def _convert_to_native(self, value: Any) -> Any:
         """Convert numpy/pandas types to native Python types for JSON serialization"""
-        import numpy as np
-        
         if value is None or pd.isna(value):
             return None
         if isinstance(value, (np.integer, np.int64, np.int32)):
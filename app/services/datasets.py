@@ -0,0 +1,191 @@
+import logging
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from app.schemas.comparison import DatasetInfo
+from app.services.comparison import PreparedGroundTruth
+
+logger = logging.getLogger(__name__)
+
+# Number of loaded datasets kept in memory per store
+DATASET_CACHE_SIZE = 8
+
+META_FILE = "meta.json"
+STRINGS_FILE = "strings.bin"  # UTF-8 normalized values, column after column
+OFFSETS_FILE = "offsets.npy"  # int64 (columns, rows + 1) byte offsets into strings.bin
+ROW_HASHES_FILE = "row_hashes.npy"  # uint64 per row
+KEY_HASHES_FILE = "key_hashes.npy"  # sorted uint64 key hashes (keyed datasets only)
+KEY_ROWS_FILE = "key_rows.npy"  # int64 ground truth row of each key hash
+
+DATASET_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def dataset_dir() -> Path:
+    """Directory where registered ground truth datasets are stored"""
+    return Path(os.getenv("COMPARISON_DATASET_DIR") or Path(tempfile.gettempdir()) / "comparison-datasets")
+
+
+class StoredValues:
+    """
+    Normalized values of a stored dataset, decoded from the mapped UTF-8 blob on demand.
+
+    Used as PreparedGroundTruth.normalized: take(rows) reads only the offsets
+    and bytes of the requested rows.
+    """
+
+    def __init__(self, strings, offsets: np.ndarray):
+        self._strings = strings
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return self._offsets.shape[1] - 1
+
+    def take(self, rows: np.ndarray) -> np.ndarray:
+        rows = np.asarray(rows, dtype=np.int64)
+        values = np.empty((len(rows), self._offsets.shape[0]), dtype=object)
+        for j in range(values.shape[1]):
+            starts = self._offsets[j, rows].tolist()
+            ends = self._offsets[j, rows + 1].tolist()
+            values[:, j] = [self._strings[a:b].decode("utf-8") for a, b in zip(starts, ends)]
+        return values
+
+
+class DatasetStore:
+    """
+    Registered ground truth datasets stored in preprocessed form.
+
+    Each dataset is a directory of flat files: normalized values as one UTF-8
+    blob with per-column offsets, row hashes and the optional key index as
+    .npy arrays, plus JSON metadata. All files are opened memory-mapped and
+    values are decoded only for the rows a comparison reads, so only the pages
+    it touches are read from disk. Recently used datasets are kept open in a
+    small LRU cache.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, cache_size: int = DATASET_CACHE_SIZE):
+        self._directory = Path(directory) if directory is not None else None
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> Path:
+        return self._directory or dataset_dir()
+
+    def register(self, ground_truth: PreparedGroundTruth, name: str, source_sha256: str = None) -> DatasetInfo:
+        """Write a preprocessed ground truth to disk and return its metadata"""
+        dataset_id = uuid.uuid4().hex
+        self.directory.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=f".{dataset_id}-", dir=self.directory))
+        try:
+            offsets = np.zeros((len(ground_truth.headers), ground_truth.rows + 1), dtype=np.int64)
+            position = 0
+            with open(staging / STRINGS_FILE, "wb") as f:
+                for j in range(len(ground_truth.headers)):
+                    offsets[j, 0] = position
+                    for i, value in enumerate(ground_truth.normalized[:, j]):
+                        encoded = value.encode("utf-8")
+                        f.write(encoded)
+                        position += len(encoded)
+                        offsets[j, i + 1] = position
+            np.save(staging / OFFSETS_FILE, offsets)
+            np.save(staging / ROW_HASHES_FILE, np.asarray(ground_truth.row_hashes, dtype=np.uint64))
+            if ground_truth.key_column is not None:
+                np.save(staging / KEY_HASHES_FILE, np.asarray(ground_truth.key_hashes, dtype=np.uint64))
+                np.save(staging / KEY_ROWS_FILE, np.asarray(ground_truth.key_rows, dtype=np.int64))
+
+            info = DatasetInfo(
+                dataset_id=dataset_id,
+                name=name,
+                headers=ground_truth.headers,
+                rows=ground_truth.rows,
+                key_column=(
+                    ground_truth.headers[ground_truth.key_column] if ground_truth.key_column is not None else None
+                ),
+                created_at=time.time(),
+                source_sha256=source_sha256,
+                size_bytes=sum(path.stat().st_size for path in staging.iterdir()),
+            )
+            (staging / META_FILE).write_text(info.model_dump_json(), encoding="utf-8")
+            os.replace(staging, self.directory / dataset_id)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        logger.info(f"Registered dataset {dataset_id} ({ground_truth.rows} rows, {len(ground_truth.headers)} columns)")
+        return info
+
+    def _path(self, dataset_id: str) -> Optional[Path]:
+        # IDs are generated by register(); reject anything that could escape the directory
+        if not dataset_id or not DATASET_ID_RE.match(dataset_id):
+            return None
+        path = self.directory / dataset_id
+        return path if (path / META_FILE).is_file() else None
+
+    def info(self, dataset_id: str) -> Optional[DatasetInfo]:
+        path = self._path(dataset_id)
+        if path is None:
+            return None
+        return DatasetInfo.model_validate_json((path / META_FILE).read_text(encoding="utf-8"))
+
+    def list_all(self) -> List[DatasetInfo]:
+        """All registered datasets, newest first"""
+        if not self.directory.is_dir():
+            return []
+        datasets = [self.info(path.name) for path in self.directory.iterdir() if path.is_dir()]
+        return sorted((d for d in datasets if d is not None), key=lambda d: d.created_at, reverse=True)
+
+    def load(self, dataset_id: str) -> Optional[PreparedGroundTruth]:
+        """Open a dataset for comparison, or None if it does not exist"""
+        with self._lock:
+            cached = self._cache.get(dataset_id)
+            if cached is not None:
+                self._cache.move_to_end(dataset_id)
+                return cached
+
+        info = self.info(dataset_id)
+        if info is None:
+            return None
+
+        path = self._path(dataset_id)
+        with open(path / STRINGS_FILE, "rb") as f:
+            # mmap cannot map an empty file
+            empty = os.fstat(f.fileno()).st_size == 0
+            strings = b"" if empty else mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        normalized = StoredValues(strings, np.load(path / OFFSETS_FILE, mmap_mode="r"))
+
+        prepared = PreparedGroundTruth(
+            list(info.headers), normalized, np.load(path / ROW_HASHES_FILE, mmap_mode="r")
+        )
+        if info.key_column is not None:
+            prepared.key_column = info.headers.index(info.key_column)
+            prepared.key_hashes = np.load(path / KEY_HASHES_FILE, mmap_mode="r")
+            prepared.key_rows = np.load(path / KEY_ROWS_FILE, mmap_mode="r")
+
+        with self._lock:
+            self._cache[dataset_id] = prepared
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return prepared
+
+    def delete(self, dataset_id: str) -> bool:
+        """Remove a dataset; returns False if it does not exist"""
+        path = self._path(dataset_id)
+        if path is None:
+            return False
+        with self._lock:
+            self._cache.pop(dataset_id, None)
+        shutil.rmtree(path, ignore_errors=True)
+        logger.info(f"Deleted dataset {dataset_id}")
+        return True
@@ -0,0 +1,365 @@
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional
+
+from app.schemas.comparison import (
+    AccuracyTrend,
+    ColumnErrorRate,
+    ColumnSummary,
+    ComparisonResult,
+    HistoryEntry,
+    MismatchCell,
+    TrendPoint,
+)
+
+logger = logging.getLogger(__name__)
+
+# Mismatch rows stored per comparison; summary and per-column statistics are always complete
+HISTORY_MAX_MISMATCHES = 10000
+
+# Seconds a writer waits for another connection's lock
+SQLITE_TIMEOUT_SECONDS = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS comparisons (
+    comparison_id TEXT PRIMARY KEY,
+    dataset TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    source_sha256 TEXT,
+    headers TEXT NOT NULL,
+    total_rows INTEGER NOT NULL,
+    matched_rows INTEGER NOT NULL,
+    total_cells INTEGER NOT NULL,
+    matched_cells INTEGER NOT NULL,
+    mismatched_cells INTEGER NOT NULL,
+    accuracy REAL,
+    average_mismatch_confidence REAL,
+    stored_mismatches INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS comparisons_dataset_time ON comparisons (dataset, created_at);
+CREATE INDEX IF NOT EXISTS comparisons_time ON comparisons (created_at);
+
+CREATE TABLE IF NOT EXISTS column_stats (
+    comparison_id TEXT NOT NULL REFERENCES comparisons (comparison_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    column_name TEXT NOT NULL,
+    total_cells INTEGER NOT NULL,
+    matched_cells INTEGER NOT NULL,
+    mismatched_cells INTEGER NOT NULL,
+    accuracy REAL,
+    average_mismatch_confidence REAL,
+    confidence_sum REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (comparison_id, position)
+);
+CREATE INDEX IF NOT EXISTS column_stats_column ON column_stats (column_name, comparison_id);
+
+CREATE TABLE IF NOT EXISTS mismatches (
+    comparison_id TEXT NOT NULL REFERENCES comparisons (comparison_id) ON DELETE CASCADE,
+    row_index INTEGER NOT NULL,
+    column_name TEXT NOT NULL,
+    ground_truth,
+    extracted,
+    confidence REAL
+);
+CREATE INDEX IF NOT EXISTS mismatches_comparison_column ON mismatches (comparison_id, column_name, row_index);
+"""
+
+COMPARISON_COLUMNS = (
+    "comparison_id, dataset, created_at, source_sha256, headers, total_rows, matched_rows, total_cells, "
+    "matched_cells, mismatched_cells, accuracy, average_mismatch_confidence, stored_mismatches"
+)
+
+
+def history_path() -> Path:
+    """SQLite database file of the comparison history"""
+    return Path(os.getenv("COMPARISON_HISTORY_DB") or Path(tempfile.gettempdir()) / "comparison-history.sqlite3")
+
+
+def history_max_mismatches() -> int:
+    """Mismatch rows stored per comparison (COMPARISON_HISTORY_MAX_MISMATCHES)"""
+    return int(os.getenv("COMPARISON_HISTORY_MAX_MISMATCHES", HISTORY_MAX_MISMATCHES))
+
+
+def _sqlite_value(value):
+    # SQLite stores these natively; anything else (dates, ...) is kept as text
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return str(value)
+
+
+def _accuracy(matched: int, total: int) -> float:
+    return round(matched / total * 100, 2) if total else 100.0
+
+
+class HistoryStore:
+    """
+    Comparison results persisted to a local SQLite database.
+
+    Each recorded comparison keeps its summary statistics, per-column accuracy
+    and up to history_max_mismatches() mismatched cells. Comparisons are
+    indexed by dataset label and time and column statistics by column name,
+    so accuracy trends and the most frequently wrong columns are answered
+    from the stored aggregates without recomputing anything.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self._path = Path(path) if path is not None else None
+        self._initialized = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        return self._path or history_path()
+
+    @contextmanager
+    def _connect(self):
+        """A connection to the database, committed and closed on exit"""
+        path = self.path
+        with self._lock:
+            if self._initialized != path:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with sqlite3.connect(path, timeout=SQLITE_TIMEOUT_SECONDS) as conn:
+                    # WAL lets trend queries read while a comparison is being recorded
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.executescript(SCHEMA)
+                    self._migrate(conn)
+                conn.close()
+                self._initialized = path
+
+        conn = sqlite3.connect(path, timeout=SQLITE_TIMEOUT_SECONDS)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys=ON")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> None:
+        """Add columns introduced after a database was created"""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(column_stats)")}
+        if "confidence_sum" not in columns:
+            conn.execute("ALTER TABLE column_stats ADD COLUMN confidence_sum REAL NOT NULL DEFAULT 0")
+            # Older rows only kept the rounded average; this is the closest sum they allow
+            conn.execute(
+                "UPDATE column_stats SET confidence_sum = "
+                "COALESCE(average_mismatch_confidence, 0) * mismatched_cells"
+            )
+
+    def record(
+        self,
+        result: ComparisonResult,
+        dataset: str,
+        source_sha256: Optional[str] = None,
+        max_mismatches: Optional[int] = None,
+    ) -> str:
+        """Store a comparison result under a dataset label and return its comparison ID"""
+        if max_mismatches is None:
+            max_mismatches = history_max_mismatches()
+        comparison_id = uuid.uuid4().hex
+        headers = list(result.headers)
+
+        matched = [0] * len(headers)
+        confidence_sums = [0.0] * len(headers)
+        mismatch_rows = []
+        for row in result.rows:
+            for j, cell in enumerate(row.cells):
+                if cell.match:
+                    matched[j] += 1
+                    continue
+                confidence = cell.confidence or 0.0
+                confidence_sums[j] += confidence
+                if len(mismatch_rows) < max_mismatches:
+                    mismatch_rows.append((
+                        comparison_id, row.row_index, headers[j],
+                        _sqlite_value(cell.ground_truth), _sqlite_value(cell.extracted), confidence,
+                    ))
+
+        column_rows = []
+        for j, header in enumerate(headers):
+            total = len(result.rows)
+            mismatched = total - matched[j]
+            column_rows.append((
+                comparison_id, j, header, total, matched[j], mismatched, _accuracy(matched[j], total),
+                round(confidence_sums[j] / mismatched, 2) if mismatched else None, confidence_sums[j],
+            ))
+
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT INTO comparisons ({COMPARISON_COLUMNS}) VALUES ({', '.join('?' * 13)})",
+                (
+                    comparison_id, dataset, time.time(), source_sha256, "\x1f".join(headers),
+                    result.total_rows, result.matched_rows, result.total_cells, result.matched_cells,
+                    result.mismatched_cells, result.accuracy, result.average_mismatch_confidence,
+                    len(mismatch_rows),
+                ),
+            )
+            conn.executemany(
+                "INSERT INTO column_stats (comparison_id, position, column_name, total_cells, matched_cells, "
+                "mismatched_cells, accuracy, average_mismatch_confidence, confidence_sum) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                column_rows,
+            )
+            conn.executemany("INSERT INTO mismatches VALUES (?, ?, ?, ?, ?, ?)", mismatch_rows)
+
+        logger.info(
+            f"Recorded comparison {comparison_id} for '{dataset}' "
+            f"({result.mismatched_cells} mismatches, {len(mismatch_rows)} stored)"
+        )
+        return comparison_id
+
+    @staticmethod
+    def _entry(row: sqlite3.Row, columns: List[ColumnSummary] = None) -> HistoryEntry:
+        fields = dict(row)
+        fields["headers"] = fields["headers"].split("\x1f") if fields["headers"] else []
+        return HistoryEntry(**fields, columns=columns or [])
+
+    def list_entries(self, dataset: Optional[str] = None, limit: int = 100) -> List[HistoryEntry]:
+        """Stored comparisons, newest first, optionally for one dataset"""
+        where, params = ("WHERE dataset = ?", [dataset]) if dataset is not None else ("", [])
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {COMPARISON_COLUMNS} FROM comparisons {where} ORDER BY created_at DESC, rowid DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def get(self, comparison_id: str) -> Optional[HistoryEntry]:
+        """A stored comparison with its per-column statistics, or None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {COMPARISON_COLUMNS} FROM comparisons WHERE comparison_id = ?", (comparison_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            columns = conn.execute(
+                "SELECT column_name, total_cells, matched_cells, mismatched_cells, accuracy, "
+                "average_mismatch_confidence FROM column_stats WHERE comparison_id = ? ORDER BY position",
+                (comparison_id,),
+            ).fetchall()
+        return self._entry(row, [
+            ColumnSummary(
+                header=c["column_name"],
+                total_cells=c["total_cells"],
+                matched_cells=c["matched_cells"],
+                mismatched_cells=c["mismatched_cells"],
+                accuracy=c["accuracy"],
+                average_mismatch_confidence=c["average_mismatch_confidence"],
+            )
+            for c in columns
+        ])
+
+    def mismatches(self, comparison_id: str, column: Optional[str] = None, limit: int = 1000) -> List[MismatchCell]:
+        """Stored mismatched cells of a comparison in row order, optionally for one column"""
+        query = "SELECT row_index, column_name, ground_truth, extracted, confidence FROM mismatches WHERE comparison_id = ?"
+        params = [comparison_id]
+        if column is not None:
+            query += " AND column_name = ?"
+            params.append(column)
+        with self._connect() as conn:
+            rows = conn.execute(f"{query} ORDER BY row_index, rowid LIMIT ?", (*params, limit)).fetchall()
+        return [
+            MismatchCell(
+                row_index=r["row_index"],
+                column=r["column_name"],
+                ground_truth=r["ground_truth"],
+                extracted=r["extracted"],
+                confidence=r["confidence"],
+            )
+            for r in rows
+        ]
+
+    def accuracy_trend(
+        self,
+        dataset: str,
+        column: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 100,
+    ) -> AccuracyTrend:
+        """Overall or per-column accuracy of a dataset's latest comparisons, oldest first"""
+        conditions = ["c.dataset = ?"]
+        params = [dataset]
+        if since is not None:
+            conditions.append("c.created_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("c.created_at <= ?")
+            params.append(until)
+
+        if column is None:
+            query = (
+                "SELECT c.comparison_id, c.created_at, c.total_cells, c.mismatched_cells, c.accuracy "
+                "FROM comparisons c"
+            )
+        else:
+            query = (
+                "SELECT c.comparison_id, c.created_at, s.total_cells, s.mismatched_cells, s.accuracy "
+                "FROM column_stats s JOIN comparisons c ON c.comparison_id = s.comparison_id"
+            )
+            conditions.append("s.column_name = ?")
+            params.append(column)
+
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"{query} WHERE {' AND '.join(conditions)} ORDER BY c.created_at DESC, c.rowid DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return AccuracyTrend(
+            dataset=dataset,
+            column=column,
+            points=[TrendPoint(**dict(row)) for row in reversed(rows)],
+        )
+
+    def worst_columns(
+        self, dataset: Optional[str] = None, since: Optional[float] = None, limit: int = 10
+    ) -> List[ColumnErrorRate]:
+        """Columns with the highest mismatch rate over the stored comparisons"""
+        conditions = []
+        params = []
+        if dataset is not None:
+            conditions.append("c.dataset = ?")
+            params.append(dataset)
+        if since is not None:
+            conditions.append("c.created_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT s.column_name, COUNT(*) AS comparisons, SUM(s.total_cells) AS total_cells, "
+                "SUM(s.mismatched_cells) AS mismatched_cells, "
+                "SUM(s.confidence_sum) AS confidence_sum "
+                f"FROM column_stats s JOIN comparisons c ON c.comparison_id = s.comparison_id {where} "
+                "GROUP BY s.column_name HAVING SUM(s.mismatched_cells) > 0 "
+                "ORDER BY CAST(SUM(s.mismatched_cells) AS REAL) / SUM(s.total_cells) DESC, "
+                "SUM(s.mismatched_cells) DESC, s.column_name LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [
+            ColumnErrorRate(
+                column=r["column_name"],
+                comparisons=r["comparisons"],
+                total_cells=r["total_cells"],
+                mismatched_cells=r["mismatched_cells"],
+                accuracy=_accuracy(r["total_cells"] - r["mismatched_cells"], r["total_cells"]),
+                average_mismatch_confidence=round(r["confidence_sum"] / r["mismatched_cells"], 2),
+            )
+            for r in rows
+        ]
+
+    def delete(self, comparison_id: str) -> bool:
+        """Remove a stored comparison; returns False if it does not exist"""
+        with self._connect() as conn:
+            deleted = conn.execute("DELETE FROM comparisons WHERE comparison_id = ?", (comparison_id,)).rowcount
+        if deleted:
+            logger.info(f"Deleted comparison {comparison_id} from history")
+        return bool(deleted)
@@ -0,0 +1,286 @@
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from app.schemas.comparison import ComparisonResult, JobStatus
+from app.services.admission import AdmissionRejected
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+TERMINAL_STATUSES = (COMPLETED, FAILED, CANCELLED)
+
+# How often a job waiting for admission checks whether it was cancelled
+ADMISSION_POLL_SECONDS = 0.1
+
+# Share of overall progress (start, end) covered by each comparison stage
+STAGE_PROGRESS = {
+    "parse": (0.0, 30.0),
+    "column_matching": (30.0, 35.0),
+    "cell_comparison": (35.0, 50.0),
+    "confidence": (50.0, 70.0),
+    "result_build": (70.0, 100.0),
+}
+
+
+class JobCancelled(Exception):
+    """Raised from the progress callback to stop a cancelled job"""
+
+
+class Job:
+    """State of one asynchronous comparison"""
+
+    def __init__(self, file_path: str):
+        now = time.time()
+        self.job_id = uuid.uuid4().hex
+        self.file_path = file_path
+        self.status = QUEUED
+        self.stage: Optional[str] = None
+        self.rows_processed = 0
+        self.total_rows = 0
+        self.created_at = now
+        self.updated_at = now
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.error_status: Optional[int] = None  # HTTP status matching the failure
+        self.retry_after: Optional[int] = None
+        self.result: Optional[ComparisonResult] = None
+        self.cancel_event = threading.Event()
+        self.future = None
+        # Admission cost and the event loop the admission controller runs on
+        self.cost = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def progress(self) -> float:
+        if self.status == COMPLETED:
+            return 100.0
+        if self.stage not in STAGE_PROGRESS:
+            return 0.0
+        start, end = STAGE_PROGRESS[self.stage]
+        fraction = self.rows_processed / self.total_rows if self.total_rows else 0.0
+        return round(start + (end - start) * min(fraction, 1.0), 1)
+
+
+class JobManager:
+    """
+    Runs comparisons on a local thread pool and tracks their progress.
+
+    Uploaded files are stored on disk until the job finishes. Finished jobs
+    (and their results) are kept for ``retention_seconds`` and then pruned;
+    beyond ``max_retained`` finished jobs the oldest are evicted early. With
+    an admission controller, a job waits for admission under its estimated
+    cost before it runs, like synchronous comparisons.
+    """
+
+    def __init__(
+        self,
+        service,
+        max_workers: int = None,
+        retention_seconds: float = None,
+        max_retained: int = None,
+        admission=None,
+    ):
+        self.service = service
+        self.max_workers = max_workers or int(os.getenv("COMPARISON_JOB_WORKERS", "2"))
+        self.retention_seconds = (
+            retention_seconds
+            if retention_seconds is not None
+            else float(os.getenv("COMPARISON_JOB_RETENTION_SECONDS", "3600"))
+        )
+        self.max_retained = (
+            max_retained if max_retained is not None else int(os.getenv("COMPARISON_JOB_MAX_RETAINED", "100"))
+        )
+        self.admission = admission
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="comparison-job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, file_path: str, cost=None) -> JobStatus:
+        """
+        Queue a comparison of the workbook at file_path; the file is deleted when the job ends.
+
+        When a cost is given and the manager has an admission controller, it
+        must be called from the event loop the controller is used on.
+        """
+        self.prune()
+        job = Job(file_path)
+        if self.admission is not None and cost is not None:
+            job.cost = cost
+            job.loop = asyncio.get_running_loop()
+        with self._lock:
+            self._jobs[job.job_id] = job
+        job.future = self._executor.submit(self._run, job)
+        return self.status(job.job_id)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self.prune()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self, job_id: str) -> Optional[JobStatus]:
+        job = self.get(job_id)
+        if job is None:
+            return None
+        with self._lock:
+            return JobStatus(
+                job_id=job.job_id,
+                status=job.status,
+                stage=job.stage,
+                rows_processed=job.rows_processed,
+                total_rows=job.total_rows,
+                progress=job.progress,
+                created_at=job.created_at,
+                updated_at=job.updated_at,
+                finished_at=job.finished_at,
+                expires_at=job.finished_at + self.retention_seconds if job.finished_at else None,
+                error=job.error,
+            )
+
+    def cancel(self, job_id: str) -> Optional[JobStatus]:
+        """Cancel a queued or running job; finished jobs are left unchanged"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            # Never started: finish it here since _run will not
+            self._finish(job, CANCELLED)
+        return self.status(job_id)
+
+    def prune(self) -> None:
+        """Drop finished jobs older than the retention period, and the oldest beyond max_retained"""
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            finished = sorted(
+                (job for job in self._jobs.values() if job.finished_at is not None),
+                key=lambda job: job.finished_at,
+            )
+            excess = max(len(finished) - self.max_retained, 0)
+            expired = [
+                job.job_id for i, job in enumerate(finished)
+                if i < excess or job.finished_at < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+        if expired:
+            logger.info(f"Pruned {len(expired)} finished comparison jobs")
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: Job) -> None:
+        if job.cancel_event.is_set():
+            self._finish(job, CANCELLED)
+            return
+
+        def progress(stage: str, rows_processed: int, total_rows: int) -> None:
+            if job.cancel_event.is_set():
+                raise JobCancelled()
+            with self._lock:
+                job.stage = stage
+                job.rows_processed = rows_processed
+                job.total_rows = total_rows or job.total_rows
+                job.updated_at = time.time()
+
+        admitted = False
+        start = time.perf_counter()
+        try:
+            if job.cost is not None:
+                admitted = self._admit(job)
+                start = time.perf_counter()
+
+            with self._lock:
+                job.status = RUNNING
+                job.updated_at = time.time()
+
+            with open(job.file_path, "rb") as f:
+                result = self.service.compare_files(f, progress=progress)
+            with self._lock:
+                job.result = result
+            self._finish(job, COMPLETED)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except AdmissionRejected as e:
+            with self._lock:
+                job.retry_after = e.retry_after
+            self._finish(job, FAILED, str(e), 429)
+        except ValueError as e:
+            self._finish(job, FAILED, str(e), 400)
+        except Exception as e:
+            logger.exception(f"Comparison job {job.job_id} failed")
+            self._finish(job, FAILED, f"Internal server error: {str(e)}", 500)
+        finally:
+            if admitted:
+                self._release(job, time.perf_counter() - start)
+
+    def _admit(self, job: Job) -> bool:
+        """
+        Wait for admission on the job's event loop; returns whether the job was admitted.
+
+        Raises:
+            JobCancelled: if the job is cancelled while waiting
+            AdmissionRejected: if the admission queue is full or the wait times out
+        """
+        try:
+            future = asyncio.run_coroutine_threadsafe(self.admission.acquire(job.cost), job.loop)
+        except RuntimeError:
+            # The loop is closed (only outside a long-running server)
+            logger.warning(f"Event loop of comparison job {job.job_id} is closed; running without admission")
+            return False
+        while True:
+            try:
+                future.result(timeout=ADMISSION_POLL_SECONDS)
+                return True
+            except concurrent.futures.CancelledError:
+                # The loop shut down and cancelled its pending tasks
+                logger.warning(f"Event loop of comparison job {job.job_id} shut down; running without admission")
+                return False
+            except concurrent.futures.TimeoutError:
+                cancelled = job.cancel_event.is_set()
+                if not cancelled and job.loop.is_running():
+                    continue
+                if not future.cancel():
+                    # Admitted or rejected just now
+                    future.result()
+                    if cancelled:
+                        self._release(job, None)
+                        raise JobCancelled()
+                    return True
+                if cancelled:
+                    raise JobCancelled()
+                logger.warning(f"Event loop of comparison job {job.job_id} stopped; running without admission")
+                return False
+
+    def _release(self, job: Job, elapsed: Optional[float]) -> None:
+        if job.loop.is_running():
+            job.loop.call_soon_threadsafe(self.admission.release, job.cost, elapsed)
+        else:
+            # Nothing runs on a stopped loop any more, so the budget is returned from here
+            self.admission.release(job.cost, elapsed)
+
+    def _finish(self, job: Job, status: str, error: str = None, error_status: int = None) -> None:
+        with self._lock:
+            if job.status in TERMINAL_STATUSES:
+                return
+            job.status = status
+            job.error = error
+            job.error_status = error_status
+            job.finished_at = job.updated_at = time.time()
+        try:
+            os.remove(job.file_path)
+        except OSError:
+            pass
+        # Jobs that are never polled must not accumulate until the next request
+        self.prune()
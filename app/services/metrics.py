@@ -0,0 +1,181 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+# Latency buckets in seconds, from 1ms up to 2 minutes
+DEFAULT_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+
+
+def _format_labels(label_names: Tuple[str, ...], label_values: Tuple[str, ...], extra: str = "") -> str:
+    """Render a Prometheus label set such as {stage="parse",le="0.1"}"""
+    parts = [f'{name}="{value}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_number(value: float) -> str:
+    """Render a sample value the way Prometheus expects"""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonically increasing counter with optional labels"""
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            return self._values.get(key, 0.0)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values) or ({(): 0.0} if not self.label_names else {})
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series: Dict[Tuple[str, ...], dict] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def count(self, **labels) -> int:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            return series["count"] if series else 0
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {key: {**series, "buckets": list(series["buckets"])} for key, series in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            for bound, bucket_count in zip(self.buckets, series["buckets"]):
+                le = f'le="{_format_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {bucket_count}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_number(series['sum'])}")
+            lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """In-process registry of comparison metrics, rendered in Prometheus text format"""
+
+    def __init__(self):
+        self.requests = Counter(
+            "comparison_requests_total", "Compare requests by HTTP status", ("status",)
+        )
+        self.request_seconds = Histogram(
+            "comparison_request_seconds", "End-to-end compare request latency in seconds"
+        )
+        self.stage_seconds = Histogram(
+            "comparison_stage_seconds", "Time spent in each comparison stage in seconds", ("stage",)
+        )
+        self.cells = Counter("comparison_cells_total", "Cells compared")
+        self.mismatched_cells = Counter("comparison_mismatched_cells_total", "Mismatched cells found")
+        self.llm_calls = Counter("comparison_llm_calls_total", "LLM column matching calls")
+        self.llm_failures = Counter("comparison_llm_failures_total", "Failed LLM column matching calls")
+        self.llm_seconds = Histogram("comparison_llm_seconds", "LLM column matching latency in seconds")
+        self.cache_hits = Counter(
+            "comparison_column_mapping_cache_hits_total", "Column mappings served from cache"
+        )
+        self.queue_seconds = Histogram(
+            "comparison_queue_seconds", "Time compare requests waited for admission in seconds"
+        )
+        self.admission_rejections = Counter(
+            "comparison_admission_rejections_total", "Compare requests rejected by admission control", ("reason",)
+        )
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in (
+            self.requests,
+            self.request_seconds,
+            self.stage_seconds,
+            self.cells,
+            self.mismatched_cells,
+            self.llm_calls,
+            self.llm_failures,
+            self.llm_seconds,
+            self.cache_hits,
+            self.queue_seconds,
+            self.admission_rejections,
+        ):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry used by the service, router and /metrics endpoint
+metrics = MetricsRegistry()
+
+
+@contextmanager
+def stage_timer(timings: Optional[dict], stage: str):
+    """
+    Time a comparison stage.
+
+    The duration in seconds is added to ``timings[stage]`` (when a dict is given)
+    and observed in the stage latency histogram.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+        metrics.stage_seconds.observe(elapsed, stage=stage)
+
+
+def server_timing_header(timings: dict) -> str:
+    """Format stage timings (seconds) as a Server-Timing header value in milliseconds"""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
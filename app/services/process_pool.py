@@ -0,0 +1,104 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the default number of processes for sheet pairs and versions
+SHEET_WORKERS = 4
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+_worker_service = None
+
+
+def sheet_workers() -> int:
+    """Worker processes for sheet pairs and versions (COMPARISON_SHEET_WORKERS, default: up to 4, one per CPU)"""
+    default = min(SHEET_WORKERS, os.cpu_count() or 1)
+    return int(os.getenv("COMPARISON_SHEET_WORKERS", str(default)))
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    """Shared process pool, created on first use and grown when more workers are asked for"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers < workers:
+            if _pool is not None:
+                # Work already submitted to the smaller pool still runs to completion
+                _pool.shutdown(wait=False)
+            # Spawned workers do not inherit the server's threads and locks
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            _pool_workers = workers
+            logger.info(f"Started {workers} comparison worker processes")
+        return _pool
+
+
+def discard_pool(pool: ProcessPoolExecutor) -> None:
+    """
+    Drop a broken pool so the next get_pool starts a fresh one.
+
+    Only the given instance is discarded: if another request already replaced
+    it, the replacement is left alone, and nothing submitted by other requests
+    is cancelled.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def shutdown_pool() -> None:
+    """Stop the comparison worker processes (application shutdown)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def map_service_calls(method: str, calls: list, workers: int) -> list:
+    """
+    Call a ComparisonService method on the shared pool once per argument tuple, keeping order.
+
+    The method runs on each worker's worker_service(), so it must only compare
+    values it is given, not match columns. A pool broken by a crashed worker is
+    discarded before BrokenProcessPool is raised.
+    """
+    pool = get_pool(workers)
+    futures = [pool.submit(_call_service, method, args) for args in calls]
+    try:
+        return [future.result() for future in futures]
+    except BrokenProcessPool:
+        discard_pool(pool)
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def worker_service():
+    """
+    The ComparisonService of this worker process, created on first use.
+
+    It has no LLM client or n-gram matcher and never shards or fans out
+    itself; column mappings are resolved by the parent before work is sent.
+    """
+    global _worker_service
+    if _worker_service is None:
+        from app.services.comparison import ComparisonService
+        _worker_service = ComparisonService(match_columns=False)
+        _worker_service.shard_workers = 1
+        _worker_service.sheet_workers = 1
+    return _worker_service
+
+
+def _call_service(method: str, args: tuple):
+    return getattr(worker_service(), method)(*args)
@@ -0,0 +1,159 @@
+import hmac
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+# Supported output formats and their file suffixes
+PROFILE_FORMATS = {
+    "speedscope": ".speedscope.json",
+    "collapsed": ".collapsed.txt",
+}
+
+DEFAULT_INTERVAL = 0.005  # seconds between samples
+
+
+def profiling_token() -> Optional[str]:
+    """Admin token that enables profiling; profiling is disabled when unset"""
+    return os.getenv("COMPARISON_PROFILE_TOKEN") or None
+
+
+def profile_dir() -> Path:
+    """Directory where captured profiles are stored"""
+    return Path(os.getenv("COMPARISON_PROFILE_DIR") or Path(tempfile.gettempdir()) / "comparison-profiles")
+
+
+def is_authorized(token: Optional[str]) -> bool:
+    """Check a request token against the configured admin token"""
+    expected = profiling_token()
+    if not expected or not token:
+        return False
+    return hmac.compare_digest(expected.encode(), token.encode())
+
+
+class SamplingProfiler:
+    """
+    Sampling profiler for the thread that enters it.
+
+    A background thread records the target thread's Python stack every
+    ``interval`` seconds. Samples can be exported as collapsed stacks (for
+    flamegraph.pl / inferno) or as a speedscope sampled profile.
+    """
+
+    def __init__(self, name: str = "profile", interval: float = DEFAULT_INTERVAL):
+        self.name = name
+        self.interval = interval
+        self.samples = []  # list of (stack tuple root-first, weight seconds)
+        self.duration = 0.0
+        self._target = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._start = 0.0
+
+    def __enter__(self):
+        self._target = threading.get_ident()
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._start
+        return False
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            now = time.perf_counter()
+            if frame is not None:
+                self.samples.append((self._stack(frame), now - last))
+            last = now
+
+    @staticmethod
+    def _stack(frame) -> tuple:
+        """Stack of (function, file, line) tuples from the outermost frame inward"""
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_name, code.co_filename, frame.f_lineno))
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    def collapsed(self) -> str:
+        """Collapsed stacks: one 'frame;frame;frame count' line per unique stack"""
+        counts = Counter()
+        for stack, _ in self.samples:
+            counts[";".join(f"{name} ({Path(filename).name}:{line})" for name, filename, line in stack)] += 1
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(counts.items()))
+
+    def speedscope(self) -> dict:
+        """Speedscope sampled profile (https://www.speedscope.app/file-format-schema.json)"""
+        frames = []
+        frame_index = {}
+        samples = []
+        weights = []
+        for stack, weight in self.samples:
+            indices = []
+            for name, filename, line in stack:
+                key = (name, filename, line)
+                if key not in frame_index:
+                    frame_index[key] = len(frames)
+                    frames.append({"name": name, "file": filename, "line": line})
+                indices.append(frame_index[key])
+            samples.append(indices)
+            weights.append(weight)
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": self.name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": self.duration,
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+            "name": self.name,
+            "exporter": "test-module sampling profiler",
+        }
+
+    def save(self, profile_format: str) -> str:
+        """Write the profile to the profile directory and return its ID"""
+        if profile_format not in PROFILE_FORMATS:
+            raise ValueError(f"Unsupported profile format '{profile_format}'. Use one of: {', '.join(PROFILE_FORMATS)}")
+
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        directory = profile_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{profile_id}{PROFILE_FORMATS[profile_format]}"
+        if profile_format == "collapsed":
+            path.write_text(self.collapsed(), encoding="utf-8")
+        else:
+            path.write_text(json.dumps(self.speedscope()), encoding="utf-8")
+        return profile_id
+
+
+def find_profile(profile_id: str) -> Optional[Path]:
+    """Locate a stored profile by ID, or None if it does not exist"""
+    # Profile IDs are generated by save(); reject anything that could escape the directory
+    if not profile_id or "/" in profile_id or "\\" in profile_id or profile_id.startswith("."):
+        return None
+    for suffix in PROFILE_FORMATS.values():
+        path = profile_dir() / f"{profile_id}{suffix}"
+        if path.is_file():
+            return path
+    return None
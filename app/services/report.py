@@ -0,0 +1,116 @@
+from typing import Any, BinaryIO, Iterator, Union
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+
+from app.schemas.comparison import ComparisonResult
+from app.services.comparison import CellMatrix
+
+REPORT_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+SUMMARY_SHEET = "Summary"
+DIFF_SHEET = "比較結果"
+
+# Named styles are registered once per workbook and shared by every cell that uses them
+HEADER_STYLE = "report_header"
+MISMATCH_STYLE = "report_mismatch"
+ROW_NUMBER_STYLE = "report_row_number"
+
+
+def _named_styles() -> list:
+    header = NamedStyle(name=HEADER_STYLE)
+    header.font = Font(bold=True, color="FFFFFF")
+    header.fill = PatternFill("solid", fgColor="667EEA")
+    header.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+
+    mismatch = NamedStyle(name=MISMATCH_STYLE)
+    mismatch.font = Font(color="721C24")
+    mismatch.fill = PatternFill("solid", fgColor="F8D7DA")
+
+    row_number = NamedStyle(name=ROW_NUMBER_STYLE)
+    row_number.font = Font(bold=True, color="666666")
+    row_number.alignment = Alignment(horizontal="center")
+
+    return [header, mismatch, row_number]
+
+
+def _cell(ws, value: Any, style: str = None) -> WriteOnlyCell:
+    """Build a write-only cell, keeping text literal (no formulas, no illegal characters)"""
+    is_text = isinstance(value, str)
+    if is_text:
+        value = ILLEGAL_CHARACTERS_RE.sub("", value)
+    cell = WriteOnlyCell(ws, value=value)
+    if is_text:
+        # Values such as "=1+2" must not be interpreted as formulas
+        cell.data_type = "s"
+    if style:
+        cell.style = style
+    return cell
+
+
+def _iter_rows(result: Union[ComparisonResult, CellMatrix]) -> Iterator[tuple]:
+    """(row_index, [(ground_truth, extracted, match, confidence), ...]) for each compared row"""
+    if isinstance(result, CellMatrix):
+        yield from result.iter_rows()
+        return
+    for row in result.rows:
+        yield row.row_index, [(c.ground_truth, c.extracted, c.match, c.confidence) for c in row.cells]
+
+
+def write_diff_report(result: Union[ComparisonResult, CellMatrix], output: BinaryIO) -> None:
+    """
+    Write a comparison result as an xlsx report.
+
+    The diff sheet has one row per compared row with the ground truth and
+    extracted values side by side for each column, followed by the similarity
+    of mismatched cells. Both value cells of a mismatch are highlighted.
+
+    The workbook is built with openpyxl's write-only mode and shared named
+    styles, so rows are streamed to disk as they are written. Given a
+    CellMatrix, each row's cells are built from the aligned arrays as it is
+    written, so no per-cell result objects are kept; the arrays themselves
+    still hold one value reference per cell.
+    """
+    wb = Workbook(write_only=True)
+    for style in _named_styles():
+        wb.add_named_style(style)
+
+    summary = wb.create_sheet(SUMMARY_SHEET)
+    summary.column_dimensions["A"].width = 28
+    summary.column_dimensions["B"].width = 16
+    summary.append([_cell(summary, "Metric", HEADER_STYLE), _cell(summary, "Value", HEADER_STYLE)])
+    for label, value in [
+        ("Total Rows", result.total_rows),
+        ("Matched Rows", result.matched_rows),
+        ("Mismatched Rows", result.mismatched_rows),
+        ("Total Cells", result.total_cells),
+        ("Matched Cells", result.matched_cells),
+        ("Mismatched Cells", result.mismatched_cells),
+        ("Accuracy (%)", result.accuracy),
+        ("Average Mismatch Confidence (%)", result.average_mismatch_confidence),
+    ]:
+        summary.append([label, value])
+
+    diff = wb.create_sheet(DIFF_SHEET)
+    diff.freeze_panes = "B2"
+    diff.column_dimensions["A"].width = 8
+
+    header_row = [_cell(diff, "Row", HEADER_STYLE)]
+    for header in result.headers:
+        header_row.append(_cell(diff, f"{header} (正解データ)", HEADER_STYLE))
+        header_row.append(_cell(diff, f"{header} (Robota結果)", HEADER_STYLE))
+        header_row.append(_cell(diff, f"{header} (Confidence %)", HEADER_STYLE))
+    diff.append(header_row)
+
+    for row_index, cells in _iter_rows(result):
+        values = [_cell(diff, row_index + 1, ROW_NUMBER_STYLE)]
+        for ground_truth, extracted, match, confidence in cells:
+            style = None if match else MISMATCH_STYLE
+            values.append(_cell(diff, ground_truth, style))
+            values.append(_cell(diff, extracted, style))
+            values.append(confidence)
+        diff.append(values)
+
+    wb.save(output)
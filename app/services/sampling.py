@@ -0,0 +1,92 @@
+import math
+from statistics import NormalDist
+from typing import Optional
+
+import numpy as np
+
+# Rows are sampled proportionally from this many equal blocks of the sheet
+DEFAULT_STRATA = 20
+
+DEFAULT_CONFIDENCE_LEVEL = 0.95
+DEFAULT_MARGIN_OF_ERROR = 0.01  # ±1 percentage point
+
+
+def z_score(confidence_level: float) -> float:
+    """Two-sided standard normal quantile for a confidence level"""
+    if not 0 < confidence_level < 1:
+        raise ValueError("Confidence level must be between 0 and 1")
+    return NormalDist().inv_cdf(0.5 + confidence_level / 2)
+
+
+def sample_size_for_margin(margin_of_error: float, confidence_level: float, population: int) -> int:
+    """
+    Rows needed to estimate a proportion within margin_of_error.
+
+    Uses the worst case p = 0.5 and the finite population correction, so the
+    margin holds for any accuracy (stratification only makes it tighter).
+    """
+    if not 0 < margin_of_error < 1:
+        raise ValueError("Margin of error must be between 0 and 1")
+    n0 = z_score(confidence_level) ** 2 * 0.25 / margin_of_error ** 2
+    return min(population, math.ceil(n0 / (1 + (n0 - 1) / max(population, 1))))
+
+
+def stratified_sample(
+    population: int, size: int, strata: int = DEFAULT_STRATA, rng: Optional[np.random.Generator] = None
+) -> tuple:
+    """
+    Sample rows without replacement, proportionally from equal blocks of rows.
+
+    Returns:
+        (sorted row indices, stratum of each sampled row, population of each stratum)
+    """
+    rng = rng or np.random.default_rng()
+    size = min(size, population)
+    blocks = [block for block in np.array_split(np.arange(population), max(1, min(strata, size))) if len(block)]
+    stratum_sizes = np.array([len(block) for block in blocks])
+
+    # Proportional allocation with at least two rows per stratum where possible (for the variance)
+    allocation = np.maximum(np.round(size * stratum_sizes / max(population, 1)).astype(int), 2)
+    allocation = np.minimum(allocation, stratum_sizes)
+
+    indices = []
+    labels = []
+    for h, (block, n_h) in enumerate(zip(blocks, allocation)):
+        indices.append(rng.choice(block, size=n_h, replace=False))
+        labels.append(np.full(n_h, h))
+    if not indices:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64), stratum_sizes
+
+    indices = np.concatenate(indices)
+    labels = np.concatenate(labels)
+    order = np.argsort(indices, kind="stable")
+    return indices[order], labels[order], stratum_sizes
+
+
+def stratified_mean(values: np.ndarray, labels: np.ndarray, stratum_sizes: np.ndarray) -> tuple:
+    """
+    Stratified estimate of the population mean of each column of values.
+
+    Args:
+        values: (sampled rows, k) array of per-row observations
+        labels: stratum of each sampled row
+        stratum_sizes: population of each stratum
+
+    Returns:
+        (estimated means, standard errors), each of length k
+    """
+    values = np.asarray(values, dtype=float).reshape(len(labels), -1)
+    population = stratum_sizes.sum()
+    means = np.zeros(values.shape[1])
+    variances = np.zeros(values.shape[1])
+    for h, n_population in enumerate(stratum_sizes):
+        sample = values[labels == h]
+        n_h = len(sample)
+        if n_h == 0:
+            continue
+        weight = n_population / population
+        means += weight * sample.mean(axis=0)
+        if n_h > 1:
+            finite_correction = 1 - n_h / n_population
+            variances += weight ** 2 * finite_correction * sample.var(axis=0, ddof=1) / n_h
+    return means, np.sqrt(variances)
@@ -0,0 +1,229 @@
+import gzip
+import json
+from typing import Optional
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from app.schemas.comparison import ComparisonResponse
+
+# Optional brotli import
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+    brotli = None
+
+# Optional msgpack import
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+    msgpack = None
+
+# Optional pyarrow import
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+    pa = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+def supported_encodings() -> list:
+    """Content encodings this server can produce, in order of preference"""
+    return (["br"] if BROTLI_AVAILABLE else []) + ["gzip"]
+
+
+def _parse_weights(header: str) -> dict:
+    """Parse a comma-separated header with q-values into {token: weight}"""
+    weights = {}
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[token] = weight
+    return weights
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick a content encoding from an Accept-Encoding header.
+
+    Honors q-values (q=0 disables an encoding) and prefers br over gzip when
+    both are acceptable with the same weight. Returns None for identity.
+    """
+    if not accept_encoding:
+        return None
+
+    weights = _parse_weights(accept_encoding)
+    best = None
+    best_weight = 0.0
+    for encoding in supported_encodings():
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    """Compress a response body with the negotiated encoding"""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+
+def encoded_response(
+    body: bytes, media_type: str, accept_encoding: Optional[str] = None, status_code: int = 200
+) -> Response:
+    """Wrap pre-serialized bytes in a Response, compressing if the client accepts it"""
+    headers = {"Vary": "Accept-Encoding"}
+    encoding = negotiate_encoding(accept_encoding) if len(body) >= MIN_COMPRESS_BYTES else None
+    if encoding:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, status_code=status_code, media_type=media_type, headers=headers)
+
+
+def json_response(model: BaseModel, accept_encoding: Optional[str] = None, status_code: int = 200) -> Response:
+    """
+    Serialize a pydantic model straight to JSON bytes.
+
+    Uses pydantic-core's native encoder, skipping the model_dump ->
+    jsonable_encoder -> json.dumps round trip of a plain JSONResponse.
+    """
+    body = model.model_dump_json().encode("utf-8")
+    return encoded_response(body, JSON_MEDIA_TYPE, accept_encoding, status_code)
+
+
+def supported_media_types() -> list:
+    """Response media types this server can produce; JSON is always available"""
+    media_types = [JSON_MEDIA_TYPE]
+    if MSGPACK_AVAILABLE:
+        media_types.append(MSGPACK_MEDIA_TYPE)
+    if ARROW_AVAILABLE:
+        media_types.append(ARROW_MEDIA_TYPE)
+    return media_types
+
+
+def negotiate_media_type(accept: Optional[str]) -> Optional[str]:
+    """
+    Pick a response media type from an Accept header.
+
+    Falls back to JSON when no Accept header is sent or wildcards allow it.
+    Returns None when none of the acceptable types can be produced.
+    """
+    if not accept:
+        return JSON_MEDIA_TYPE
+
+    weights = _parse_weights(accept)
+    best = None
+    best_weight = 0.0
+    for media_type in supported_media_types():
+        main_type = media_type.split("/")[0]
+        weight = weights.get(media_type, weights.get(f"{main_type}/*", weights.get("*/*", 0.0)))
+        if weight > best_weight:
+            best, best_weight = media_type, weight
+    return best
+
+
+def msgpack_response(model: BaseModel, accept_encoding: Optional[str] = None) -> Response:
+    """Serialize a pydantic model as MessagePack"""
+    body = msgpack.packb(model.model_dump(), use_bin_type=True)
+    return encoded_response(body, MSGPACK_MEDIA_TYPE, accept_encoding)
+
+
+def comparison_record_batch(response: ComparisonResponse):
+    """
+    Flatten a comparison result into one Arrow record batch with one row per cell.
+
+    Columns: row_index, column, ground_truth, extracted, match, confidence.
+    Cell values are written as strings (null for empty cells) since a column
+    may mix numbers and text. Summary statistics are stored as JSON in the
+    schema metadata under the "comparison" key.
+    """
+    result = response.result
+    headers = result.headers if result else []
+    rows = result.rows if result else []
+
+    row_index = []
+    column = []
+    ground_truth = []
+    extracted = []
+    match = []
+    confidence = []
+    for row in rows:
+        for header_index, cell in enumerate(row.cells):
+            row_index.append(row.row_index)
+            column.append(header_index)
+            ground_truth.append(None if cell.ground_truth is None else str(cell.ground_truth))
+            extracted.append(None if cell.extracted is None else str(cell.extracted))
+            match.append(cell.match)
+            confidence.append(cell.confidence)
+
+    summary = response.model_dump(exclude={"result": {"rows"}})
+    schema = pa.schema(
+        [
+            ("row_index", pa.int64()),
+            ("column", pa.dictionary(pa.int32(), pa.string())),
+            ("ground_truth", pa.string()),
+            ("extracted", pa.string()),
+            ("match", pa.bool_()),
+            ("confidence", pa.float64()),
+        ],
+        metadata={"comparison": json.dumps(summary, ensure_ascii=False)},
+    )
+    header_dictionary = pa.array([str(h) for h in headers], type=pa.string())
+    return pa.record_batch(
+        [
+            pa.array(row_index, type=pa.int64()),
+            pa.DictionaryArray.from_arrays(pa.array(column, type=pa.int32()), header_dictionary),
+            pa.array(ground_truth, type=pa.string()),
+            pa.array(extracted, type=pa.string()),
+            pa.array(match, type=pa.bool_()),
+            pa.array(confidence, type=pa.float64()),
+        ],
+        schema=schema,
+    )
+
+
+def arrow_response(response: ComparisonResponse, accept_encoding: Optional[str] = None) -> Response:
+    """Serialize a comparison result as an Arrow IPC stream with a single record batch"""
+    batch = comparison_record_batch(response)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return encoded_response(sink.getvalue().to_pybytes(), ARROW_MEDIA_TYPE, accept_encoding)
+
+
+def comparison_response(
+    response: ComparisonResponse, media_type: str, accept_encoding: Optional[str] = None
+) -> Response:
+    """Serialize a comparison response in a negotiated media type"""
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return msgpack_response(response, accept_encoding)
+    if media_type == ARROW_MEDIA_TYPE:
+        return arrow_response(response, accept_encoding)
+    return json_response(response, accept_encoding)
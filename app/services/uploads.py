@@ -0,0 +1,144 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from typing import BinaryIO
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Read uploads in 1 MiB chunks
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Allowance for multipart boundaries and part headers on top of each file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+def max_upload_bytes() -> int:
+    """Upload size limit in bytes (COMPARISON_MAX_UPLOAD_MB, default 50 MB)"""
+    return int(float(os.getenv("COMPARISON_MAX_UPLOAD_MB", "50")) * 1024 * 1024)
+
+
+def max_upload_files() -> int:
+    """File parts allowed in one request body (COMPARISON_MAX_UPLOAD_FILES, default 8)"""
+    return int(os.getenv("COMPARISON_MAX_UPLOAD_FILES", "8"))
+
+
+def _too_large_detail(limit: int) -> str:
+    return f"Uploaded file exceeds the {limit // (1024 * 1024)} MB limit"
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the configured size limit"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        super().__init__(_too_large_detail(limit))
+
+
+class UploadLimitMiddleware:
+    """
+    Cap request bodies as they are received.
+
+    The cap is a coarse backstop of max_upload_files() files at the per-file
+    limit (plus multipart overhead each); spool_upload enforces the limit on
+    each file. Requests whose Content-Length is over the cap are rejected
+    before the body is read. Otherwise the body chunks are counted as the
+    multipart parser pulls them, so chunked uploads without a Content-Length
+    are stopped with a 413 as soon as the cap is passed instead of being
+    spooled to disk in full first.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        limit = max_upload_bytes()
+        files = max_upload_files()
+        body_limit = files * (limit + MULTIPART_OVERHEAD_BYTES)
+        detail = f"Request body exceeds the limit of {files} files of {limit // (1024 * 1024)} MB"
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > body_limit:
+            response = JSONResponse(status_code=413, content={"detail": detail})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > body_limit:
+                    # HTTPException passes through FastAPI's form parsing unchanged
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+class SpooledUpload:
+    """An uploaded file read in chunks, with its size and SHA-256 content hash"""
+
+    def __init__(self, file: BinaryIO, size: int, sha256: str):
+        self.file = file
+        self.size = size
+        self.sha256 = sha256
+
+
+async def spool_upload(upload: UploadFile, max_bytes: int = None, chunk_size: int = UPLOAD_CHUNK_SIZE) -> SpooledUpload:
+    """
+    Count and hash an upload in one chunked pass, enforcing the per-file size limit.
+
+    Starlette spools multipart uploads to a SpooledTemporaryFile (in memory up
+    to 1 MB, on disk beyond that) while UploadLimitMiddleware caps the request
+    body as it arrives, so at most max_upload_files() files at the limit are
+    ever spooled. The chunks are read back from that file, which is then rewound
+    and handed to the parser instead of being copied into a bytes object.
+
+    Raises:
+        UploadTooLargeError: as soon as more than ``max_bytes`` have been read
+    """
+    limit = max_upload_bytes() if max_bytes is None else max_bytes
+    digest = hashlib.sha256()
+    size = 0
+
+    await upload.seek(0)
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > limit:
+            raise UploadTooLargeError(limit)
+        digest.update(chunk)
+
+    await upload.seek(0)
+    return SpooledUpload(upload.file, size, digest.hexdigest())
+
+
+async def save_upload(upload: UploadFile, max_bytes: int = None) -> tuple:
+    """
+    Stream an upload to a named temporary file that outlives the request.
+
+    Used by background jobs, which run after Starlette has closed the upload.
+
+    Returns:
+        (file path, SpooledUpload with size and hash)
+
+    Raises:
+        UploadTooLargeError: if the upload exceeds the size limit
+    """
+    spooled = await spool_upload(upload, max_bytes)
+    suffix = os.path.splitext(upload.filename or "")[1] or ".xlsx"
+    with tempfile.NamedTemporaryFile(prefix="comparison-job-", suffix=suffix, delete=False) as f:
+        await run_in_threadpool(shutil.copyfileobj, spooled.file, f, UPLOAD_CHUNK_SIZE)
+        path = f.name
+    return path, spooled
@@ -0,0 +1,264 @@
+"""
+Stage-level benchmarks for ComparisonService.
+
+Times parse, column matching, cell comparison, confidence, result building
+and JSON serialization (alongside the legacy jsonable_encoder path and gzip)
+separately for synthetic workbooks from 1k up to 5M
+cells, and writes machine-readable results that can be diffed between commits.
+
+Usage:
+    python -m benchmarks.bench_comparison
+    python -m benchmarks.bench_comparison --max-cells 100000 --output before.json
+    python -m benchmarks.bench_comparison --baseline before.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.schemas.comparison import ComparisonResponse
+from app.services.comparison import ComparisonService
+from app.services.serialization import json_response
+from benchmarks.workbook_generator import (
+    EXTRACTED_SHEET,
+    GROUND_TRUTH_SHEET,
+    generate_frames,
+    write_workbook,
+)
+
+DEFAULT_CELL_COUNTS = [1_000, 10_000, 100_000, 1_000_000, 5_000_000]
+DEFAULT_OUTPUT = Path(__file__).parent / "results" / "latest.json"
+
+STAGES = [
+    "parse",
+    "column_matching",
+    "cell_comparison",
+    "confidence",
+    "result_build",
+    "serialization",
+]
+
+# Timed for comparison with the stages above but not included in the total
+REFERENCE_STAGES = [
+    "serialization_legacy",
+    "serialization_gzip",
+]
+
+
+def _timed(timings: dict, stage: str, func, *args):
+    """Run func and record its wall time in seconds under stage"""
+    start = time.perf_counter()
+    result = func(*args)
+    timings[stage] = time.perf_counter() - start
+    return result
+
+
+def run_stages(service: ComparisonService, workbook: bytes) -> dict:
+    """Run one comparison stage by stage and return per-stage timings"""
+    timings = {}
+
+    def parse():
+        excel = service._open_workbook(workbook)
+        return (
+            service._parse_excel_sheet(excel, GROUND_TRUTH_SHEET),
+            service._parse_excel_sheet(excel, EXTRACTED_SHEET),
+        )
+
+    ground_truth_df, extracted_df = _timed(timings, "parse", parse)
+    headers = [str(h).strip() for h in ground_truth_df.columns]
+    robota_headers = [str(h).strip() for h in extracted_df.columns]
+
+    column_mapping = _timed(
+        timings, "column_matching", service._match_all_columns, headers, robota_headers
+    )
+
+    def compare():
+        gt_values, ext_values = service._align_values(
+            ground_truth_df, extracted_df, headers, column_mapping
+        )
+        gt_normalized, ext_normalized, cell_matches = service._encode_values(gt_values, ext_values)
+        return gt_values, ext_values, gt_normalized, ext_normalized, cell_matches
+
+    gt_values, ext_values, gt_normalized, ext_normalized, cell_matches = _timed(
+        timings, "cell_comparison", compare
+    )
+    confidences = _timed(
+        timings, "confidence", service._mismatch_confidences,
+        gt_normalized, ext_normalized, cell_matches,
+    )
+    result = _timed(
+        timings, "result_build", service._build_result,
+        headers, gt_values, ext_values, cell_matches, confidences,
+    )
+
+    response_model = ComparisonResponse(success=True, result=result)
+
+    def serialize():
+        # Same path as the endpoint: pydantic straight to JSON bytes
+        return json_response(response_model).body
+
+    def serialize_legacy():
+        # Previous endpoint path: model_dump, jsonable_encoder, JSONResponse.render
+        return JSONResponse(content=jsonable_encoder(response_model.model_dump())).body
+
+    def serialize_gzip():
+        return json_response(response_model, accept_encoding="gzip").body
+
+    body = _timed(timings, "serialization", serialize)
+    _timed(timings, "serialization_legacy", serialize_legacy)
+    compressed = _timed(timings, "serialization_gzip", serialize_gzip)
+
+    timings["total"] = sum(timings[stage] for stage in STAGES)
+    return {
+        "timings": timings,
+        "response_bytes": len(body),
+        "response_gzip_bytes": len(compressed),
+        "mismatched_cells": result.mismatched_cells,
+        "accuracy": result.accuracy,
+    }
+
+
+def run_case(
+    service: ComparisonService,
+    cells: int,
+    columns: int,
+    repeat: int,
+    **generator_options,
+) -> dict:
+    """Generate one workbook and benchmark it, keeping the median of each stage"""
+    rows = max(1, cells // columns)
+    ground_truth_df, extracted_df, _ = generate_frames(rows, columns, **generator_options)
+    workbook = write_workbook(ground_truth_df, extracted_df)
+
+    runs = [run_stages(service, workbook) for _ in range(repeat)]
+    timings = {
+        stage: statistics.median(run["timings"][stage] for run in runs)
+        for stage in STAGES + REFERENCE_STAGES + ["total"]
+    }
+
+    return {
+        "name": f"cells={rows * columns}",
+        "rows": rows,
+        "columns": columns,
+        "cells": rows * columns,
+        "workbook_bytes": len(workbook),
+        "response_bytes": runs[0]["response_bytes"],
+        "response_gzip_bytes": runs[0]["response_gzip_bytes"],
+        "mismatched_cells": runs[0]["mismatched_cells"],
+        "accuracy": runs[0]["accuracy"],
+        "repeat": repeat,
+        "timings": {stage: round(value, 6) for stage, value in timings.items()},
+    }
+
+
+def _git_commit() -> str:
+    """Current commit hash, or 'unknown' outside a git checkout"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def compare_results(baseline: dict, current: dict) -> list:
+    """Return rows of (case, stage, baseline seconds, current seconds, ratio)"""
+    baseline_cases = {case["name"]: case for case in baseline["cases"]}
+    rows = []
+    for case in current["cases"]:
+        before = baseline_cases.get(case["name"])
+        if before is None:
+            continue
+        for stage, seconds in case["timings"].items():
+            previous = before["timings"].get(stage)
+            if previous is None:
+                continue
+            ratio = seconds / previous if previous > 0 else float("inf")
+            rows.append((case["name"], stage, previous, seconds, ratio))
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--cells", type=int, nargs="+", default=DEFAULT_CELL_COUNTS,
+                        help="Cell counts to benchmark")
+    parser.add_argument("--max-cells", type=int, default=None,
+                        help="Skip cases larger than this many cells")
+    parser.add_argument("--columns", type=int, default=10)
+    parser.add_argument("--mismatch-rate", type=float, default=0.05)
+    parser.add_argument("--text-length", type=int, default=12)
+    parser.add_argument("--header-language", choices=["en", "ja", "mixed"], default="mixed")
+    parser.add_argument("--shuffle-columns", action="store_true")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--use-llm", action="store_true",
+                        help="Allow LLM column matching when an API key is configured")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", type=Path, default=None,
+                        help="Previous results file to diff against")
+    args = parser.parse_args(argv)
+
+    service = ComparisonService()
+    if not args.use_llm:
+        # Keep column matching deterministic and offline
+        service.llm_client = None
+
+    cell_counts = [c for c in args.cells if args.max_cells is None or c <= args.max_cells]
+    cases = []
+    for cells in cell_counts:
+        case = run_case(
+            service,
+            cells,
+            args.columns,
+            args.repeat,
+            mismatch_rate=args.mismatch_rate,
+            text_length=args.text_length,
+            header_language=args.header_language,
+            shuffle_columns=args.shuffle_columns,
+            seed=args.seed,
+        )
+        cases.append(case)
+        stages = " ".join(f"{stage}={case['timings'][stage]:.4f}s" for stage in STAGES)
+        print(f"{case['name']}: {stages} total={case['timings']['total']:.4f}s")
+
+    results = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "options": {
+            "columns": args.columns,
+            "mismatch_rate": args.mismatch_rate,
+            "text_length": args.text_length,
+            "header_language": args.header_language,
+            "shuffle_columns": args.shuffle_columns,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "cases": cases,
+    }
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(results, indent=2, sort_keys=True, ensure_ascii=False) + "\n")
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        print(f"\nDiff against {args.baseline} (commit {baseline.get('commit')}):")
+        for name, stage, before, after, ratio in compare_results(baseline, results):
+            print(f"  {name:<16} {stage:<16} {before:>10.4f}s -> {after:>10.4f}s  x{ratio:.2f}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
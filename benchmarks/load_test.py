@@ -0,0 +1,292 @@
+"""
+Load test for the comparison API.
+
+Drives main:app in-process through httpx's ASGI transport (or a running
+server with --url) with a fixed number of concurrent clients posting a
+weighted mix of synthetic workbook sizes. For each concurrency level it
+reports throughput, p50/p95/p99 latency, error and rejection (429) rates
+and peak RSS, and writes machine-readable results.
+
+Server settings such as COMPARISON_MAX_RUNNING, COMPARISON_SHARD_WORKERS or
+COMPARISON_JOB_WORKERS are read from the environment as usual, so runs with
+different values can be compared.
+
+Usage:
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --concurrency 1 4 16 --requests 64
+    python -m benchmarks.load_test --mix small=50x10:8 large=20000x10:1 --endpoint /comparison/api/summary
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --server-pid 12345
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import httpx
+import numpy as np
+
+from benchmarks.bench_comparison import _git_commit
+from benchmarks.workbook_generator import generate_workbook
+
+DEFAULT_ENDPOINT = "/comparison/api/compare"
+DEFAULT_CONCURRENCY = [1, 4, 16]
+DEFAULT_MIX = ["small=50x10:6", "medium=1000x10:3", "large=10000x10:1"]
+DEFAULT_OUTPUT = Path(__file__).parent / "results" / "load_latest.json"
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# How often the RSS sampler reads the process's resident set size
+RSS_SAMPLE_SECONDS = 0.05
+
+PERCENTILES = (50, 95, 99)
+
+
+def parse_mix(specs: list) -> list:
+    """
+    Parse workbook mix entries of the form name=ROWSxCOLUMNS:WEIGHT.
+
+    Returns:
+        list of (name, rows, columns, weight)
+    """
+    mix = []
+    for spec in specs:
+        try:
+            name, _, rest = spec.partition("=")
+            size, _, weight = rest.partition(":")
+            rows, _, columns = size.partition("x")
+            mix.append((name, int(rows), int(columns), float(weight or 1)))
+        except ValueError:
+            raise ValueError(f"Invalid mix entry '{spec}', expected name=ROWSxCOLUMNS:WEIGHT")
+    if not mix or any(weight <= 0 for *_, weight in mix):
+        raise ValueError("The mix needs at least one entry and positive weights")
+    return mix
+
+
+def rss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    """Current resident set size of a process from /proc (Linux), or None"""
+    try:
+        with open(f"/proc/{pid or 'self'}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+class RssSampler:
+    """Track the peak RSS of a process on a background thread while active"""
+
+    def __init__(self, pid: Optional[int] = None, interval: float = RSS_SAMPLE_SECONDS):
+        self.pid = pid
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._sample()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        if self.peak is None and self.pid is None:
+            # No /proc: fall back to the lifetime peak of this process
+            scale = 1 if sys.platform == "darwin" else 1024
+            self.peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        rss = rss_bytes(self.pid)
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+
+def latency_percentiles(latencies: list) -> dict:
+    """p50/p95/p99 of latencies in seconds, None when there are none"""
+    if not latencies:
+        return {f"p{p}": None for p in PERCENTILES}
+    values = np.percentile(latencies, PERCENTILES)
+    return {f"p{p}": round(float(v), 6) for p, v in zip(PERCENTILES, values)}
+
+
+def make_client(url: Optional[str], timeout: float) -> httpx.AsyncClient:
+    """Client for a running server, or for main:app in-process when url is None"""
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=timeout)
+    from main import app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver", timeout=timeout)
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    workbooks: list,
+    concurrency: int,
+    requests: int,
+    rng: np.random.Generator,
+    rss_pid: Optional[int] = None,
+) -> dict:
+    """
+    Send requests workbooks from the weighted mix with concurrency clients.
+
+    Args:
+        workbooks: list of (name, bytes, weight)
+        rss_pid: Process whose peak RSS is reported (default: this process)
+    """
+    weights = np.array([weight for _, _, weight in workbooks])
+    picks = rng.choice(len(workbooks), size=requests, p=weights / weights.sum())
+    queue = list(reversed(picks.tolist()))
+    samples = []
+
+    async def worker():
+        while queue:
+            name, workbook, _ = workbooks[queue.pop()]
+            start = time.perf_counter()
+            try:
+                response = await client.post(
+                    endpoint, files={"excel_file": (f"{name}.xlsx", workbook, XLSX_MEDIA_TYPE)}
+                )
+                status = response.status_code
+            except httpx.HTTPError:
+                status = None
+            samples.append((name, status, time.perf_counter() - start))
+
+    with RssSampler(rss_pid) as sampler:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    ok = [latency for _, status, latency in samples if status is not None and status < 400]
+    rejected = sum(1 for _, status, _ in samples if status == 429)
+    errors = sum(1 for _, status, _ in samples if status is None or (status >= 400 and status != 429))
+    by_size = {}
+    for name, status, latency in samples:
+        if status is not None and status < 400:
+            by_size.setdefault(name, []).append(latency)
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "seconds": round(elapsed, 6),
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else None,
+        "latency": latency_percentiles(ok),
+        "latency_by_size": {name: latency_percentiles(values) for name, values in sorted(by_size.items())},
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "rejected_rate": round(rejected / len(samples), 4) if samples else 0.0,
+        "peak_rss_bytes": sampler.peak,
+    }
+
+
+async def run_load_test(
+    url: Optional[str],
+    endpoint: str,
+    mix: list,
+    concurrency_levels: list,
+    requests: int,
+    seed: int = 0,
+    timeout: float = 300.0,
+    server_pid: Optional[int] = None,
+) -> list:
+    """Generate the workbook mix once and run one scenario per concurrency level"""
+    workbooks = [
+        (name, generate_workbook(rows, columns, seed=seed), weight)
+        for name, rows, columns, weight in mix
+    ]
+    rng = np.random.default_rng(seed)
+    scenarios = []
+    # In-process, this process is the server; otherwise sample the given server process
+    rss_pid = server_pid if url else None
+    async with make_client(url, timeout) as client:
+        for concurrency in concurrency_levels:
+            scenario = await run_scenario(client, endpoint, workbooks, concurrency, requests, rng, rss_pid)
+            scenarios.append(scenario)
+            print(format_scenario(scenario))
+    return scenarios
+
+
+def format_scenario(scenario: dict) -> str:
+    def ms(value):
+        return f"{value * 1000:.1f}ms" if value is not None else "-"
+
+    latency = scenario["latency"]
+    rss = scenario["peak_rss_bytes"]
+    return (
+        f"concurrency={scenario['concurrency']:<3} requests={scenario['requests']:<4} "
+        f"throughput={scenario['throughput_rps']}/s p50={ms(latency['p50'])} p95={ms(latency['p95'])} "
+        f"p99={ms(latency['p99'])} errors={scenario['error_rate']:.1%} rejected={scenario['rejected_rate']:.1%} "
+        f"peak_rss={f'{rss / 1024 / 1024:.0f}MB' if rss else '-'}"
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default=None,
+                        help="Base URL of a running server (default: main:app in-process)")
+    parser.add_argument("--server-pid", type=int, default=None,
+                        help="PID of the server behind --url, for peak RSS")
+    parser.add_argument("--endpoint", default=DEFAULT_ENDPOINT)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=DEFAULT_CONCURRENCY,
+                        help="Concurrent clients; one scenario per value")
+    parser.add_argument("--requests", type=int, default=32, help="Requests per scenario")
+    parser.add_argument("--mix", nargs="+", default=DEFAULT_MIX,
+                        help="Workbook sizes as name=ROWSxCOLUMNS:WEIGHT")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    args = parser.parse_args(argv)
+
+    # httpx logs every request at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    scenarios = asyncio.run(run_load_test(
+        args.url, args.endpoint, mix, args.concurrency, args.requests,
+        seed=args.seed, timeout=args.timeout, server_pid=args.server_pid,
+    ))
+
+    results = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "options": {
+            "target": args.url or "in-process",
+            "endpoint": args.endpoint,
+            "requests": args.requests,
+            "mix": [
+                {"name": name, "rows": rows, "columns": columns, "weight": weight}
+                for name, rows, columns, weight in mix
+            ],
+            "seed": args.seed,
+            "environment": {k: v for k, v in sorted(os.environ.items()) if k.startswith("COMPARISON_")},
+        },
+        "scenarios": scenarios,
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(results, indent=2, sort_keys=True, ensure_ascii=False) + "\n")
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
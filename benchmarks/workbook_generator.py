@@ -0,0 +1,144 @@
+"""
+Synthetic workbook generator for benchmarks.
+
+Builds two-tab workbooks (正解データ / Robota結果) with a controllable number of
+rows and columns, mismatch rate, text length, header language and column order.
+"""
+import io
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+GROUND_TRUTH_SHEET = "正解データ"
+EXTRACTED_SHEET = "Robota結果"
+
+# Header pools as (English, Japanese) pairs
+HEADER_POOL = [
+    ("Name", "名前"),
+    ("Age", "年齢"),
+    ("City", "都市"),
+    ("Amount", "金額"),
+    ("Date", "日付"),
+    ("Invoice Number", "請求書番号"),
+    ("Company", "会社名"),
+    ("Address", "住所"),
+    ("Phone", "電話番号"),
+    ("Tax", "消費税"),
+    ("Quantity", "数量"),
+    ("Unit Price", "単価"),
+]
+
+HEADER_LANGUAGES = ("en", "ja", "mixed")
+
+# Characters used for synthetic text values
+TEXT_ALPHABET = list("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789") + list(
+    "あいうえおかきくけこさしすせそたちつてとアイウエオカキクケコ東京大阪株式会社"
+)
+
+
+def make_headers(columns: int, header_language: str = "en") -> list:
+    """
+    Build unique column headers.
+
+    Args:
+        columns: Number of headers to build
+        header_language: "en", "ja" or "mixed" (bilingual "English 日本語" labels)
+    """
+    if header_language not in HEADER_LANGUAGES:
+        raise ValueError(f"header_language must be one of {HEADER_LANGUAGES}")
+
+    headers = []
+    for i in range(columns):
+        english, japanese = HEADER_POOL[i % len(HEADER_POOL)]
+        if header_language == "en":
+            header = english
+        elif header_language == "ja":
+            header = japanese
+        else:
+            header = f"{english} {japanese}"
+        # Suffix repeats so every header stays unique
+        if i >= len(HEADER_POOL):
+            header = f"{header}_{i // len(HEADER_POOL)}"
+        headers.append(header)
+    return headers
+
+
+def _random_text(rng: np.random.Generator, count: int, text_length: int) -> np.ndarray:
+    """Random strings of a fixed length"""
+    chars = rng.choice(TEXT_ALPHABET, size=(count, text_length))
+    return np.array(["".join(row) for row in chars], dtype=object)
+
+
+def generate_frames(
+    rows: int,
+    columns: int,
+    mismatch_rate: float = 0.05,
+    text_length: int = 12,
+    header_language: str = "en",
+    shuffle_columns: bool = False,
+    seed: Optional[int] = 0,
+) -> tuple:
+    """
+    Generate ground truth and extracted DataFrames.
+
+    Columns cycle through text, integer and float values. A fraction
+    ``mismatch_rate`` of the extracted cells is altered so that it no longer
+    matches the ground truth.
+
+    Returns:
+        (ground_truth_df, extracted_df, mismatched_cells)
+    """
+    if not 0.0 <= mismatch_rate <= 1.0:
+        raise ValueError("mismatch_rate must be between 0 and 1")
+
+    rng = np.random.default_rng(seed)
+    headers = make_headers(columns, header_language)
+
+    gt_data = {}
+    ext_data = {}
+    mismatched_cells = 0
+    for i, header in enumerate(headers):
+        kind = i % 3
+        if kind == 0:
+            values = _random_text(rng, rows, text_length)
+        elif kind == 1:
+            values = rng.integers(0, 1_000_000, size=rows)
+        else:
+            values = np.round(rng.random(rows) * 10_000, 2)
+
+        mismatches = rng.random(rows) < mismatch_rate
+        mismatched_cells += int(mismatches.sum())
+
+        altered = values.copy()
+        if kind == 0:
+            # Replace the last character so the value stays similar
+            altered[mismatches] = [value[:-1] + "#" for value in values[mismatches]]
+        else:
+            altered[mismatches] = values[mismatches] + 1
+
+        gt_data[header] = values
+        ext_data[header] = altered
+
+    ground_truth_df = pd.DataFrame(gt_data, columns=headers)
+    extracted_df = pd.DataFrame(ext_data, columns=headers)
+
+    if shuffle_columns:
+        extracted_df = extracted_df[list(rng.permutation(headers))]
+
+    return ground_truth_df, extracted_df, mismatched_cells
+
+
+def write_workbook(ground_truth_df: pd.DataFrame, extracted_df: pd.DataFrame) -> bytes:
+    """Write both DataFrames as the two tabs of an xlsx workbook"""
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        ground_truth_df.to_excel(writer, sheet_name=GROUND_TRUTH_SHEET, index=False)
+        extracted_df.to_excel(writer, sheet_name=EXTRACTED_SHEET, index=False)
+    return buffer.getvalue()
+
+
+def generate_workbook(rows: int, columns: int, **kwargs) -> bytes:
+    """Generate a synthetic two-tab workbook; see generate_frames for options"""
+    ground_truth_df, extracted_df, _ = generate_frames(rows, columns, **kwargs)
+    return write_workbook(ground_truth_df, extracted_df)
@@ -1,10 +1,14 @@
 import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 
 from app.routers import comparison
+from app.services.process_pool import shutdown_pool
+from app.services.metrics import metrics
+from app.services.uploads import UploadLimitMiddleware
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -21,6 +25,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject oversized uploads from Content-Length, or as the body arrives without one
+app.add_middleware(UploadLimitMiddleware)
+
 # Include routers
 app.include_router(comparison.router)
 
@@ -30,11 +37,29 @@ if static_dir.exists():
     app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
 
 
+@app.on_event("shutdown")
+def shutdown_job_workers():
+    """Stop the background comparison worker pool"""
+    comparison.job_manager.shutdown()
+
+
+@app.on_event("shutdown")
+def shutdown_worker_processes():
+    """Stop the comparison worker processes"""
+    shutdown_pool()
+
+
 @app.get("/")
 async def root():
     return {"message": "Test Module - Data Comparison Tool"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus text-format metrics for the comparison service"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
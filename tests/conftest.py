@@ -97,3 +97,35 @@ def identical_files():
 
 
 
+
+
+@pytest.fixture
+def multi_sheet_excel():
+    """Create Excel file with two suffixed sheet pairs and an unpaired ground truth sheet"""
+    invoices = pd.DataFrame({'Invoice': ['INV-1', 'INV-2'], 'Total': [100, 200]})
+    invoices_ext = pd.DataFrame({'Invoice': ['INV-1', 'INV-2'], 'Total': [100, 250]})
+    receipts = pd.DataFrame({'Store': ['A', 'B', 'C'], 'Amount': [10, 20, 30]})
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        invoices.to_excel(writer, sheet_name='正解データ_請求書', index=False)
+        invoices_ext.to_excel(writer, sheet_name='Robota結果_請求書', index=False)
+        receipts.to_excel(writer, sheet_name='正解データ_領収書', index=False)
+        receipts.to_excel(writer, sheet_name='Robota結果_領収書', index=False)
+        receipts.to_excel(writer, sheet_name='正解データ_納品書', index=False)
+    buffer.seek(0)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def multi_version_excel():
+    """Create Excel file with one ground truth tab and two extracted version tabs"""
+    gt_df = pd.DataFrame({'Name': ['Alice', 'Bob'], 'Age': [25, 30]})
+    v1 = pd.DataFrame({'Name': ['Alice', 'Bob'], 'Age': [25, 31]})
+    v2 = pd.DataFrame({'age': [25, 30], 'name': ['Alice', 'Bob'], 'Extra': ['x', 'y']})
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        gt_df.to_excel(writer, sheet_name='正解データ', index=False)
+        v1.to_excel(writer, sheet_name='Robota結果_v1', index=False)
+        v2.to_excel(writer, sheet_name='Robota結果_v2', index=False)
+    buffer.seek(0)
+    return buffer.getvalue()
@@ -0,0 +1,207 @@
+import asyncio
+import io
+import zipfile
+
+import pandas as pd
+import pytest
+from fastapi import status
+
+from app.routers import comparison as comparison_router
+from app.services.admission import AdmissionController, AdmissionRejected, JobCost, estimate_cells
+
+
+@pytest.mark.unit
+class TestAdmissionController:
+    """Unit tests for cost estimation and admission scheduling"""
+
+    def test_estimate_cells_from_dimensions(self, sample_excel_extracted):
+        """Test that cells are counted from both sheets' dimension elements"""
+        file = io.BytesIO(sample_excel_extracted)
+        file.seek(10)
+
+        # Two sheets of A1:D4 (header plus three rows, four columns)
+        assert estimate_cells(file, len(sample_excel_extracted)) == 32
+        assert file.tell() == 10
+
+    def test_estimate_cells_counts_compared_sheets_only(self):
+        """Test that only the 正解データ and Robota結果 sheets are counted, resolved through workbook.xml"""
+        buffer = io.BytesIO()
+        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+            pd.DataFrame({'Notes': range(1000)}).to_excel(writer, sheet_name='メモ', index=False)
+            pd.DataFrame({'A': [1, 2], 'B': [3, 4]}).to_excel(writer, sheet_name='Robota結果', index=False)
+            pd.DataFrame({'A': [1, 2], 'B': [3, 4]}).to_excel(writer, sheet_name='正解データ', index=False)
+        data = buffer.getvalue()
+
+        # Two sheets of A1:B3; the 1001-row notes sheet is left out
+        assert estimate_cells(io.BytesIO(data), len(data)) == 12
+        assert estimate_cells(io.BytesIO(data), len(data), sheets=None) == 12 + 1001
+        # Without the named sheets every worksheet is counted
+        assert estimate_cells(io.BytesIO(data), len(data), sheets=('Other',)) == 12 + 1001
+
+    def test_estimate_cells_corrupt_workbook(self, sample_excel_extracted):
+        """Test that a workbook with corrupt compressed data is rejected as unreadable"""
+        data = bytearray(sample_excel_extracted)
+        info = zipfile.ZipFile(io.BytesIO(sample_excel_extracted)).getinfo('xl/worksheets/sheet1.xml')
+        start = info.header_offset + 30 + len(info.filename.encode()) + len(info.extra)
+        data[start:start + 64] = b'\xab' * 64
+
+        with pytest.raises(ValueError, match="Unable to read Excel file"):
+            estimate_cells(io.BytesIO(bytes(data)), len(data))
+
+    def test_estimate_cells_without_zip(self):
+        """Test that non-xlsx uploads are estimated from their size"""
+        data = b"a,b\n" * 100
+        assert estimate_cells(io.BytesIO(data), len(data)) == len(data) // 8
+
+    def test_small_jobs_scheduled_first(self):
+        """Test that queued jobs are admitted smallest first"""
+        controller = AdmissionController(memory_budget=10**9, max_running=1, max_queued=10, queue_timeout=5)
+        order = []
+
+        async def job(name, cells):
+            cost = JobCost(cells, cells)
+            async with controller.admit(cost):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        async def scenario():
+            first = asyncio.create_task(job("first", 1))
+            await asyncio.sleep(0)
+            others = [asyncio.create_task(job(name, cells)) for name, cells in [("huge", 10**6), ("small", 10)]]
+            await asyncio.gather(first, *others)
+
+        asyncio.run(scenario())
+        assert order == ["first", "small", "huge"]
+        assert controller.running == 0 and controller.memory_in_use == 0
+
+    def test_large_job_not_starved_by_small_stream(self):
+        """Test that a large job is admitted before its timeout while small jobs keep arriving"""
+        controller = AdmissionController(memory_budget=10**9, max_running=1, max_queued=1000, queue_timeout=0.5)
+        admitted = {}
+
+        async def job(name, cells):
+            try:
+                async with controller.admit(JobCost(cells, cells)) as waited:
+                    admitted[name] = waited
+                    await asyncio.sleep(0.01)
+            except AdmissionRejected:
+                admitted[name] = None
+
+        async def scenario():
+            tasks = [asyncio.create_task(job("small-0", 10))]
+            await asyncio.sleep(0)
+            tasks.append(asyncio.create_task(job("huge", 10**6)))
+            # Small jobs arrive twice as fast as they are served, so one is always waiting
+            for i in range(1, 80):
+                await asyncio.sleep(0.005)
+                tasks.append(asyncio.create_task(job(f"small-{i}", 10)))
+            await asyncio.gather(*tasks)
+
+        asyncio.run(scenario())
+        assert admitted["huge"] is not None
+        assert admitted["huge"] < 0.5
+        assert controller.running == 0 and controller.queued == 0
+
+    def test_memory_budget_and_queue_limit(self):
+        """Test that jobs over the remaining memory budget queue, and a full queue rejects"""
+        controller = AdmissionController(memory_budget=100, max_running=4, max_queued=0, queue_timeout=5)
+
+        async def scenario():
+            await controller.acquire(JobCost(1, 80))
+            with pytest.raises(AdmissionRejected) as excinfo:
+                await controller.acquire(JobCost(1, 30))
+            return excinfo.value
+
+        rejected = asyncio.run(scenario())
+        assert rejected.reason == "queue_full"
+        assert rejected.retry_after >= 1
+
+    def test_oversized_job_runs_alone(self):
+        """Test that a job larger than the whole budget is admitted when nothing else runs"""
+        controller = AdmissionController(memory_budget=100, max_running=4, max_queued=0, queue_timeout=5)
+        assert asyncio.run(controller.acquire(JobCost(1, 1000))) == 0.0
+        assert controller.running == 1
+
+
+@pytest.mark.api
+class TestAdmissionEndpoint:
+    """API tests for admission control on the compare endpoint"""
+
+    def test_compare_rejected_when_busy(self, client, sample_excel_extracted, monkeypatch):
+        """Test that a busy server answers 429 with Retry-After, then accepts after release"""
+        controller = AdmissionController(max_running=1, max_queued=0)
+        monkeypatch.setattr(comparison_router, "admission", controller)
+        busy = JobCost(1000, 1000)
+        asyncio.run(controller.acquire(busy))
+
+        xlsx = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        files = {"excel_file": ("test.xlsx", sample_excel_extracted, xlsx)}
+        response = client.post("/comparison/api/compare", files=files)
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert int(response.headers["retry-after"]) >= 1
+
+        controller.release(busy)
+        response = client.post("/comparison/api/compare", files=files)
+        assert response.status_code == status.HTTP_200_OK
+        assert "queue;dur=" in response.headers["server-timing"]
+
+    @pytest.mark.parametrize("path", [
+        "/comparison/api/compare-sheets",
+        "/comparison/api/compare-versions",
+        "/comparison/api/export",
+        "/comparison/api/summary",
+        "/comparison/api/estimate",
+        "/comparison/api/gate",
+        "/comparison/api/worst-mismatches",
+    ])
+    def test_other_endpoints_rejected_when_busy(self, client, sample_excel_extracted, monkeypatch, path):
+        """Test that comparison endpoints besides /api/compare also wait for admission"""
+        controller = AdmissionController(max_running=1, max_queued=0)
+        monkeypatch.setattr(comparison_router, "admission", controller)
+        busy = JobCost(1000, 1000)
+        asyncio.run(controller.acquire(busy))
+
+        xlsx = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        files = {"excel_file": ("test.xlsx", sample_excel_extracted, xlsx)}
+        response = client.post(path, files=files)
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert int(response.headers["retry-after"]) >= 1
+
+        controller.release(busy)
+        assert client.post(path, files=files).status_code != status.HTTP_429_TOO_MANY_REQUESTS
+        assert controller.running == 0
+
+    def test_compare_versions_admitted_under_summed_cost(self, client, sample_excel_extracted, monkeypatch):
+        """Test that a version comparison is admitted under the cost of all its uploads together"""
+        controller = AdmissionController(max_running=1, max_queued=0)
+        monkeypatch.setattr(comparison_router, "admission", controller)
+        admitted = []
+        acquire = controller.acquire
+
+        async def record_acquire(cost):
+            admitted.append(cost.cells)
+            return await acquire(cost)
+
+        monkeypatch.setattr(controller, "acquire", record_acquire)
+        xlsx = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        response = client.post(
+            "/comparison/api/compare-versions",
+            files=[
+                ("excel_file", ("test.xlsx", sample_excel_extracted, xlsx)),
+                ("extracted_files", ("v2.xlsx", sample_excel_extracted, xlsx)),
+            ],
+        )
+        assert response.status_code == status.HTTP_200_OK
+        # Each upload has two sheets of A1:D4
+        assert admitted == [64]
+
+    def test_corrupt_workbook_is_bad_request(self, client, sample_excel_extracted):
+        """Test that an xlsx with corrupt compressed data is answered with 400, not 500"""
+        data = bytearray(sample_excel_extracted)
+        info = zipfile.ZipFile(io.BytesIO(sample_excel_extracted)).getinfo('xl/worksheets/sheet1.xml')
+        start = info.header_offset + 30 + len(info.filename.encode()) + len(info.extra)
+        data[start:start + 64] = b'\xab' * 64
+
+        xlsx = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        response = client.post("/comparison/api/compare", files={"excel_file": ("test.xlsx", bytes(data), xlsx)})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
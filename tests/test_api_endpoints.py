@@ -117,3 +117,282 @@ class TestAPIEndpoints:
                 assert "match" in cell
                 assert "confidence" in cell
 
+
+    def test_compare_api_server_timing_header(self, client, sample_excel_extracted):
+        """Test that per-stage timings are reported in the Server-Timing header"""
+        files = {
+            "excel_file": ("test.xlsx", sample_excel_extracted, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        }
+
+        response = client.post("/comparison/api/compare", files=files)
+        assert response.status_code == status.HTTP_200_OK
+
+        server_timing = response.headers["server-timing"]
+        for stage in ["parse", "column_matching", "cell_comparison", "confidence", "serialization", "total"]:
+            assert f"{stage};dur=" in server_timing
+
+    def test_metrics_endpoint(self, client, sample_excel_extracted):
+        """Test Prometheus metrics after a compare request"""
+        files = {
+            "excel_file": ("test.xlsx", sample_excel_extracted, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        }
+        client.post("/comparison/api/compare", files=files)
+
+        response = client.get("/metrics")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'comparison_requests_total{status="200"}' in response.text
+        assert 'comparison_stage_seconds_bucket{stage="parse",le="+Inf"}' in response.text
+        assert "comparison_request_seconds_count" in response.text
+        assert "comparison_cells_total" in response.text
+
+    def test_metrics_count_early_rejections(self, client, sample_excel_extracted):
+        """Test that requests rejected before the comparison are counted with their status"""
+        from app.services.metrics import metrics
+
+        files = {
+            "excel_file": ("test.xlsx", sample_excel_extracted, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        }
+        before = {code: metrics.requests.value(status=code) for code in (400, 406)}
+        seconds_before = metrics.request_seconds.count()
+
+        response = client.post("/comparison/api/compare", files=files, headers={"Accept": "image/png"})
+        assert response.status_code == status.HTTP_406_NOT_ACCEPTABLE
+        response = client.post("/comparison/api/compare", files=files, params={"record": "true"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        assert metrics.requests.value(status=406) == before[406] + 1
+        assert metrics.requests.value(status=400) == before[400] + 1
+        assert metrics.request_seconds.count() == seconds_before + 2
+
+    def test_compare_api_profile_requires_token(self, client, sample_excel_extracted, monkeypatch):
+        """Test that profiling is rejected unless the admin token matches"""
+        files = {
+            "excel_file": ("test.xlsx", sample_excel_extracted, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        }
+        monkeypatch.delenv("COMPARISON_PROFILE_TOKEN", raising=False)
+        response = client.post("/comparison/api/compare?profile=speedscope", files=files, headers={"X-Profile-Token": "x"})
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+        monkeypatch.setenv("COMPARISON_PROFILE_TOKEN", "secret")
+        response = client.post("/comparison/api/compare?profile=speedscope", files=files, headers={"X-Profile-Token": "wrong"})
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_compare_api_profile_roundtrip(self, client, sample_excel_extracted, monkeypatch, tmp_path):
+        """Test profiling a compare request and downloading the stored profile"""
+        monkeypatch.setenv("COMPARISON_PROFILE_TOKEN", "secret")
+        monkeypatch.setenv("COMPARISON_PROFILE_DIR", str(tmp_path))
+        files = {
+            "excel_file": ("test.xlsx", sample_excel_extracted, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        }
+
+        response = client.post("/comparison/api/compare?profile=speedscope", files=files, headers={"X-Profile-Token": "secret"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["success"] is True
+        profile_id = response.headers["x-profile-id"]
+
+        profile = client.get(f"/comparison/api/profiles/{profile_id}", headers={"X-Profile-Token": "secret"})
+        assert profile.status_code == status.HTTP_200_OK
+        data = profile.json()
+        assert data["profiles"][0]["type"] == "sampled"
+        assert "frames" in data["shared"]
+
+        missing = client.get("/comparison/api/profiles/does-not-exist", headers={"X-Profile-Token": "secret"})
+        assert missing.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_compare_api_rejects_oversized_upload(self, client, sample_excel_extracted, monkeypatch):
+        """Test that uploads over the size limit are rejected with 413"""
+        monkeypatch.setenv("COMPARISON_MAX_UPLOAD_MB", "0.001")
+        files = {
+            "excel_file": ("test.xlsx", sample_excel_extracted, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        }
+
+        response = client.post("/comparison/api/compare", files=files)
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+    def test_upload_limit_stops_chunked_body(self, monkeypatch):
+        """Test that a body without Content-Length is cut off once it passes the limit"""
+        import asyncio
+
+        from fastapi import HTTPException
+
+        from app.services import uploads
+
+        monkeypatch.setenv("COMPARISON_MAX_UPLOAD_MB", "0.001")
+        monkeypatch.setenv("COMPARISON_MAX_UPLOAD_FILES", "1")
+        monkeypatch.setattr(uploads, "MULTIPART_OVERHEAD_BYTES", 0)
+        chunks = [b"x" * 512] * 10
+        received = []
+
+        async def receive():
+            received.append(len(received))
+            return {"type": "http.request", "body": chunks[len(received) - 1], "more_body": len(received) < len(chunks)}
+
+        async def read_body(scope, receive, send):
+            while (await receive())["more_body"]:
+                pass
+
+        middleware = uploads.UploadLimitMiddleware(read_body)
+        scope = {"type": "http", "method": "POST", "headers": [(b"transfer-encoding", b"chunked")]}
+        with pytest.raises(HTTPException) as excinfo:
+            asyncio.run(middleware(scope, receive, None))
+
+        assert excinfo.value.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        # 0.001 MB is 1048 bytes: the third 512-byte chunk passes it
+        assert len(received) == 3
+
+    def test_upload_limit_applies_per_file(self, client, sample_excel_extracted, monkeypatch):
+        """Test that two files each under the limit are accepted although together they are over it"""
+        from app.services import uploads
+
+        monkeypatch.setenv("COMPARISON_MAX_UPLOAD_MB", str(len(sample_excel_extracted) * 1.5 / (1024 * 1024)))
+        monkeypatch.setattr(uploads, "MULTIPART_OVERHEAD_BYTES", 1024)
+        xlsx = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        files = [
+            ("excel_file", ("test.xlsx", sample_excel_extracted, xlsx)),
+            ("extracted_files", ("v2.xlsx", sample_excel_extracted, xlsx)),
+        ]
+
+        response = client.post("/comparison/api/compare-versions", files=files)
+        assert response.status_code == status.HTTP_200_OK
+
+        monkeypatch.setenv("COMPARISON_MAX_UPLOAD_FILES", "1")
+        response = client.post("/comparison/api/compare-versions", files=files)
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+    def test_compare_api_returns_upload_hash(self, client, sample_excel_extracted):
+        """Test that the SHA-256 of the upload is computed while streaming it"""
+        import hashlib
+
+        files = {
+            "excel_file": ("test.xlsx", sample_excel_extracted, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        }
+
+        response = client.post("/comparison/api/compare", files=files)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["x-upload-sha256"] == hashlib.sha256(sample_excel_extracted).hexdigest()
+
+    def test_compare_api_gzip_response(self, client, identical_files):
+        """Test that the compare response is compressed when the client accepts gzip"""
+        files = {
+            "excel_file": ("test.xlsx", identical_files, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        }
+
+        response = client.post("/comparison/api/compare", files=files, headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.json()["result"]["matched_rows"] == 3
+
+        response = client.post("/comparison/api/compare", files=files, headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in response.headers
+        assert response.json()["result"]["matched_rows"] == 3
+
+    def test_compare_api_binary_formats(self, client, sample_excel_extracted):
+        """Test MessagePack and Arrow responses negotiated by the Accept header"""
+        msgpack = pytest.importorskip("msgpack")
+        pa = pytest.importorskip("pyarrow")
+        files = {
+            "excel_file": ("test.xlsx", sample_excel_extracted, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        }
+
+        response = client.post("/comparison/api/compare", files=files, headers={"Accept": "application/x-msgpack"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"] == "application/x-msgpack"
+        assert msgpack.unpackb(response.content)["result"]["mismatched_cells"] == 1
+
+        response = client.post("/comparison/api/compare", files=files, headers={"Accept": "application/vnd.apache.arrow.stream"})
+        assert response.status_code == status.HTTP_200_OK
+        table = pa.ipc.open_stream(response.content).read_all()
+        assert table.num_rows == 12
+        assert table.column("match").to_pylist().count(False) == 1
+
+        response = client.post("/comparison/api/compare", files=files, headers={"Accept": "text/csv"})
+        assert response.status_code == status.HTTP_406_NOT_ACCEPTABLE
+
+    def test_export_report(self, client, sample_excel_extracted):
+        """Test downloading the comparison as an xlsx report with highlighted mismatches"""
+        import io
+        import openpyxl
+
+        files = {
+            "excel_file": ("test.xlsx", sample_excel_extracted, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        }
+
+        response = client.post("/comparison/api/export", files=files)
+        assert response.status_code == status.HTTP_200_OK
+        assert "attachment" in response.headers["content-disposition"]
+
+        wb = openpyxl.load_workbook(io.BytesIO(response.content))
+        ws = wb["比較結果"]
+        assert [c.value for c in ws[1]][:3] == ["Row", "Name (正解データ)", "Name (Robota結果)"]
+        # Row 3 of the data (Charlie) has Age 35 vs 36
+        age_gt, age_ext = ws.cell(row=4, column=5), ws.cell(row=4, column=6)
+        assert (age_gt.value, age_ext.value) == (35, 36)
+        assert age_gt.style == age_ext.style == "report_mismatch"
+        assert ws.cell(row=2, column=5).style != "report_mismatch"
+
+    def test_compare_sheets(self, client, multi_sheet_excel):
+        """Test comparing every sheet pair in one upload"""
+        files = {
+            "excel_file": ("test.xlsx", multi_sheet_excel, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        }
+
+        response = client.post("/comparison/api/compare-sheets", files=files)
+        assert response.status_code == status.HTTP_200_OK
+
+        data = response.json()
+        assert data["success"] is True
+        assert [sheet["name"] for sheet in data["result"]["sheets"]] == ["請求書", "領収書"]
+        assert data["result"]["accuracy"] == 90.0
+
+    def test_compare_sheets_without_pairs(self, client, sample_excel_ground_truth):
+        """Test that a workbook without sheet pairs returns 400"""
+        files = {
+            "excel_file": ("test.xlsx", sample_excel_ground_truth, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        }
+
+        response = client.post(
+            "/comparison/api/compare-sheets", files=files, params={"extracted_prefix": "Extracted"}
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_compare_versions(self, client, multi_version_excel, sample_excel_extracted):
+        """Test comparing extracted tabs and an extra extracted file against one ground truth"""
+        files = [
+            ("excel_file", ("gt.xlsx", multi_version_excel, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")),
+            ("extracted_files", ("v3.xlsx", sample_excel_extracted, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")),
+        ]
+
+        response = client.post("/comparison/api/compare-versions", files=files)
+        assert response.status_code == status.HTTP_200_OK
+
+        data = response.json()
+        assert data["result"]["headers"] == ["Name", "Age"]
+        assert [v["name"] for v in data["result"]["versions"]] == ["Robota結果_v1", "Robota結果_v2", "v3.xlsx"]
+        assert data["result"]["versions"][0]["column_accuracy"] == [100.0, 50.0]
+
+    def test_summary(self, client, sample_excel_extracted):
+        """Test the summary-only endpoint"""
+        files = {
+            "excel_file": ("test.xlsx", sample_excel_extracted, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        }
+
+        response = client.post("/comparison/api/summary", files=files, params={"top_k": 1})
+        assert response.status_code == status.HTTP_200_OK
+        assert "cell_comparison" in response.headers["server-timing"]
+
+        result = response.json()["result"]
+        assert "rows" not in result
+        assert result["mismatched_cells"] == 1
+        assert [c["header"] for c in result["columns"]] == ["Name", "Age", "City", "Amount"]
+
+    def test_gate(self, client, sample_excel_extracted):
+        """Test the CI gate endpoint"""
+        files = {
+            "excel_file": ("test.xlsx", sample_excel_extracted, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        }
+
+        response = client.post("/comparison/api/gate", files=files, params={"max_mismatches": 0})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["x-gate-result"] == "fail"
+        assert response.json()["result"]["passed"] is False
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from app.services.comparison import ComparisonService
+from benchmarks.bench_comparison import STAGES, run_stages
+from benchmarks.load_test import latency_percentiles, parse_mix, run_load_test
+from benchmarks.workbook_generator import generate_frames, make_headers, write_workbook
+
+
+@pytest.mark.unit
+class TestWorkbookGenerator:
+    """Tests for the synthetic workbook generator used by the benchmarks"""
+
+    def test_generate_frames_shape_and_mismatches(self):
+        """Test that generated frames have the requested size and mismatch count"""
+        gt_df, ext_df, mismatched = generate_frames(200, 6, mismatch_rate=0.1, seed=1)
+
+        assert gt_df.shape == (200, 6)
+        assert ext_df.shape == (200, 6)
+        differing = int((gt_df != ext_df).to_numpy().sum())
+        assert differing == mismatched
+        assert 0 < mismatched < 200 * 6
+
+    def test_headers_languages(self):
+        """Test English, Japanese and mixed header generation"""
+        assert make_headers(2, "en") == ["Name", "Age"]
+        assert make_headers(2, "ja") == ["名前", "年齢"]
+        assert make_headers(1, "mixed") == ["Name 名前"]
+        assert len(set(make_headers(40, "ja"))) == 40
+
+        with pytest.raises(ValueError):
+            make_headers(2, "fr")
+
+    def test_shuffled_columns_compare_like_ordered(self):
+        """Test that shuffled column order gives the same comparison result"""
+        service = ComparisonService()
+        service.llm_client = None
+        gt_df, ext_df, mismatched = generate_frames(
+            20, 5, mismatch_rate=0.2, shuffle_columns=True, seed=3
+        )
+        assert list(ext_df.columns) != list(gt_df.columns)
+
+        report = run_stages(service, write_workbook(gt_df, ext_df))
+
+        assert report["mismatched_cells"] == mismatched
+        assert set(STAGES) <= set(report["timings"])
+
+
+@pytest.mark.integration
+class TestLoadTest:
+    """Tests for the in-process load test harness"""
+
+    def test_parse_mix(self):
+        """Test workbook mix parsing and validation"""
+        assert parse_mix(["small=50x10:3", "large=2000x8"]) == [
+            ("small", 50, 10, 3.0), ("large", 2000, 8, 1.0)
+        ]
+        with pytest.raises(ValueError):
+            parse_mix(["small=50:3"])
+        with pytest.raises(ValueError):
+            parse_mix(["small=50x10:0"])
+
+    def test_latency_percentiles(self):
+        """Test percentiles over latencies and the empty case"""
+        assert latency_percentiles([]) == {"p50": None, "p95": None, "p99": None}
+        result = latency_percentiles([float(i) for i in range(1, 101)])
+        assert result["p50"] == pytest.approx(50.5)
+        assert result["p50"] < result["p95"] < result["p99"] <= 100
+
+    def test_in_process_scenarios(self):
+        """Test one small scenario per concurrency level against main:app"""
+        scenarios = asyncio.run(run_load_test(
+            None, "/comparison/api/summary", [("tiny", 10, 3, 1.0)], [1, 2], requests=4
+        ))
+
+        assert [s["concurrency"] for s in scenarios] == [1, 2]
+        for scenario in scenarios:
+            assert scenario["requests"] == 4
+            assert scenario["error_rate"] == 0.0
+            assert scenario["throughput_rps"] > 0
+            assert scenario["latency"]["p50"] > 0
+            assert set(scenario["latency_by_size"]) == {"tiny"}
+            assert scenario["peak_rss_bytes"] > 0
@@ -0,0 +1,75 @@
+import csv
+import json
+import os
+
+import pytest
+
+from app import cli
+
+_compare_file = cli._compare_file
+
+
+def crashing_compare_file(path, sha256, full, top_k):
+    """Worker that dies like an OOM-killed process on huge.xlsx"""
+    if path.endswith("huge.xlsx"):
+        os._exit(1)
+    return _compare_file(path, sha256, full, top_k)
+
+
+@pytest.mark.integration
+class TestBulkComparisonCli:
+    """Integration tests for the offline directory comparison CLI"""
+
+    def test_run_and_resume(self, tmp_path, sample_excel_extracted, identical_files):
+        """Test that a directory is compared once, and a rerun skips completed files"""
+        source = tmp_path / "workbooks"
+        (source / "nested").mkdir(parents=True)
+        (source / "a.xlsx").write_bytes(sample_excel_extracted)
+        (source / "nested" / "b.xlsx").write_bytes(identical_files)
+        (source / "nested" / "copy-of-a.xlsx").write_bytes(sample_excel_extracted)
+        (source / "broken.xlsx").write_bytes(b"not a workbook")
+        (source / "notes.txt").write_text("ignored")
+        output = tmp_path / "out"
+
+        counts = cli.run(source, output, workers=2)
+
+        assert counts == {"compared": 3, "skipped": 1, "failed": 1}
+        records = [json.loads(line) for line in (output / cli.RESULTS_FILE).read_text(encoding="utf-8").splitlines()]
+        by_name = {record["path"].rsplit("/", 1)[-1]: record for record in records}
+        assert by_name["a.xlsx"]["result"]["mismatched_cells"] == 1
+        assert by_name["b.xlsx"]["result"]["accuracy"] == 100.0
+        assert by_name["broken.xlsx"]["status"] == cli.ERROR
+
+        with open(output / cli.SUMMARY_FILE, encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        assert len(rows) == 3
+        assert {row["status"] for row in rows} == {cli.OK, cli.ERROR}
+
+        assert cli.run(source, output, workers=2) == {"compared": 0, "skipped": 4, "failed": 0}
+        assert cli.run(source, output, workers=1, retry_failed=True) == {"compared": 1, "skipped": 3, "failed": 1}
+
+    def test_worker_crash_fails_remaining_files(self, tmp_path, monkeypatch, sample_excel_extracted):
+        """Test that a dead worker process is reported as failed files instead of escaping run()"""
+        monkeypatch.setattr(cli, "_compare_file", crashing_compare_file)
+        source = tmp_path / "workbooks"
+        source.mkdir()
+        (source / "huge.xlsx").write_bytes(sample_excel_extracted + b"huge")
+        (source / "other.xlsx").write_bytes(sample_excel_extracted)
+        (source / "legacy.xls").write_bytes(b"BIFF")
+        output = tmp_path / "out"
+
+        counts = cli.run(source, output, workers=1)
+
+        records = [json.loads(line) for line in (output / cli.RESULTS_FILE).read_text(encoding="utf-8").splitlines()]
+        by_name = {record["path"].rsplit("/", 1)[-1]: record for record in records}
+        # .xls files are not picked up at all
+        assert sorted(by_name) == ["huge.xlsx", "other.xlsx"]
+        assert by_name["huge.xlsx"]["status"] == cli.ERROR
+        assert by_name["huge.xlsx"]["error"].startswith("BrokenProcessPool")
+        assert counts["compared"] == 2
+        assert counts["failed"] == sum(record["status"] == cli.ERROR for record in records)
+
+    def test_main_rejects_missing_directory(self, tmp_path):
+        """Test that a missing input directory is a usage error"""
+        with pytest.raises(SystemExit):
+            cli.main([str(tmp_path / "missing")])
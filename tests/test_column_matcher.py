@@ -0,0 +1,112 @@
+import json
+
+import pandas as pd
+import pytest
+
+from app.services.column_matcher import NgramColumnMatcher, char_ngrams
+from app.services.column_profiles import is_placeholder_header, profile_column, profile_similarity
+from app.services.comparison import ComparisonService
+
+
+@pytest.mark.unit
+class TestNgramColumnMatcher:
+    """Unit tests for the local n-gram column matcher"""
+
+    def test_char_ngrams_include_boundaries(self):
+        """Test that n-grams are padded so short CJK headers still produce features"""
+        assert set(char_ngrams("金額")) == {" 金", "金額", "額 ", " 金額", "金額 "}
+
+    def test_similar_headers_match(self):
+        """Test that spelling and separator variants match without synonyms"""
+        matcher = NgramColumnMatcher()
+        mapping = matcher.match(["Invoice Number", "Total Amount"], ["total_amount", "invoice_no"])
+        assert mapping == {"Invoice Number": "invoice_no", "Total Amount": "total_amount"}
+
+    def test_synonyms_match_across_languages(self):
+        """Test that synonym groups bridge headers without shared characters"""
+        matcher = NgramColumnMatcher([["amount", "金額"], ["date", "日付"]])
+        mapping = matcher.match(["Amount", "Date", "Memo"], ["日付", "金額", "備考"])
+        assert mapping == {"Amount": "金額", "Date": "日付"}
+
+    def test_sampled_values_match(self):
+        """Test that identical column values match unrelated headers"""
+        matcher = NgramColumnMatcher()
+        mapping = matcher.match(
+            ["Customer", "City"],
+            ["顧客名", "都市"],
+            [["alice", "bob", "charlie"], ["tokyo", "osaka"]],
+            [["alice", "bob", "charlie"], ["tokyo", "osaka"]],
+        )
+        assert mapping == {"Customer": "顧客名", "City": "都市"}
+
+    def test_synonyms_from_file(self, tmp_path, monkeypatch):
+        """Test that synonym groups are loaded from the COMPARISON_COLUMN_SYNONYMS file"""
+        path = tmp_path / "synonyms.json"
+        path.write_text(json.dumps([["Quantity", "数量"]], ensure_ascii=False), encoding="utf-8")
+        monkeypatch.setenv("COMPARISON_COLUMN_SYNONYMS", str(path))
+
+        matcher = NgramColumnMatcher.from_file()
+        assert matcher.match(["Quantity"], ["数量", "単価"]) == {"Quantity": "数量"}
+
+    def test_service_uses_local_matcher(self):
+        """Test that the service falls back to the local matcher before positional matching"""
+        service = ComparisonService()
+        service.llm_client = None
+        service.column_matcher = NgramColumnMatcher([["amount", "金額"]])
+
+        mapping = service._match_all_columns(["Name", "Amount"], ["金額", "Extra", "name"])
+        assert mapping == {"Name": "name", "Amount": "金額"}
+
+
+@pytest.mark.unit
+class TestColumnProfiles:
+    """Unit tests for value profile column matching"""
+
+    def test_placeholder_headers(self):
+        """Test detection of generated header names"""
+        assert all(is_placeholder_header(h) for h in ["Unnamed: 3", "Unnamed: 3.1", "列1", "Column 2", "", " "])
+        assert not any(is_placeholder_header(h) for h in ["Name", "金額", "Unit 2", "2023", "7", "None"])
+
+    def test_year_headers_match_by_name(self):
+        """Test that numeric headers such as years are paired by name, not left to value profiles"""
+        service = ComparisonService()
+        service.llm_client = None
+        gt = pd.DataFrame({'2023': [100, 200, 300], '2024': [1000, 2000, 3000]})
+        # The extraction swapped the years' values; profiles alone would pair them crosswise
+        ext = pd.DataFrame({'2024': [100, 200, 300], '2023': [1000, 2000, 3000], 'メモ': ['a', 'b', 'c']})
+
+        mapping = service._match_all_columns(
+            list(gt.columns), list(ext.columns), service._column_samples(gt), service._column_samples(ext)
+        )
+        assert mapping == {'2023': '2023', '2024': '2024'}
+
+    def test_profiles_distinguish_value_types(self):
+        """Test that profiles of the same kind of data score higher than different kinds"""
+        dates = profile_column(["2024-01-01", "2024-02-15", ""])
+        other_dates = profile_column(["2023-12-31", "2024-03-01", "2024-03-02"])
+        amounts = profile_column(["1000", "2500", "300"])
+
+        assert profile_similarity(dates, other_dates) > profile_similarity(dates, amounts)
+        assert profile_similarity(amounts, amounts) == 1.0
+
+    def test_headerless_sheets_match_by_profile(self):
+        """Test that shuffled columns with placeholder headers are paired by their values"""
+        service = ComparisonService()
+        service.llm_client = None
+        gt = pd.DataFrame({
+            'Unnamed: 0': ['INV-001', 'INV-002', 'INV-003', 'INV-004'],
+            'Unnamed: 1': ['2024-01-05', '2024-01-06', '2024-02-01', '2024-02-03'],
+            'Unnamed: 2': [1200, 350, 98000, 4500],
+            'Unnamed: 3': ['株式会社テスト', '山田商店', 'ABC Corp', 'サンプル株式会社'],
+        })
+        ext = pd.DataFrame({
+            '列1': [1200, 350, 98000, 4501],
+            '列2': ['株式会社テスト', '山田商店', 'ABC Corp.', 'サンプル株式会社'],
+            '列3': ['INV-001', 'INV-002', 'INV-003', 'INV-004'],
+            '列4': ['2024-01-05', '2024-01-06', '2024-02-01', '2024-02-04'],
+        })
+
+        mapping = service._match_all_columns(
+            list(gt.columns), list(ext.columns), service._column_samples(gt), service._column_samples(ext)
+        )
+        assert mapping == {'Unnamed: 0': '列3', 'Unnamed: 1': '列4', 'Unnamed: 2': '列1', 'Unnamed: 3': '列2'}
@@ -1,4 +1,8 @@
+from concurrent.futures.process import BrokenProcessPool
+
 import pytest
+import pandas as pd
+import numpy as np
 from app.services.comparison import ComparisonService
 
 
@@ -81,6 +85,413 @@ class TestComparisonService:
         assert len(df2) == 3
         assert len(df2.columns) == 4
 
+    def test_compare_files_from_file_object(self, sample_excel_extracted, tmp_path):
+        """Test comparing directly from a binary file instead of bytes"""
+        path = tmp_path / "upload.xlsx"
+        path.write_bytes(sample_excel_extracted)
+
+        with open(path, "rb") as f:
+            result = self.service.compare_files(f)
+
+        assert result.total_rows == 3
+        assert result.mismatched_cells == 1
+
+    def test_confidence_only_for_mismatched_cells(self, sample_excel_extracted, monkeypatch):
+        """Test that cells with equal dictionary codes are matched without confidence calculation"""
+        calls = []
+        original = self.service._calculate_confidence
+
+        def counting_confidence(gt, ext):
+            calls.append((gt, ext))
+            return original(gt, ext)
+
+        monkeypatch.setattr(self.service, "_calculate_confidence", counting_confidence)
+        result = self.service.compare_files(sample_excel_extracted)
+
+        assert result.matched_rows == 2
+        assert result.mismatched_rows == 1
+        assert result.mismatched_cells == 1
+        assert calls == [("35", "36")]
+        assert all(cell.match for cell in result.rows[0].cells)
+
+    def test_row_hashes_use_normalized_values(self):
+        """Test that row hashes agree for values that normalize to the same string"""
+        gt = pd.DataFrame({'A': [1.0, 2.5], 'B': ['x ', None]})
+        ext = pd.DataFrame({'A': [1, 2.5], 'B': ['x', '']})
+
+        result = self.service._compare_dataframes(gt, ext, ['A', 'B'], {'A': 'A', 'B': 'B'})
+
+        assert result.matched_rows == 2
+        assert result.mismatched_cells == 0
+        assert result.accuracy == 100.0
+
+    def test_encoded_values_keep_mixed_types_apart(self):
+        """Test that dictionary encoding does not merge values that hash alike but normalize differently"""
+        gt = np.array([[1, 'x'], [True, 'y'], [2.0, None]], dtype=object)
+        ext = np.array([[1.0, 'x '], [1, 'y'], [2, '']], dtype=object)
+
+        gt_normalized, ext_normalized, cell_matches = self.service._encode_values(gt, ext)
+
+        assert gt_normalized.tolist() == [['1', 'x'], ['True', 'y'], ['2', '']]
+        assert ext_normalized.tolist() == [['1', 'x'], ['1', 'y'], ['2', '']]
+        assert cell_matches.tolist() == [[True, True], [False, True], [True, True]]
+
+    def test_confidence_once_per_distinct_pair(self, monkeypatch):
+        """Test that repeated wrong value pairs share one confidence calculation"""
+        calls = []
+        original = self.service._calculate_confidence
+
+        def counting_confidence(gt, ext):
+            calls.append((gt, ext))
+            return original(gt, ext)
+
+        monkeypatch.setattr(self.service, "_calculate_confidence", counting_confidence)
+        gt = pd.DataFrame({'City': ['東京都', '大阪府', '東京都', '東京都']})
+        ext = pd.DataFrame({'City': ['東京', '大阪', '東京', '東京']})
+
+        result = self.service._compare_dataframes(gt, ext, ['City'], {'City': 'City'})
+
+        assert sorted(calls) == [('大阪府', '大阪'), ('東京都', '東京')]
+        assert [row.cells[0].confidence for row in result.rows] == [80.0, 80.0, 80.0, 80.0]
+
+    def test_cancel_during_cell_comparison(self):
+        """Test that a cancelling progress callback stops cell comparison between columns"""
+        from app.services.jobs import JobCancelled
+
+        gt = pd.DataFrame({h: range(10) for h in 'ABCD'})
+        encoded = []
+        original = self.service._encode_column
+
+        def counting_encode(values):
+            encoded.append(len(values))
+            return original(values)
+
+        def progress(stage, rows_processed, total_rows):
+            if stage == "cell_comparison" and rows_processed:
+                raise JobCancelled()
+
+        self.service._encode_column = counting_encode
+        with pytest.raises(JobCancelled):
+            self.service._compare_dataframes(gt, gt.copy(), list('ABCD'), {h: h for h in 'ABCD'}, progress=progress)
+        assert len(encoded) == 1
+
+    def test_column_shards_match_in_process(self):
+        """Test that comparing column shards on worker processes gives the in-process result"""
+        pytest.importorskip("pyarrow")
+        gt = pd.DataFrame({
+            'Name': ['Alice', 'Bob', 'Charlie', None],
+            'Age': [25, 30, 35, 40],
+            'Amount': [1000.5, 2000.0, None, 4.25],
+            'Mixed': [1, 'a', 2.5, True],
+        })
+        ext = pd.DataFrame({
+            'Name': ['Alice', 'Bobby', 'Charlie'],
+            'Age': [25, 30, 36],
+            'Amount': [1000.5, 2000, None],
+            'Mixed': [1.0, 'a', 2.5],
+        })
+        headers = list(gt.columns)
+        mapping = {h: h for h in headers}
+
+        expected = self.service._compare_dataframes(gt, ext, headers, mapping)
+        self.service.shard_workers = 2
+        self.service.shard_min_columns = 2
+        timings = {}
+        stages = []
+        sharded = self.service._compare_dataframes(
+            gt, ext, headers, mapping, timings, progress=lambda stage, done, total: stages.append((stage, done))
+        )
+
+        assert sharded.model_dump() == expected.model_dump()
+        assert sharded.mismatched_cells == 5
+        assert {"cell_comparison", "confidence", "result_build"} <= set(timings)
+        assert ("confidence", 4) in stages
+
+    def test_column_mapping_cache(self):
+        """Test that repeated header layouts reuse the resolved column mapping"""
+        self.service.llm_client = None
+        gt_headers = ['Name', 'Age']
+        robota_headers = ['age', 'name']
+
+        first = self.service._resolve_column_mapping(gt_headers, robota_headers)
+        first['Name'] = 'changed'
+        second = self.service._resolve_column_mapping(gt_headers, robota_headers)
+
+        assert second == {'Name': 'name', 'Age': 'age'}
+        assert len(self.service._column_mapping_cache) == 1
+
+    def test_headerless_workbooks_in_a_row(self):
+        """Test that a cached mapping decided by values is not reused for other values"""
+        import io
+
+        self.service.llm_client = None
+
+        def headerless_workbook(order):
+            ground_truth = pd.DataFrame({
+                '列1': ['INV-001', 'INV-002', 'INV-003'],
+                '列2': ['2024-01-05', '2024-01-06', '2024-02-01'],
+                '列3': [1200, 350, 98000],
+            })
+            extracted = ground_truth.iloc[:, order].copy()
+            extracted.columns = ['Column 1', 'Column 2', 'Column 3']
+            buffer = io.BytesIO()
+            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+                ground_truth.to_excel(writer, sheet_name='正解データ', index=False)
+                extracted.to_excel(writer, sheet_name='Robota結果', index=False)
+            return buffer.getvalue()
+
+        first = self.service.compare_files(headerless_workbook([2, 0, 1]))
+        second = self.service.compare_files(headerless_workbook([1, 2, 0]))
+
+        assert first.accuracy == 100.0
+        assert second.accuracy == 100.0
+        assert len(self.service._column_mapping_cache) == 1
+
+    def test_compare_sheet_pairs(self, multi_sheet_excel):
+        """Test that every suffixed sheet pair is compared with combined totals"""
+        self.service.llm_client = None
+        result = self.service.compare_sheet_pairs(multi_sheet_excel, max_workers=2)
+
+        by_name = {sheet.name: sheet for sheet in result.sheets}
+        assert list(by_name) == ['請求書', '領収書']
+        assert by_name['請求書'].extracted_sheet == 'Robota結果_請求書'
+        assert by_name['請求書'].result.mismatched_cells == 1
+        assert by_name['領収書'].result.accuracy == 100.0
+        assert result.unmatched_sheets == ['正解データ_納品書']
+        assert result.total_cells == 10
+        assert result.mismatched_cells == 1
+        assert result.accuracy == 90.0
+
+    def test_compare_sheet_pairs_processes_match_in_process(self, multi_sheet_excel, monkeypatch):
+        """Test that pairs compared on worker processes give the in-process result, with a fallback"""
+        self.service.llm_client = None
+        expected = self.service.compare_sheet_pairs(multi_sheet_excel, max_workers=1)
+
+        assert self.service.compare_sheet_pairs(multi_sheet_excel, max_workers=2) == expected
+
+        def broken_pool(method, calls, workers):
+            raise BrokenProcessPool("worker died")
+
+        monkeypatch.setattr("app.services.comparison.map_service_calls", broken_pool)
+        assert self.service.compare_sheet_pairs(multi_sheet_excel, max_workers=2) == expected
+
+    def test_discover_sheet_pairs_custom_prefixes(self):
+        """Test sheet pairing with configurable prefixes and separators"""
+        pairs, unmatched = self.service._discover_sheet_pairs(
+            ['GT', 'GT-a', 'GT b', 'Extracted', 'Extracted_a', 'Other'], 'GT', 'Extracted'
+        )
+
+        assert pairs == [('', 'GT', 'Extracted'), ('a', 'GT-a', 'Extracted_a')]
+        assert unmatched == ['GT b']
+
+    def test_compare_sheet_pairs_without_pairs(self, sample_excel_ground_truth):
+        """Test that a workbook without any sheet pair is rejected"""
+        with pytest.raises(ValueError, match="No sheet pairs found"):
+            self.service.compare_sheet_pairs(sample_excel_ground_truth)
+
+    def test_compare_versions(self, multi_version_excel, sample_excel_extracted):
+        """Test the per-version, per-column accuracy matrix against one ground truth"""
+        self.service.llm_client = None
+        result = self.service.compare_versions(
+            multi_version_excel, extracted_files=[('v3.xlsx', sample_excel_extracted)], max_workers=2
+        )
+
+        assert result.headers == ['Name', 'Age']
+        by_name = {version.name: version for version in result.versions}
+        assert list(by_name) == ['Robota結果_v1', 'Robota結果_v2', 'v3.xlsx']
+        assert by_name['Robota結果_v1'].column_accuracy == [100.0, 50.0]
+        assert by_name['Robota結果_v1'].accuracy == 75.0
+        assert by_name['Robota結果_v2'].accuracy == 100.0
+        # v3 has a third row the ground truth lacks
+        assert by_name['v3.xlsx'].total_rows == 3
+        assert by_name['v3.xlsx'].column_accuracy == [pytest.approx(66.67), pytest.approx(66.67)]
+
+    def test_compare_versions_one_batch_per_worker(self, multi_version_excel, sample_excel_extracted, monkeypatch):
+        """Test that versions are sent in one batch per worker and match the in-process result"""
+        self.service.llm_client = None
+        extra = [('v3.xlsx', sample_excel_extracted)]
+        expected = self.service.compare_versions(multi_version_excel, extracted_files=extra, max_workers=1)
+
+        batches = []
+
+        def in_process(method, calls, workers):
+            batches.extend(calls)
+            return [getattr(self.service, method)(*args) for args in calls]
+
+        monkeypatch.setattr("app.services.comparison.map_service_calls", in_process)
+        result = self.service.compare_versions(multi_version_excel, extracted_files=extra, max_workers=2)
+
+        assert result == expected
+        assert [[name for name, _, _ in versions] for _, versions in batches] == [
+            ['Robota結果_v1', 'Robota結果_v2'], ['v3.xlsx']
+        ]
+
+    def test_version_matches_single_comparison(self, sample_excel_extracted):
+        """Test that a prepared ground truth gives the same counts as compare_files"""
+        single = self.service.compare_files(sample_excel_extracted)
+        versions = self.service.compare_versions(sample_excel_extracted)
+
+        version = versions.versions[0]
+        assert version.mismatched_cells == single.mismatched_cells
+        assert version.accuracy == single.accuracy
+        assert version.average_mismatch_confidence == single.average_mismatch_confidence
+
+    def test_summary_matches_full_comparison(self, sample_excel_extracted):
+        """Test that summary mode reports the same totals as the full comparison"""
+        full = self.service.compare_files(sample_excel_extracted)
+        summary = self.service.summarize_files(sample_excel_extracted)
+
+        assert summary.total_cells == full.total_cells
+        assert summary.mismatched_cells == full.mismatched_cells
+        assert summary.mismatched_rows == full.mismatched_rows
+        assert summary.accuracy == full.accuracy
+        assert summary.average_mismatch_confidence == full.average_mismatch_confidence
+
+        age = summary.columns[1]
+        assert (age.header, age.extracted_header) == ('Age', 'Age')
+        assert age.accuracy == pytest.approx(66.67)
+        assert [(w.ground_truth, w.extracted, w.count) for w in age.top_wrong_values] == [('35', '36', 1)]
+        assert summary.columns[0].top_wrong_values == []
+
+    def test_summary_overall_confidence_from_raw_sums(self):
+        """Test that the overall mismatch confidence is not rebuilt from rounded column averages"""
+        import io
+        gt = pd.DataFrame({'City': ['Tokyo', 'Tokyo', 'Osaka'], 'Name': ['Osaka', 'Alice', 'Bob']})
+        ext = pd.DataFrame({'City': ['Toky', 'Toky', 'Osak a'], 'Name': ['Osak a', 'Alicia', 'Bob']})
+        buffer = io.BytesIO()
+        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+            gt.to_excel(writer, sheet_name='正解データ', index=False)
+            ext.to_excel(writer, sheet_name='Robota結果', index=False)
+
+        full = self.service.compare_files(buffer.getvalue())
+        summary = self.service.summarize_files(buffer.getvalue())
+
+        assert summary.mismatched_cells == 5
+        assert summary.average_mismatch_confidence == full.average_mismatch_confidence == 86.47
+
+    def test_summary_top_wrong_values_by_frequency(self):
+        """Test that wrong value pairs are counted and ordered by frequency"""
+        import io
+        gt = pd.DataFrame({'Code': ['A', 'B', 'A', 'B', 'A']})
+        ext = pd.DataFrame({'Code': ['X', 'Y', 'X', 'Y', 'X']})
+        buffer = io.BytesIO()
+        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+            gt.to_excel(writer, sheet_name='正解データ', index=False)
+            ext.to_excel(writer, sheet_name='Robota結果', index=False)
+
+        summary = self.service.summarize_files(buffer.getvalue(), top_k=1)
+
+        column = summary.columns[0]
+        assert column.mismatched_cells == 5
+        assert [(w.ground_truth, w.extracted, w.count) for w in column.top_wrong_values] == [('A', 'X', 3)]
+
+    def test_gate_fails_early(self):
+        """Test that the gate stops once the mismatches exceed the threshold"""
+        import io
+        gt = pd.DataFrame({'Code': [f'C{i}' for i in range(100)]})
+        ext = pd.DataFrame({'Code': ['wrong'] * 10 + [f'C{i}' for i in range(10, 100)]})
+        buffer = io.BytesIO()
+        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+            gt.to_excel(writer, sheet_name='正解データ', index=False)
+            ext.to_excel(writer, sheet_name='Robota結果', index=False)
+
+        gate = self.service.check_gate(buffer.getvalue(), max_mismatches=5, chunk_rows=20)
+
+        assert gate.passed is False
+        assert gate.decided_early is True
+        assert gate.rows_examined == 20
+        assert gate.mismatched_cells == 10
+
+        gate = self.service.check_gate(buffer.getvalue(), min_accuracy=50, chunk_rows=20)
+        # After 60 rows, even 40 more mismatches would leave accuracy at exactly 50%
+        assert gate.passed is True
+        assert gate.rows_examined == 60
+
+    def test_gate_examines_all_rows_when_close(self, sample_excel_extracted):
+        """Test that a gate on the boundary compares every row"""
+        gate = self.service.check_gate(sample_excel_extracted, min_accuracy=90, chunk_rows=1)
+
+        assert gate.passed is True
+        assert gate.decided_early is False
+        assert gate.mismatched_cells == 1
+        assert gate.accuracy_so_far == pytest.approx(91.67)
+
+        with pytest.raises(ValueError):
+            self.service.check_gate(sample_excel_extracted)
+
+    def test_gate_sheets_of_different_lengths(self):
+        """Test that a gate over sheets of different lengths counts like compare_files"""
+        import io
+        gt = pd.DataFrame({'Age': [25, 30, 35], 'Name': ['a', 'b', 'c']})
+        ext = pd.DataFrame({'Age': [25, 31, 35, 40, 41], 'Name': ['a', 'b', 'c', 'd', 'e']})
+        buffer = io.BytesIO()
+        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+            gt.to_excel(writer, sheet_name='正解データ', index=False)
+            ext.to_excel(writer, sheet_name='Robota結果', index=False)
+
+        gate = self.service.check_gate(buffer.getvalue(), max_mismatches=4, chunk_rows=2)
+
+        assert gate.passed is False
+        assert gate.rows_examined == 5
+        assert gate.mismatched_cells == self.service.compare_files(buffer.getvalue()).mismatched_cells == 5
+
+    def test_take_rows_keeps_types(self):
+        """Test that selecting rows past the end of a sheet does not upcast integers like reindex"""
+        df = pd.DataFrame({'Age': [25, 30, 35], 'Name': ['a', 'b', 'c']})
+
+        taken = self.service._take_rows(df, np.array([0, 2, 3, 4]))
+        gt_values, ext_values = self.service._align_values(
+            taken, df.iloc[[0, 2, 1, 1]], ['Age', 'Name'], {'Age': 'Age', 'Name': 'Name'}
+        )
+
+        assert taken['Age'].dtype == np.int64
+        assert gt_values[:, 0].tolist() == [25, 35, None, None]
+        assert type(gt_values[1, 0]) is int
+
+    def test_worst_mismatches(self):
+        """Test that only the k lowest-confidence mismatches are kept"""
+        import io
+        gt = pd.DataFrame({'Name': ['Alice', 'Bob', 'Carol', 'Dave'], 'City': ['Tokyo', 'Osaka', 'Kyoto', 'Nara']})
+        ext = pd.DataFrame({'Name': ['Alicia', 'Xyz', 'Carol', 'Dave'], 'City': ['Tokyo', 'Osaka', 'Kyot', 'Zzz']})
+        buffer = io.BytesIO()
+        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+            gt.to_excel(writer, sheet_name='正解データ', index=False)
+            ext.to_excel(writer, sheet_name='Robota結果', index=False)
+
+        worst = self.service.worst_mismatches(buffer.getvalue(), k=2, chunk_rows=1)
+
+        assert worst.mismatched_cells == 4
+        assert [(m.row_index, m.column, m.confidence) for m in worst.mismatches] == [
+            (1, 'Name', 0.0), (3, 'City', 0.0)
+        ]
+        assert worst.mismatches[0].ground_truth == 'Bob'
+
+        per_column = self.service.worst_mismatches(buffer.getvalue(), k=1, per_column=True)
+        assert [(m.column, m.extracted) for m in per_column.mismatches] == [('Name', 'Xyz'), ('City', 'Zzz')]
+        assert per_column.average_mismatch_confidence == worst.average_mismatch_confidence
+
+    def test_worst_mismatches_match_compare_files_values(self):
+        """Test that reported values keep their types when the sheets differ in length"""
+        import io
+        gt = pd.DataFrame({'Age': [25, 30, 35]})
+        ext = pd.DataFrame({'Age': [25, 30, 36, 40]})
+        buffer = io.BytesIO()
+        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+            gt.to_excel(writer, sheet_name='正解データ', index=False)
+            ext.to_excel(writer, sheet_name='Robota結果', index=False)
+
+        worst = self.service.worst_mismatches(buffer.getvalue(), chunk_rows=2)
+        full = self.service.compare_files(buffer.getvalue())
+        expected = [
+            (row.row_index, cell.ground_truth, cell.extracted)
+            for row in full.rows for cell in row.cells if not cell.match
+        ]
+
+        assert sorted((m.row_index, m.ground_truth, m.extracted) for m in worst.mismatches) == expected
+        assert [type(m.ground_truth) for m in sorted(worst.mismatches, key=lambda m: m.row_index)] == [
+            int, type(None)
+        ]
+
     @pytest.mark.skip(reason="pandas is very lenient and can parse almost anything as CSV")
     def test_invalid_file_format(self):
         """Test handling of invalid file format"""
@@ -91,3 +502,54 @@ class TestComparisonService:
         with pytest.raises(ValueError):
             self.service._parse_file(invalid_content)
 
+
+
+@pytest.mark.unit
+class TestDiffReport:
+    """Unit tests for the xlsx diff report"""
+
+    def test_report_keeps_text_literal(self):
+        """Test that formula-like and control-character text is written as plain text"""
+        import io
+        import openpyxl
+        from app.schemas.comparison import CellComparison, ComparisonResult, RowComparison
+        from app.services.report import write_diff_report
+
+        result = ComparisonResult(
+            headers=["A"],
+            rows=[RowComparison(row_index=0, cells=[
+                CellComparison(value="=1+2", ground_truth="=1+2", extracted="a\x01b", match=False, confidence=0.0),
+            ])],
+            total_rows=1, matched_rows=0, mismatched_rows=1,
+            total_cells=1, matched_cells=0, mismatched_cells=1, accuracy=0.0,
+        )
+        output = io.BytesIO()
+        write_diff_report(result, output)
+
+        ws = openpyxl.load_workbook(io.BytesIO(output.getvalue()))["比較結果"]
+        assert ws.cell(row=2, column=2).value == "=1+2"
+        assert ws.cell(row=2, column=2).data_type == "s"
+        assert ws.cell(row=2, column=3).value == "ab"
+
+    def test_report_from_matrix_matches_result(self, sample_excel_extracted):
+        """Test that the report written from the aligned arrays equals the one from the full result"""
+        import io
+        import openpyxl
+        from app.services.report import write_diff_report
+
+        service = ComparisonService()
+        service.llm_client = None
+        matrix = service.compare_files_matrix(sample_excel_extracted)
+        result = service.compare_files(sample_excel_extracted)
+        assert (matrix.mismatched_cells, matrix.accuracy) == (result.mismatched_cells, result.accuracy)
+
+        sheets = []
+        for source in (matrix, result):
+            output = io.BytesIO()
+            write_diff_report(source, output)
+            wb = openpyxl.load_workbook(io.BytesIO(output.getvalue()))
+            sheets.append([
+                [(c.value, c.style) for c in row]
+                for name in wb.sheetnames for row in wb[name].iter_rows()
+            ])
+        assert sheets[0] == sheets[1]
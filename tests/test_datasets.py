@@ -0,0 +1,169 @@
+import asyncio
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import status
+
+from app.routers import comparison as comparison_router
+from app.services.admission import AdmissionController, JobCost
+from app.services.comparison import ComparisonService
+from app.services.datasets import DatasetStore
+
+
+def excel_bytes(sheets):
+    """Write {sheet name: DataFrame} to xlsx bytes"""
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        for sheet_name, df in sheets.items():
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+    return buffer.getvalue()
+
+
+@pytest.mark.unit
+class TestDatasetStore:
+    """Unit tests for registered ground truth datasets"""
+
+    def setup_method(self):
+        self.service = ComparisonService()
+        self.service.llm_client = None
+
+    def test_register_and_load_roundtrip(self, tmp_path, sample_excel_extracted):
+        """Test that a stored dataset gives the same result as comparing the full workbook"""
+        store = DatasetStore(tmp_path)
+        ground_truth = self.service.prepare_ground_truth(sample_excel_extracted)
+        info = store.register(ground_truth, "people", "abc")
+
+        assert info.rows == 3
+        assert info.headers == ['Name', 'Age', 'City', 'Amount']
+        assert store.info(info.dataset_id).source_sha256 == "abc"
+        assert [d.dataset_id for d in store.list_all()] == [info.dataset_id]
+
+        loaded = DatasetStore(tmp_path).load(info.dataset_id)
+        assert loaded.take(np.arange(loaded.rows)).tolist() == ground_truth.normalized.tolist()
+        assert list(loaded.row_hashes) == list(ground_truth.row_hashes)
+
+        expected = self.service.compare_files(sample_excel_extracted)
+        result = self.service.compare_with_ground_truth(loaded, sample_excel_extracted)
+        assert result.mismatched_cells == expected.mismatched_cells
+        assert result.accuracy == expected.accuracy
+        assert result.rows[2].cells[1].ground_truth == "35"
+
+    def test_key_column_aligns_rows(self, tmp_path):
+        """Test that extracted rows are matched to ground truth rows by key"""
+        gt = pd.DataFrame({'ID': ['A', 'B', 'C'], 'Total': [1, 2, 3]})
+        ext = pd.DataFrame({'ID': ['C', 'X', 'A'], 'Total': [3, 9, 1]})
+        store = DatasetStore(tmp_path)
+        info = store.register(
+            self.service.prepare_ground_truth(excel_bytes({'正解データ': gt}), key_column='ID'), "keyed"
+        )
+
+        result = self.service.compare_with_ground_truth(
+            store.load(info.dataset_id), excel_bytes({'Sheet1': ext})
+        )
+
+        assert [row.cells[0].extracted for row in result.rows] == ['A', None, 'C', 'X']
+        assert [all(c.match for c in row.cells) for row in result.rows] == [True, False, True, False]
+
+    def test_compare_decodes_only_differing_rows(self, tmp_path, monkeypatch):
+        """Test that only ground truth rows whose hash differs are decoded from the stored blob"""
+        gt = pd.DataFrame({'Name': ['Alice', 'Bob', 'Carol', 'Dave'], 'Score': [1, 2, 3, 4]})
+        ext = pd.DataFrame({'Name': ['Alice', 'Bob', 'Karol', 'Dave', 'Eve'], 'Score': [1, 2, 3, 4, 5]})
+        store = DatasetStore(tmp_path)
+        info = store.register(self.service.prepare_ground_truth(excel_bytes({'正解データ': gt})), "people")
+        loaded = store.load(info.dataset_id)
+
+        calls = []
+        take = loaded.normalized.take
+        monkeypatch.setattr(loaded.normalized, "take", lambda rows: calls.append(list(rows)) or take(rows))
+        result = self.service.compare_with_ground_truth(loaded, excel_bytes({'Robota結果': ext}))
+
+        # A sample of rows for column matching, then only the differing row
+        assert len(calls) == 2
+        assert calls[-1] == [2]
+        assert [row.cells[0].ground_truth for row in result.rows] == ['Alice', 'Bob', 'Carol', 'Dave', None]
+        assert [all(c.match for c in row.cells) for row in result.rows] == [True, True, False, True, False]
+
+    def test_duplicate_key_values_rejected(self):
+        """Test that a key column with repeated values is rejected instead of keeping the first row"""
+        gt = pd.DataFrame({'ID': ['A', 'B', 'A', 'C', 'B'], 'Total': [1, 2, 3, 4, 5]})
+        with pytest.raises(ValueError, match="Key column 'ID' has 2 duplicate values, e.g. 'A', 'B'"):
+            self.service.prepare_ground_truth(excel_bytes({'正解データ': gt}), key_column='ID')
+
+    def test_unknown_key_column(self, sample_excel_extracted):
+        """Test that registering with a missing key column is rejected"""
+        with pytest.raises(ValueError, match="Key column 'Missing' not found"):
+            self.service.prepare_ground_truth(sample_excel_extracted, key_column='Missing')
+
+    def test_invalid_dataset_id(self, tmp_path):
+        """Test that IDs outside the store format are not resolved"""
+        store = DatasetStore(tmp_path)
+        assert store.load("../etc") is None
+        assert store.delete("0" * 32) is False
+
+
+@pytest.mark.api
+class TestDatasetEndpoints:
+    """API tests for dataset registration and comparison"""
+
+    def test_dataset_lifecycle(self, client, tmp_path, monkeypatch, sample_excel_extracted):
+        """Test registering a dataset, comparing against it and deleting it"""
+        monkeypatch.setattr(comparison_router, "dataset_store", DatasetStore(tmp_path))
+        xlsx = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+        response = client.post(
+            "/comparison/api/datasets",
+            files={"excel_file": ("gt.xlsx", sample_excel_extracted, xlsx)},
+            params={"name": "people"},
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        dataset_id = response.json()["dataset_id"]
+
+        extracted = excel_bytes({'Robota結果': pd.DataFrame({
+            'Name': ['Alice', 'Bob', 'Charlie'],
+            'Age': [25, 30, 36],
+            'City': ['Tokyo', 'Osaka', 'Kyoto'],
+            'Amount': [1000.50, 2000.75, 3000.00],
+        })})
+        response = client.post(
+            f"/comparison/api/datasets/{dataset_id}/compare",
+            files={"excel_file": ("robota.xlsx", extracted, xlsx)},
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["result"]["mismatched_cells"] == 1
+
+        assert client.get("/comparison/api/datasets").json()[0]["name"] == "people"
+        assert client.delete(f"/comparison/api/datasets/{dataset_id}").status_code == status.HTTP_200_OK
+        assert client.get(f"/comparison/api/datasets/{dataset_id}").status_code == status.HTTP_404_NOT_FOUND
+
+    def test_dataset_compare_admitted_with_dataset_cells(self, client, tmp_path, monkeypatch, sample_excel_extracted):
+        """Test that a dataset compare waits for admission under the upload's and the dataset's cells"""
+        monkeypatch.setattr(comparison_router, "dataset_store", DatasetStore(tmp_path))
+        controller = AdmissionController(max_running=1, max_queued=0)
+        monkeypatch.setattr(comparison_router, "admission", controller)
+        xlsx = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        dataset_id = client.post(
+            "/comparison/api/datasets", files={"excel_file": ("gt.xlsx", sample_excel_extracted, xlsx)}
+        ).json()["dataset_id"]
+
+        admitted = []
+        acquire = controller.acquire
+
+        async def record_acquire(cost):
+            admitted.append(cost.cells)
+            return await acquire(cost)
+
+        monkeypatch.setattr(controller, "acquire", record_acquire)
+        files = {"excel_file": ("robota.xlsx", sample_excel_extracted, xlsx)}
+        response = client.post(f"/comparison/api/datasets/{dataset_id}/compare", files=files)
+        assert response.status_code == status.HTTP_200_OK
+        assert "queue;dur=" in response.headers["server-timing"]
+        # Two sheets of A1:D4 in the upload, plus 3 rows of 4 columns in the dataset
+        assert admitted == [32 + 12]
+
+        busy = JobCost(1000, 1000)
+        asyncio.run(controller.acquire(busy))
+        response = client.post(f"/comparison/api/datasets/{dataset_id}/compare", files=files)
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        controller.release(busy)
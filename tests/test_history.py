@@ -0,0 +1,197 @@
+import io
+
+import pandas as pd
+import pytest
+from fastapi import status
+
+from app.routers import comparison as comparison_router
+from app.services.comparison import ComparisonService
+from app.services.history import HistoryStore
+
+
+def excel_bytes(ground_truth, extracted):
+    """Write both comparison tabs to xlsx bytes"""
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        ground_truth.to_excel(writer, sheet_name='正解データ', index=False)
+        extracted.to_excel(writer, sheet_name='Robota結果', index=False)
+    return buffer.getvalue()
+
+
+GROUND_TRUTH = pd.DataFrame({
+    'Name': ['Alice', 'Bob', 'Charlie', 'Dave'],
+    'City': ['Tokyo', 'Osaka', 'Kyoto', 'Nagoya'],
+    'Amount': [100, 200, 300, 400],
+})
+
+
+def extracted(name_errors=0, city_errors=0):
+    """Ground truth with the first rows of Name and City changed"""
+    df = GROUND_TRUTH.copy()
+    df.loc[:name_errors - 1, 'Name'] = 'Wrong'
+    df.loc[:city_errors - 1, 'City'] = 'Sapporo'
+    return df
+
+
+@pytest.mark.unit
+class TestHistoryStore:
+    """Unit tests for the SQLite comparison history"""
+
+    def setup_method(self):
+        self.service = ComparisonService()
+        self.service.llm_client = None
+
+    def compare(self, **errors):
+        return self.service.compare_files(excel_bytes(GROUND_TRUTH, extracted(**errors)))
+
+    def test_record_and_get(self, tmp_path):
+        """Test that summary, per-column statistics and mismatches are stored"""
+        store = HistoryStore(tmp_path / "history.sqlite3")
+        result = self.compare(name_errors=1, city_errors=2)
+
+        comparison_id = store.record(result, "invoices", source_sha256="abc")
+        entry = store.get(comparison_id)
+
+        assert entry.dataset == "invoices"
+        assert entry.source_sha256 == "abc"
+        assert entry.headers == ['Name', 'City', 'Amount']
+        assert entry.mismatched_cells == result.mismatched_cells == 3
+        assert entry.accuracy == result.accuracy
+        assert entry.stored_mismatches == 3
+        assert [(c.header, c.mismatched_cells, c.accuracy) for c in entry.columns] == [
+            ('Name', 1, 75.0), ('City', 2, 50.0), ('Amount', 0, 100.0)
+        ]
+
+        mismatches = store.mismatches(comparison_id, column='City')
+        assert [(m.row_index, m.ground_truth, m.extracted) for m in mismatches] == [
+            (0, 'Tokyo', 'Sapporo'), (1, 'Osaka', 'Sapporo')
+        ]
+        assert store.get("missing") is None
+
+    def test_mismatch_rows_capped(self, tmp_path):
+        """Test that only max_mismatches rows are stored while statistics stay complete"""
+        store = HistoryStore(tmp_path / "history.sqlite3")
+        comparison_id = store.record(self.compare(name_errors=4), "invoices", max_mismatches=2)
+
+        entry = store.get(comparison_id)
+        assert entry.stored_mismatches == 2
+        assert entry.columns[0].mismatched_cells == 4
+        assert len(store.mismatches(comparison_id)) == 2
+
+    def test_trend_and_worst_columns(self, tmp_path):
+        """Test accuracy trends and the most frequently wrong columns across comparisons"""
+        store = HistoryStore(tmp_path / "history.sqlite3")
+        first = store.record(self.compare(name_errors=2, city_errors=1), "invoices")
+        second = store.record(self.compare(name_errors=1), "invoices")
+        store.record(self.compare(city_errors=4), "receipts")
+
+        trend = store.accuracy_trend("invoices")
+        assert [p.comparison_id for p in trend.points] == [first, second]
+        assert [p.mismatched_cells for p in trend.points] == [3, 1]
+
+        name_trend = store.accuracy_trend("invoices", column="Name")
+        assert [p.accuracy for p in name_trend.points] == [50.0, 75.0]
+        assert store.accuracy_trend("invoices", since=trend.points[1].created_at).points[0].comparison_id == second
+
+        worst = store.worst_columns("invoices")
+        assert [(c.column, c.comparisons, c.mismatched_cells, c.accuracy) for c in worst] == [
+            ('Name', 2, 3, 62.5), ('City', 2, 1, 87.5)
+        ]
+        assert store.worst_columns()[0].column == 'City'
+
+    def test_worst_columns_confidence_from_raw_sums(self, tmp_path):
+        """Test that the aggregated confidence divides summed raw confidences, not re-expanded rounded averages"""
+        store = HistoryStore(tmp_path / "history.sqlite3")
+        results = [self.compare(name_errors=errors) for errors in (1, 4)]
+        for result in results:
+            store.record(result, "invoices")
+
+        confidences = [row.cells[0].confidence for result in results for row in result.rows if not row.cells[0].match]
+        worst = store.worst_columns("invoices")
+        assert worst[0].column == 'Name'
+        assert worst[0].average_mismatch_confidence == round(sum(confidences) / len(confidences), 2)
+
+    def test_migrates_column_stats_without_confidence_sum(self, tmp_path):
+        """Test that a database created before confidence_sum existed gets the column, backfilled"""
+        import sqlite3
+
+        path = tmp_path / "history.sqlite3"
+        with sqlite3.connect(path) as conn:
+            conn.execute(
+                "CREATE TABLE column_stats (comparison_id TEXT NOT NULL, position INTEGER NOT NULL, "
+                "column_name TEXT NOT NULL, total_cells INTEGER NOT NULL, matched_cells INTEGER NOT NULL, "
+                "mismatched_cells INTEGER NOT NULL, accuracy REAL, average_mismatch_confidence REAL, "
+                "PRIMARY KEY (comparison_id, position))"
+            )
+            conn.execute("INSERT INTO column_stats VALUES ('old', 0, 'Name', 4, 2, 2, 50.0, 12.5)")
+        conn.close()
+
+        store = HistoryStore(path)
+        store.record(self.compare(name_errors=1), "invoices")
+        with sqlite3.connect(path) as conn:
+            assert conn.execute("SELECT confidence_sum FROM column_stats WHERE comparison_id = 'old'").fetchone() == (25.0,)
+        conn.close()
+
+    def test_list_and_delete(self, tmp_path):
+        """Test listing newest first and deleting with its column statistics and mismatches"""
+        store = HistoryStore(tmp_path / "history.sqlite3")
+        first = store.record(self.compare(name_errors=1), "invoices")
+        second = store.record(self.compare(), "receipts")
+
+        assert [e.comparison_id for e in store.list_entries()] == [second, first]
+        assert [e.comparison_id for e in store.list_entries("invoices")] == [first]
+
+        assert store.delete(first) is True
+        assert store.delete(first) is False
+        assert store.mismatches(first) == []
+        assert store.worst_columns() == []
+
+
+@pytest.mark.api
+class TestHistoryEndpoints:
+    """API tests for recording comparisons and querying the history"""
+
+    def test_record_and_query(self, client, tmp_path, monkeypatch):
+        """Test that recorded comparisons are returned by the history endpoints"""
+        monkeypatch.setattr(comparison_router, "history_store", HistoryStore(tmp_path / "history.sqlite3"))
+        xlsx = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+        ids = []
+        for errors in (2, 1):
+            response = client.post(
+                "/comparison/api/compare",
+                files={"excel_file": ("batch.xlsx", excel_bytes(GROUND_TRUTH, extracted(name_errors=errors)), xlsx)},
+                params={"record": "true", "dataset": "invoices"},
+            )
+            assert response.status_code == status.HTTP_200_OK
+            assert "history;dur=" in response.headers["server-timing"]
+            ids.append(response.headers["x-comparison-id"])
+
+        response = client.post(
+            "/comparison/api/compare",
+            files={"excel_file": ("batch.xlsx", excel_bytes(GROUND_TRUTH, GROUND_TRUTH), xlsx)},
+        )
+        assert "x-comparison-id" not in response.headers
+
+        response = client.post(
+            "/comparison/api/compare",
+            files={"excel_file": ("batch-2026-10-19.xlsx", excel_bytes(GROUND_TRUTH, GROUND_TRUTH), xlsx)},
+            params={"record": "true"},
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        assert [e["comparison_id"] for e in client.get("/comparison/api/history").json()] == ids[::-1]
+
+        trend = client.get("/comparison/api/history/trend", params={"dataset": "invoices", "column": "Name"}).json()
+        assert [p["accuracy"] for p in trend["points"]] == [50.0, 75.0]
+
+        worst = client.get("/comparison/api/history/columns", params={"dataset": "invoices"}).json()
+        assert [(c["column"], c["mismatched_cells"]) for c in worst] == [("Name", 3)]
+
+        entry = client.get(f"/comparison/api/history/{ids[0]}").json()
+        assert entry["columns"][0]["mismatched_cells"] == 2
+        mismatches = client.get(f"/comparison/api/history/{ids[0]}/mismatches").json()
+        assert [m["row_index"] for m in mismatches] == [0, 1]
+
+        assert client.delete(f"/comparison/api/history/{ids[0]}").status_code == status.HTTP_200_OK
+        assert client.get(f"/comparison/api/history/{ids[0]}").status_code == status.HTTP_404_NOT_FOUND
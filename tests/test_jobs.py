@@ -0,0 +1,173 @@
+import asyncio
+import io
+import threading
+import time
+
+import pandas as pd
+import pytest
+from fastapi import status
+
+from app.routers import comparison as comparison_router
+from app.services.admission import AdmissionController, JobCost
+from app.services.jobs import CANCELLED, COMPLETED, FAILED, QUEUED, JobManager
+
+
+def wait_for(manager, job_id, statuses, timeout=10.0):
+    """Poll a job until it reaches one of the given statuses"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job_status = manager.status(job_id)
+        if job_status.status in statuses:
+            return job_status
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not reach {statuses}")
+
+
+class BlockingService:
+    """Fake service that reports progress until the job is cancelled"""
+
+    def __init__(self):
+        self.started = threading.Event()
+
+    def compare_files(self, excel_file, progress=None):
+        self.started.set()
+        for i in range(1000):
+            progress("result_build", i, 1000)
+            time.sleep(0.01)
+        raise AssertionError("job was not cancelled")
+
+
+class InstantService:
+    def compare_files(self, excel_file, progress=None):
+        return "result"
+
+
+class FailingService:
+    def compare_files(self, excel_file, progress=None):
+        raise ValueError("Sheet '正解データ' not found in Excel file.")
+
+
+@pytest.mark.unit
+class TestJobManager:
+    """Unit tests for the background job manager"""
+
+    def test_cancel_running_job(self, tmp_path):
+        """Test that cancelling stops a running job through its progress callback"""
+        path = tmp_path / "upload.xlsx"
+        path.write_bytes(b"data")
+        service = BlockingService()
+        manager = JobManager(service, max_workers=1)
+
+        job_id = manager.submit(str(path)).job_id
+        assert service.started.wait(5)
+        running = wait_for(manager, job_id, ("running",))
+        assert running.stage in (None, "result_build")
+
+        manager.cancel(job_id)
+        job_status = wait_for(manager, job_id, (CANCELLED,))
+        assert job_status.finished_at is not None
+        assert not path.exists()
+        manager.shutdown()
+
+    def test_failed_job_and_expiry(self, tmp_path):
+        """Test that failures are recorded and finished jobs expire after retention"""
+        path = tmp_path / "upload.xlsx"
+        path.write_bytes(b"data")
+        manager = JobManager(FailingService(), max_workers=1, retention_seconds=0.05)
+
+        job_id = manager.submit(str(path)).job_id
+        job_status = wait_for(manager, job_id, (FAILED,))
+        assert "not found" in job_status.error
+
+        time.sleep(0.1)
+        assert manager.status(job_id) is None
+        manager.shutdown()
+
+    def test_finished_jobs_capped(self, tmp_path):
+        """Test that the oldest finished jobs are evicted beyond max_retained, without any polling"""
+        manager = JobManager(InstantService(), max_workers=1, max_retained=2)
+        job_ids = []
+        for i in range(5):
+            path = tmp_path / f"upload{i}.xlsx"
+            path.write_bytes(b"data")
+            job_ids.append(manager.submit(str(path)).job_id)
+        manager._executor.submit(lambda: None).result(timeout=5)
+
+        assert sorted(manager._jobs) == sorted(job_ids[-2:])
+        manager.shutdown()
+
+    def test_job_waits_for_admission(self, tmp_path):
+        """Test that a job stays queued until the admission controller has room for it"""
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        controller = AdmissionController(memory_budget=10**9, max_running=1, max_queued=10, queue_timeout=5)
+        manager = JobManager(InstantService(), max_workers=1, admission=controller)
+        path = tmp_path / "upload.xlsx"
+        path.write_bytes(b"data")
+
+        def on_loop(function, *args):
+            async def call():
+                return function(*args)
+            return asyncio.run_coroutine_threadsafe(call(), loop).result(timeout=5)
+
+        busy = JobCost(1, 1)
+        asyncio.run_coroutine_threadsafe(controller.acquire(busy), loop).result(timeout=5)
+        job_id = on_loop(manager.submit, str(path), JobCost(1, 1)).job_id
+        time.sleep(0.3)
+        assert manager.status(job_id).status == QUEUED
+        assert on_loop(lambda: controller.queued) == 1
+
+        on_loop(controller.release, busy)
+        assert wait_for(manager, job_id, (COMPLETED,)).status == COMPLETED
+        time.sleep(0.05)
+        assert on_loop(lambda: controller.running) == 0
+
+        manager.shutdown()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+
+
+@pytest.mark.api
+class TestJobEndpoints:
+    """Tests for the asynchronous job API"""
+
+    def test_job_lifecycle(self, client, sample_excel_extracted):
+        """Test submitting a job, following its events and fetching the result"""
+        files = {
+            "excel_file": ("test.xlsx", sample_excel_extracted, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        }
+        response = client.post("/comparison/api/jobs", files=files)
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        job_id = response.json()["job_id"]
+
+        events = client.get(f"/comparison/api/jobs/{job_id}/events")
+        assert events.headers["content-type"].startswith("text/event-stream")
+        assert "event: progress" in events.text
+        assert '"status":"completed"' in events.text
+
+        job_status = client.get(f"/comparison/api/jobs/{job_id}").json()
+        assert job_status["status"] == COMPLETED
+        assert job_status["progress"] == 100.0
+
+        result = client.get(f"/comparison/api/jobs/{job_id}/result").json()
+        assert result["success"] is True
+        assert result["result"]["mismatched_cells"] == 1
+
+    def test_failed_job_result_is_an_error(self, client):
+        """Test that the result of a failed job answers with an error status instead of 200"""
+        buffer = io.BytesIO()
+        pd.DataFrame({'A': [1]}).to_excel(buffer, sheet_name='Other', index=False)
+        xlsx = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        files = {"excel_file": ("test.xlsx", buffer.getvalue(), xlsx)}
+        job_id = client.post("/comparison/api/jobs", files=files).json()["job_id"]
+        wait_for(comparison_router.job_manager, job_id, (FAILED,))
+
+        response = client.get(f"/comparison/api/jobs/{job_id}/result")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "not found" in response.json()["detail"]
+
+    def test_unknown_job(self, client):
+        """Test that unknown job IDs return 404"""
+        assert client.get("/comparison/api/jobs/missing").status_code == status.HTTP_404_NOT_FOUND
+        assert client.delete("/comparison/api/jobs/missing").status_code == status.HTTP_404_NOT_FOUND
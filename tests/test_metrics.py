@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from app.services.metrics import Counter, Histogram, server_timing_header, stage_timer, metrics
+
+
+@pytest.mark.unit
+class TestMetrics:
+    """Unit tests for the in-process metrics registry"""
+
+    def test_counter_render(self):
+        """Test labeled counter increments and text output"""
+        counter = Counter("test_total", "Test counter", ("status",))
+        counter.inc(status=200)
+        counter.inc(2, status=200)
+        counter.inc(status=500)
+
+        assert counter.value(status=200) == 3
+        lines = counter.render()
+        assert "# TYPE test_total counter" in lines
+        assert 'test_total{status="200"} 3' in lines
+        assert 'test_total{status="500"} 1' in lines
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test that histogram buckets count every observation at or below the bound"""
+        histogram = Histogram("test_seconds", "Test histogram", buckets=(0.1, 1.0))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5.0)
+
+        lines = histogram.render()
+        assert 'test_seconds_bucket{le="0.1"} 1' in lines
+        assert 'test_seconds_bucket{le="1"} 2' in lines
+        assert 'test_seconds_bucket{le="+Inf"} 3' in lines
+        assert "test_seconds_count 3" in lines
+
+    def test_stage_timer_records_timings(self):
+        """Test stage_timer fills the timings dict and the stage histogram"""
+        before = metrics.stage_seconds.count(stage="unit_test_stage")
+        timings = {}
+        with stage_timer(timings, "unit_test_stage"):
+            pass
+
+        assert timings["unit_test_stage"] >= 0
+        assert metrics.stage_seconds.count(stage="unit_test_stage") == before + 1
+        assert server_timing_header({"parse": 0.0125}) == "parse;dur=12.5"
+
+
+@pytest.mark.unit
+class TestSamplingProfiler:
+    """Unit tests for the sampling profiler"""
+
+    def test_collapsed_stacks(self):
+        """Test that samples of a busy loop are exported as collapsed stacks"""
+        from app.services.profiling import SamplingProfiler
+
+        def busy():
+            end = time.perf_counter() + 0.05
+            while time.perf_counter() < end:
+                pass
+
+        with SamplingProfiler(interval=0.001) as profiler:
+            busy()
+
+        assert profiler.samples
+        collapsed = profiler.collapsed()
+        assert "busy (test_metrics.py:" in collapsed
+        stack, count = collapsed.splitlines()[0].rsplit(" ", 1)
+        assert int(count) >= 1
@@ -0,0 +1,45 @@
+import pytest
+
+from app.services import process_pool
+
+
+class FakePool:
+    """Stands in for a ProcessPoolExecutor, recording how it was shut down"""
+
+    def __init__(self):
+        self.shutdown_calls = []
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shutdown_calls.append(cancel_futures)
+
+
+@pytest.mark.unit
+class TestProcessPool:
+    """Unit tests for the shared comparison worker pool"""
+
+    def test_discard_pool_replaces_only_the_broken_instance(self, monkeypatch):
+        """Test that discarding a pool never cancels other requests' work or drops its replacement"""
+        broken, replacement = FakePool(), FakePool()
+        monkeypatch.setattr(process_pool, "_pool", replacement)
+
+        process_pool.discard_pool(broken)
+
+        assert process_pool._pool is replacement
+        assert broken.shutdown_calls == [False]
+        assert replacement.shutdown_calls == []
+
+        process_pool.discard_pool(replacement)
+        assert process_pool._pool is None
+        assert replacement.shutdown_calls == [False]
+
+    def test_worker_service_is_lightweight(self, monkeypatch):
+        """Test that worker processes get a service without column matchers that never shards"""
+        monkeypatch.setattr(process_pool, "_worker_service", None)
+        monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+
+        service = process_pool.worker_service()
+
+        assert service.column_matcher is None
+        assert service.llm_client is None
+        assert service.shard_workers == 1
+        assert process_pool.worker_service() is service
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from app.services.comparison import ComparisonService
+from app.services.sampling import sample_size_for_margin, stratified_mean, stratified_sample
+
+
+@pytest.mark.unit
+class TestSampling:
+    """Unit tests for stratified sampling and accuracy estimation"""
+
+    def test_sample_size_for_margin(self):
+        """Test the worst-case sample size with the finite population correction"""
+        assert sample_size_for_margin(0.01, 0.95, 10_000_000) == 9595
+        assert sample_size_for_margin(0.01, 0.95, 1000) < 1000
+        assert sample_size_for_margin(0.5, 0.95, 3) <= 3
+
+    def test_stratified_sample_covers_every_block(self):
+        """Test that the sample is spread over all strata without duplicates"""
+        rows, labels, sizes = stratified_sample(10_000, 500, strata=10, rng=np.random.default_rng(0))
+
+        assert len(np.unique(rows)) == len(rows)
+        assert sizes.sum() == 10_000
+        assert np.bincount(labels).tolist() == [50] * 10
+        assert all(h * 1000 <= row < (h + 1) * 1000 for row, h in zip(rows, labels))
+
+    def test_full_sample_has_no_error(self):
+        """Test that sampling every row gives the exact mean with zero standard error"""
+        values = np.array([1.0, 0.0, 1.0, 1.0])
+        rows, labels, sizes = stratified_sample(4, 4, strata=2)
+        means, errors = stratified_mean(values[rows], labels, sizes)
+
+        assert means[0] == pytest.approx(0.75)
+        assert errors[0] == 0.0
+
+    def test_estimate_accuracy(self, sample_excel_extracted):
+        """Test that a sample covering the whole sheet matches the exact comparison"""
+        service = ComparisonService()
+        estimate = service.estimate_accuracy(sample_excel_extracted, seed=1)
+
+        assert estimate.exact is True
+        assert estimate.sampled_rows == 3
+        assert estimate.accuracy == service.compare_files(sample_excel_extracted).accuracy
+        assert estimate.accuracy_low == estimate.accuracy_high == estimate.accuracy
+        assert [c.accuracy for c in estimate.columns] == [100.0, pytest.approx(66.67), 100.0, 100.0]
+
+    def test_estimate_sheets_of_different_lengths(self):
+        """Test that rows past the end of the shorter sheet count as mismatches"""
+        import io
+        import pandas as pd
+
+        gt = pd.DataFrame({'ID': [101, 102], 'Qty': [1, 2]})
+        ext = pd.DataFrame({'ID': [101, 102, 103], 'Qty': [1, 2, 3]})
+        buffer = io.BytesIO()
+        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+            gt.to_excel(writer, sheet_name='正解データ', index=False)
+            ext.to_excel(writer, sheet_name='Robota結果', index=False)
+
+        service = ComparisonService()
+        estimate = service.estimate_accuracy(buffer.getvalue(), seed=0)
+
+        assert estimate.exact is True
+        assert estimate.accuracy == service.compare_files(buffer.getvalue()).accuracy
+        assert [c.accuracy for c in estimate.columns] == [pytest.approx(66.67), pytest.approx(66.67)]
+
+    def test_estimate_empty_sheets(self):
+        """Test that empty sheets give an exact, empty estimate instead of an error"""
+        import io
+        import pandas as pd
+
+        empty = pd.DataFrame({'Name': [], 'Age': []})
+        buffer = io.BytesIO()
+        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+            empty.to_excel(writer, sheet_name='正解データ', index=False)
+            empty.to_excel(writer, sheet_name='Robota結果', index=False)
+
+        estimate = ComparisonService().estimate_accuracy(buffer.getvalue(), margin_of_error=0.01)
+
+        assert (estimate.total_rows, estimate.sampled_rows, estimate.exact) == (0, 0, True)
+        assert estimate.accuracy == estimate.accuracy_low == estimate.accuracy_high == 100.0
+        assert [c.header for c in estimate.columns] == ['Name', 'Age']
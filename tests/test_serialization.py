@@ -0,0 +1,85 @@
+import gzip
+import json
+
+import pytest
+
+from app.schemas.comparison import ComparisonResponse
+from app.services.serialization import json_response, negotiate_encoding
+
+
+@pytest.mark.unit
+class TestSerialization:
+    """Unit tests for response serialization and content-encoding negotiation"""
+
+    def test_negotiate_encoding(self):
+        """Test Accept-Encoding parsing with q-values"""
+        assert negotiate_encoding(None) is None
+        assert negotiate_encoding("identity") is None
+        assert negotiate_encoding("gzip, deflate") == "gzip"
+        assert negotiate_encoding("gzip;q=0") is None
+        assert negotiate_encoding("*") in ("br", "gzip")
+
+    def test_json_response_matches_model_dump(self):
+        """Test that the fast path produces the same JSON as model_dump"""
+        model = ComparisonResponse(success=False, error="エラー")
+        response = json_response(model)
+
+        assert response.media_type == "application/json"
+        assert "content-encoding" not in response.headers
+        assert json.loads(response.body) == model.model_dump()
+
+    def test_json_response_gzip(self):
+        """Test that large bodies are gzip-compressed when accepted"""
+        model = ComparisonResponse(success=False, error="x" * 5000)
+        response = json_response(model, accept_encoding="gzip")
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert json.loads(gzip.decompress(response.body)) == model.model_dump()
+
+    def test_negotiate_media_type(self):
+        """Test Accept header negotiation between JSON and binary formats"""
+        from app.services.serialization import negotiate_media_type
+
+        assert negotiate_media_type(None) == "application/json"
+        assert negotiate_media_type("*/*") == "application/json"
+        assert negotiate_media_type("text/html") is None
+
+    def test_msgpack_response(self):
+        """Test MessagePack serialization of a comparison response"""
+        msgpack = pytest.importorskip("msgpack")
+        from app.services.serialization import msgpack_response
+
+        model = ComparisonResponse(success=False, error="エラー")
+        response = msgpack_response(model)
+
+        assert response.media_type == "application/x-msgpack"
+        assert msgpack.unpackb(response.body) == model.model_dump()
+
+    def test_arrow_record_batch(self):
+        """Test the Arrow IPC stream has one row per cell"""
+        pa = pytest.importorskip("pyarrow")
+        from app.schemas.comparison import CellComparison, ComparisonResult, RowComparison
+        from app.services.serialization import arrow_response
+
+        result = ComparisonResult(
+            headers=["Name", "Age"],
+            rows=[
+                RowComparison(row_index=0, cells=[
+                    CellComparison(value="A", ground_truth="A", extracted="A", match=True),
+                    CellComparison(value=35, ground_truth=35, extracted=36, match=False, confidence=50.0),
+                ]),
+            ],
+            total_rows=1, matched_rows=0, mismatched_rows=1,
+            total_cells=2, matched_cells=1, mismatched_cells=1, accuracy=50.0,
+        )
+        response = arrow_response(ComparisonResponse(success=True, result=result))
+
+        table = pa.ipc.open_stream(response.body).read_all()
+        df = table.to_pandas()
+        assert list(df.columns) == ["row_index", "column", "ground_truth", "extracted", "match", "confidence"]
+        assert list(df["column"]) == ["Name", "Age"]
+        assert list(df["extracted"]) == ["A", "36"]
+        assert df["confidence"].isna().tolist() == [True, False]
+        summary = json.loads(table.schema.metadata[b"comparison"])
+        assert summary["result"]["accuracy"] == 50.0
@@ -236,6 +236,34 @@ class TestUIFunctionality:
         back_button = page.locator("a:has-text('Upload New Files')")
         expect(back_button).to_have_count(1)
 
+    def test_results_table_is_virtualized(self, page):
+        """Test that only a window of rows is rendered and filtering runs in the worker"""
+        rows = [
+            {
+                "row_index": i,
+                "cells": [
+                    {"value": f"v{i}", "ground_truth": f"v{i}", "extracted": f"v{i}" if i % 10 else "x",
+                     "match": bool(i % 10), "confidence": None if i % 10 else 50.0}
+                ],
+            }
+            for i in range(20000)
+        ]
+        result = {
+            "headers": ["Value"], "rows": rows, "total_rows": 20000,
+            "matched_rows": 18000, "mismatched_rows": 2000, "total_cells": 20000,
+            "matched_cells": 18000, "mismatched_cells": 2000, "accuracy": 90.0,
+        }
+        page.goto(f"{self.BASE_URL}/comparison/")
+        page.evaluate("data => sessionStorage.setItem('comparisonResult', JSON.stringify(data))", result)
+        page.goto(f"{self.BASE_URL}/comparison/results")
+
+        expect(page.locator("#rowCount")).to_contain_text("20,000 of 20,000")
+        assert page.locator("#resultsBody tr:not(.spacer)").count() < 200
+
+        page.locator("#mismatchesOnly").check()
+        expect(page.locator("#rowCount")).to_contain_text("2,000 of 20,000")
+        expect(page.locator("#resultsBody td.cell-match")).to_have_count(0)
+
     def test_navigation_between_pages(self, page):
         """Test navigation between upload and results pages"""
         # Go to upload page